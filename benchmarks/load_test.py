@@ -0,0 +1,351 @@
+"""
+Load test of the upload page, entirely local: starts the app (run_app.py
+--prod) on a free port, then N simulated browsers each open '/', connect
+the NiceGUI websocket and upload DPE files one after the other through the
+page's ui.upload, like the real page does.
+
+    python benchmarks/load_test.py --clients 20 --uploads 10
+    python benchmarks/load_test.py --clients 50 --workers 8 --taille grand
+    python benchmarks/load_test.py --clients 10 --fichiers dossier_dpe/
+    python benchmarks/load_test.py --url http://127.0.0.1:8080     # server already running
+
+The latency of an upload runs from the POST of the file to the websocket
+message that shows its row in the comparison table (or its error):
+parsing, rendering and the push to the browser included. Reported:
+throughput, p50/p95/p99 latency, server RSS (process and parse workers)
+and event-loop lag (read from /metrics, see src.metrics.monitor_event_loop).
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import aiohttp
+import socketio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic_dpe import generate_dpe_xml
+from src.bulk import collect_files
+
+SIZES = {
+    'petit': dict(installations=1, packs=2, travaux=2, fiches=30, murs=4),
+    'moyen': dict(installations=3, packs=4, travaux=4, fiches=150, murs=20),
+    'grand': dict(installations=8, packs=10, travaux=6, fiches=2000, murs=400),
+}
+
+CLIENT_ID = re.compile(r"'client_id': '([^']+)'")
+UPLOAD_URL = re.compile(r'"url":"(/_nicegui/client/[^"]+/upload/\d+)"')
+LAG_BUCKET = re.compile(r'dpe_event_loop_lag_seconds_bucket\{le="([^"]+)"\} (\d+)')
+LAG_SUM = re.compile(r'dpe_event_loop_lag_seconds_sum (\S+)')
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a sorted list."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def process_tree_rss(pid):
+    """RSS in bytes of a process and all its descendants (Linux /proc)."""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(f'/proc/{current}/statm') as f:
+                total += int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, IndexError):
+            pass
+        stack.extend(children.get(current, []))
+    return total
+
+
+def load_documents(args):
+    """[(file name, bytes)] uploaded in turn by every client."""
+    if args.fichiers:
+        paths = [p for p in collect_files(args.fichiers) if isinstance(p, str) and p.lower().endswith(('.xml', '.xml.gz'))]
+        if not paths:
+            raise SystemExit("Aucun fichier XML trouvé.")
+        documents = []
+        for path in paths[:args.max_fichiers]:
+            with open(path, 'rb') as f:
+                documents.append((os.path.basename(path), f.read()))
+        return documents
+    # Different seeds: every upload is a real parse, not a cache hit (unless --meme-fichier)
+    count = 1 if args.meme_fichier else args.clients * args.uploads
+    return [(f'synthetique_{i}.xml', generate_dpe_xml(**SIZES[args.taille], seed=i)) for i in range(count)]
+
+
+class Client:
+    """One simulated browser: the page, its websocket and one upload at a time."""
+
+    def __init__(self, base_url, index):
+        self.base_url = base_url
+        self.index = index
+        self.pending = {}  # unique upload name -> future
+        self.http = None
+        self.sio = None
+
+    async def connect(self):
+        self.http = aiohttp.ClientSession()  # Own cookie jar: one browser session per client
+        async with self.http.get(f'{self.base_url}/') as response:
+            html = await response.text()
+        client_id = CLIENT_ID.search(html).group(1)
+        self.upload_url = self.base_url + UPLOAD_URL.search(html).group(1)
+
+        self.sio = socketio.AsyncClient(http_session=self.http, reconnection=False)
+        self.sio.on('*', self.on_message)
+        query = f"client_id={client_id}&tab_id={uuid.uuid4()}&document_id={uuid.uuid4()}&next_message_id=0&implicit_handshake=true"
+        await self.sio.connect(f'{self.base_url}/?{query}', socketio_path='/_nicegui_ws/socket.io', transports=['websocket'])
+
+    async def on_message(self, event, data=None):
+        if not self.pending:
+            return
+        text = json.dumps(data, default=str, ensure_ascii=False)
+        error = data.get('message') if event == 'notify' and isinstance(data, dict) else None
+        matched = False
+        for name, future in list(self.pending.items()):
+            if name in text and not future.done():
+                # Errors are notifications "<nom> : <message>"; success is the row added to the table
+                future.set_result(error)
+                matched = True
+        if not matched and error is not None and data.get('type') == 'negative' and len(self.pending) == 1:
+            # An error notification without the file name still ends the only upload in flight
+            future = next(iter(self.pending.values()))
+            if not future.done():
+                future.set_result(error)
+
+    async def upload(self, name, content, timeout):
+        """(latency in seconds, error message or None)."""
+        future = asyncio.get_running_loop().create_future()
+        self.pending[name] = future
+        start = time.perf_counter()
+        try:
+            form = aiohttp.FormData()
+            form.add_field('file', content, filename=name, content_type='text/xml')
+            async with self.http.post(self.upload_url, data=form) as response:
+                if response.status != 200:
+                    return time.perf_counter() - start, f"HTTP {response.status}"
+            error = await asyncio.wait_for(future, timeout)
+            return time.perf_counter() - start, error
+        except asyncio.TimeoutError:
+            return time.perf_counter() - start, 'délai dépassé'
+        except aiohttp.ClientError as e:
+            return time.perf_counter() - start, f"connexion: {e}"
+        finally:
+            del self.pending[name]
+
+    async def close(self):
+        if self.sio is not None and self.sio.connected:
+            await self.sio.disconnect()
+        if self.http is not None:
+            await self.http.close()
+
+
+async def scrape_lag(base_url):
+    """({bucket upper bound: cumulative count}, sum) of the server event-loop lag histogram, from /metrics."""
+    try:
+        async with aiohttp.ClientSession() as http:
+            async with http.get(f'{base_url}/metrics') as response:
+                text = await response.text()
+    except aiohttp.ClientError:
+        return {}, 0.0
+    total = LAG_SUM.search(text)
+    return {float(le): int(n) for le, n in LAG_BUCKET.findall(text)}, float(total.group(1)) if total else 0.0
+
+
+def lag_during(before, after):
+    """
+    Event-loop lag over the test only, from two scrapes of the histogram:
+    {'moyenne': ms, 'p50': ms, ...}, each quantile being the upper bound of
+    its bucket. None when the server does not expose it.
+    """
+    (buckets_before, sum_before), (buckets_after, sum_after) = before, after
+    bounds = sorted(buckets_after)
+    counts = [buckets_after[b] - buckets_before.get(b, 0) for b in bounds]
+    if not counts or not counts[-1]:
+        return None
+    total = counts[-1]
+    lag = {'moyenne': (sum_after - sum_before) / total * 1000}
+    for q in (0.5, 0.95, 0.99):
+        bound = next(b for b, n in zip(bounds, counts) if n >= q * total)
+        lag[f'p{int(q * 100)}'] = bound * 1000
+    return lag
+
+
+async def sample_rss(pid, samples, interval=0.5):
+    while True:
+        samples.append(process_tree_rss(pid))
+        await asyncio.sleep(interval)
+
+
+async def run_client(client, documents, uploads, timeout, results):
+    for i in range(uploads):
+        name, content = documents[(client.index * uploads + i) % len(documents)]
+        # Unique name: it is what identifies the upload in the websocket messages
+        latency, error = await client.upload(f"c{client.index}-{i}-{name}", content, timeout)
+        results.append((latency, error))
+
+
+async def load_test(base_url, documents, clients, uploads, timeout, ramp_up, server_pid=None):
+    rss = []
+    sampler = asyncio.create_task(sample_rss(server_pid, rss)) if server_pid else None
+    if server_pid:
+        await asyncio.sleep(0.6)  # Idle RSS first
+    idle_rss = rss[0] if rss else None
+
+    pool = [Client(base_url, i) for i in range(clients)]
+    for i, client in enumerate(pool):
+        await client.connect()
+        if ramp_up:
+            await asyncio.sleep(ramp_up / clients)
+
+    results = []
+    lag_before = await scrape_lag(base_url)
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(c, documents, uploads, timeout, results) for c in pool))
+    elapsed = time.perf_counter() - start
+
+    lag = lag_during(lag_before, await scrape_lag(base_url))
+    if sampler:
+        sampler.cancel()
+    await asyncio.gather(*(c.close() for c in pool))
+
+    latencies = sorted(latency for latency, error in results if error is None)
+    errors = {}
+    for _, error in results:
+        if error is not None:
+            errors[error] = errors.get(error, 0) + 1
+    return {
+        'clients': clients,
+        'uploads': len(results),
+        'ok': len(latencies),
+        'errors': errors,
+        'elapsed_s': elapsed,
+        'uploads_per_second': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'latency_s': {f'p{int(q * 100)}': percentile(latencies, q) for q in (0.5, 0.95, 0.99)}
+                     | {'max': latencies[-1] if latencies else 0.0},
+        'rss_mb': {'idle': idle_rss / 2**20, 'peak': max(rss) / 2**20} if rss else None,
+        'event_loop_lag_ms': lag,
+    }
+
+
+def start_server(args, port):
+    """Starts run_app.py --prod on 127.0.0.1:port and waits until '/' answers."""
+    cmd = [sys.executable, os.path.join(ROOT, 'run_app.py'), '--prod', '--host', '127.0.0.1', '--port', str(port)]
+    if args.workers:
+        cmd += ['--workers', str(args.workers)]
+    if args.pool_size:
+        cmd += ['--pool-size', str(args.pool_size)]
+    env = dict(os.environ, DPE_METRICS='1')
+    if not args.cache:
+        env['DPE_CACHE_SIZE'] = '0'
+        env.pop('DPE_CACHE_DIR', None)
+    log = tempfile.TemporaryFile()  # Not a pipe: nobody reads it while the test runs
+    server = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            log.seek(0)
+            raise SystemExit(f"Le serveur s'est arrêté au démarrage:\n{log.read().decode(errors='replace')}")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("Le serveur n'a pas démarré en 60 s.")
+
+
+def print_summary(summary):
+    print(f"\n{summary['clients']} clients, {summary['uploads']} envois en {summary['elapsed_s']:.1f}s")
+    print(f"  réussis           {summary['ok']}")
+    for error, count in sorted(summary['errors'].items(), key=lambda e: -e[1]):
+        print(f"  échec             {count} x {error}")
+    print(f"  débit             {summary['uploads_per_second']:.1f} envois/s")
+    latency = summary['latency_s']
+    print(f"  latence (ms)      p50 {latency['p50'] * 1000:.0f}   p95 {latency['p95'] * 1000:.0f}   "
+          f"p99 {latency['p99'] * 1000:.0f}   max {latency['max'] * 1000:.0f}")
+    if summary['rss_mb']:
+        print(f"  RSS serveur (Mo)  repos {summary['rss_mb']['idle']:.0f}   pic {summary['rss_mb']['peak']:.0f}")
+    lag = summary['event_loop_lag_ms']
+    if lag:
+        # Quantiles: upper bound of their histogram bucket
+        print(f"  retard boucle (ms) moyenne {lag['moyenne']:.1f}   p50 ≤{lag['p50']:g}   "
+              f"p95 ≤{lag['p95']:g}   p99 ≤{lag['p99']:g}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Test de charge des envois de fichiers sur la page du Lecteur DPE.")
+    ap.add_argument('-c', '--clients', type=int, default=10, help="Navigateurs simulés simultanés (défaut: 10)")
+    ap.add_argument('-n', '--uploads', type=int, default=5, help="Envois successifs par client (défaut: 5)")
+    ap.add_argument('--taille', choices=SIZES, default='moyen', help="Taille des DPE synthétiques (défaut: moyen)")
+    ap.add_argument('--fichiers', nargs='+', help="Fichiers ou dossiers de DPE à envoyer au lieu de DPE synthétiques")
+    ap.add_argument('--max-fichiers', type=int, default=1000, help="Nombre maximal de fichiers chargés avec --fichiers")
+    ap.add_argument('--meme-fichier', action='store_true', help="Toujours le même DPE (mesure le cache)")
+    ap.add_argument('--cache', action='store_true', help="Laisser le cache d'analyse actif (désactivé par défaut)")
+    ap.add_argument('--url', help="Serveur déjà lancé (ex: http://127.0.0.1:8080) ; RSS mesurée seulement avec --pid")
+    ap.add_argument('--pid', type=int, help="PID du serveur déjà lancé, pour sa RSS")
+    ap.add_argument('--workers', type=int, help="Processus d'analyse du serveur lancé (défaut: nombre de coeurs)")
+    ap.add_argument('--pool-size', type=int, help="Analyses simultanées du serveur lancé")
+    ap.add_argument('--montee', type=float, default=0.0, help="Durée de connexion progressive des clients, en secondes")
+    ap.add_argument('--timeout', type=float, default=120.0, help="Délai maximal d'un envoi, en secondes (défaut: 120)")
+    ap.add_argument('--json', help="Écrire le résumé dans ce fichier JSON")
+    args = ap.parse_args(argv)
+
+    documents = load_documents(args)
+    server = None
+    if args.url:
+        base_url, pid = args.url.rstrip('/'), args.pid
+    else:
+        port = free_port()
+        server = start_server(args, port)
+        base_url, pid = f'http://127.0.0.1:{port}', server.pid
+
+    try:
+        summary = asyncio.run(load_test(base_url, documents, args.clients, args.uploads, args.timeout, args.montee, pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(30)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+    print_summary(summary)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+    return 0 if not summary['errors'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""
+Repeatable benchmarks of the parser, the label generators, format_value, the
+static HTML export and a headless NiceGUI render of the report.
+
+    python benchmarks/run_benchmarks.py              # run, record, compare with the last run
+    python benchmarks/run_benchmarks.py --quick      # fewer repetitions
+    python benchmarks/run_benchmarks.py --fail-on-regression
+
+Each run is appended to benchmarks/results.jsonl (commit, date, median/min
+time per operation) and compared with the previous recorded run.
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic_dpe import generate_dpe_xml
+from src import dpe_label_generator
+from src.dpe_label_generator import generate_dpe_svg, generate_ges_svg
+from src.parser import parse_dpe_file
+from src.report_export import render_html
+from src.utils import format_value
+
+RESULTS_FILE = os.path.join(ROOT, 'benchmarks', 'results.jsonl')
+
+# Synthetic files: (name, generate_dpe_xml kwargs)
+SIZES = [
+    ('petit', dict(installations=1, packs=2, travaux=2, fiches=30, murs=4)),
+    ('moyen', dict(installations=3, packs=4, travaux=4, fiches=150, murs=20)),
+    ('grand', dict(installations=8, packs=10, travaux=6, fiches=2000, murs=400)),
+]
+
+
+def measure(func, repeat, number):
+    """Returns (median, min) seconds per call over `repeat` batches of `number` calls."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return statistics.median(timings), min(timings)
+
+
+def bench_parser(repeat):
+    cases = {}
+    for name, kwargs in SIZES:
+        content = generate_dpe_xml(**kwargs)
+        number = max(1, 2000 // (len(content) // 1024 + 1))
+        for streaming in (False, True):
+            label = f"parse_dpe_file[{name},{'streaming' if streaming else 'arbre'}]"
+            cases[label] = measure(lambda: parse_dpe_file(io.BytesIO(content), streaming=streaming), repeat, number)
+    return cases
+
+
+def bench_svg(repeat):
+    values = [(v, c) for c in 'ABCDEFG' for v in range(0, 500, 7)]
+
+    def uncached():
+        dpe_label_generator._render.cache_clear()
+        for v, c in values:
+            generate_dpe_svg(v, c)
+            generate_ges_svg(v, c)
+
+    def cached():
+        for v, c in values:
+            generate_dpe_svg(v, c)
+            generate_ges_svg(v, c)
+
+    calls = 2 * len(values)
+    med, mini = measure(uncached, repeat, 5)
+    cases = {'generate_svg[sans cache]': (med / calls, mini / calls)}
+    cached()
+    med, mini = measure(cached, repeat, 20)
+    cases['generate_svg[cache]'] = (med / calls, mini / calls)
+    return cases
+
+
+def bench_format_value(repeat):
+    values = [None, '', 0, 3.14159, 54.3, 123.456, 98765.4, '2,5', 'Non précis', 1e6]
+
+    def run():
+        for v in values:
+            format_value(v, 'm²')
+
+    med, mini = measure(run, repeat, 2000)
+    return {'format_value': (med / len(values), mini / len(values))}
+
+
+def bench_html(repeat):
+    data = parse_dpe_file(io.BytesIO(generate_dpe_xml(**SIZES[1][1])))
+    return {'render_html[moyen]': measure(lambda: render_html(data), repeat, 200)}
+
+
+def bench_render(repeat):
+    """Builds the report in a detached NiceGUI client (no browser, no server)."""
+    try:
+        from nicegui import Client
+        from nicegui.page import page
+        from src import nice_ui
+    except ImportError as e:
+        print(f"  rendu ignoré (NiceGUI indisponible: {e})")
+        return {}
+
+    data = parse_dpe_file(io.BytesIO(generate_dpe_xml(**SIZES[1][1])))
+
+    def run(open_all=False):
+        client = Client(page('/'), request=None)
+        with client:
+            container = nice_ui.ui.column()
+            nice_ui.render_report(data, container)
+            if open_all:
+                # Sections built on demand: open them all, as a user reading the whole report would
+                for expansion in container.descendants():
+                    if isinstance(expansion, nice_ui.ui.expansion):
+                        expansion.value = True
+        client.delete()
+
+    try:
+        return {
+            'render_report[moyen]': measure(run, repeat, 3),
+            'render_report[moyen,sections ouvertes]': measure(lambda: run(open_all=True), repeat, 3),
+        }
+    except Exception as e:
+        print(f"  rendu ignoré ({type(e).__name__}: {e})")
+        return {}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_previous():
+    if not os.path.exists(RESULTS_FILE):
+        return None
+    last = None
+    with open(RESULTS_FILE, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                last = json.loads(line)
+    return last
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks du Lecteur DPE.")
+    ap.add_argument('--quick', action='store_true', help="Moins de répétitions")
+    ap.add_argument('--no-record', action='store_true', help="Ne pas enregistrer dans results.jsonl")
+    ap.add_argument('--threshold', type=float, default=1.25,
+                    help="Ratio au-delà duquel un ralentissement est signalé (défaut: 1.25)")
+    ap.add_argument('--fail-on-regression', action='store_true', help="Code de sortie 1 en cas de régression")
+    args = ap.parse_args(argv)
+
+    repeat = 3 if args.quick else 7
+    results = {}
+    for bench in (bench_parser, bench_svg, bench_format_value, bench_html, bench_render):
+        print(f"{bench.__name__}...")
+        for name, (med, mini) in bench(repeat).items():
+            results[name] = {'median_us': med * 1e6, 'min_us': mini * 1e6}
+
+    previous = load_previous()
+    regressions = []
+    print(f"\n{'benchmark':45} {'médiane (µs)':>14} {'min (µs)':>12} {'vs préc.':>10}")
+    for name, res in results.items():
+        ratio_txt = ''
+        if previous and name in previous['results']:
+            ratio = res['median_us'] / previous['results'][name]['median_us']
+            ratio_txt = f"x{ratio:.2f}"
+            if ratio > args.threshold:
+                regressions.append(name)
+                ratio_txt += ' !'
+        print(f"{name:45} {res['median_us']:14.1f} {res['min_us']:12.1f} {ratio_txt:>10}")
+
+    if not args.no_record:
+        entry = {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'results': results,
+        }
+        with open(RESULTS_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+
+    if regressions:
+        print(f"\nRégressions (> x{args.threshold}) par rapport à {previous.get('commit')}: {', '.join(regressions)}")
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
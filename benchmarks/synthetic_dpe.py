@@ -0,0 +1,182 @@
+"""
+Synthetic DPE XML generator mirroring the ADEME structure read by parse_dpe_file.
+
+    python benchmarks/synthetic_dpe.py -o /tmp/dpe --count 100 --packs 3 --fiches 80
+"""
+import argparse
+import os
+import random
+from xml.sax.saxutils import escape
+
+# Real-looking sous_fiche_technique descriptions (all the ones the parser maps, plus noise)
+FICHE_DESCRIPTIONS = [
+    ('Hauteur moyenne sous plafond', ['2,5', '2,7', '3']),
+    ('Matériau mur', ['Mur en pierre de taille et moellons', 'Mur en blocs de béton creux', 'Mur en briques pleines simples']),
+    ('Isolation: murs', ['Non isolé', 'ITI', 'ITE']),
+    ('Type de pb', ['Dalle béton', 'Plancher bois sur solives bois']),
+    ('Type de ph', ['Combles aménagés sous rampants', 'Plafond sous solives bois']),
+    ('Type de vitrage', ['Double vitrage', 'Simple vitrage']),
+    ('Type ouverture', ['Fenêtres battantes', 'Portes-fenêtres coulissantes']),
+    ('Type production ECS', ['Chauffe-eau électrique', 'Chaudière gaz']),
+    ('Type de ventilation', ['VMC SF Auto réglable après 1982', 'Ventilation par ouverture des fenêtres']),
+    ('Type de distribution', ['Réseau collectif', 'Réseau individuel']),
+    ('Altitude', ['inférieure à 400m', '400-800m']),
+    ('Zone climatique', ['H1a', 'H1b', 'H2b', 'H3']),
+    ('Année de construction', ['Avant 1948', '1949-1974', '1975-1977', '2006-2012']),
+    ('Surface de référence', ['54,3', '87']),
+    ('Orientation', ['Nord', 'Sud', 'Est / Ouest']),
+    ('Type de masque', ['Absence de masque']),
+]
+
+GENERATEURS = ['Chaudière gaz standard installée entre 1991 et 2000', 'PAC air/eau installée à partir de 2015',
+               'Convecteur électrique NFC, NF** et NF***', 'Poêle à bois bûche installé à partir de 2019']
+EMETTEURS = ['Radiateur monotube sans robinet thermostatique', 'Plancher chauffant', 'Convecteur électrique']
+ECS = ['Chauffe-eau électrique installé il y a plus de 5 ans', 'Chaudière gaz à condensation', 'Ballon thermodynamique']
+TRAVAUX = ['isolation des murs par l\'extérieur', 'remplacement des fenêtres par des fenêtres double vitrage',
+           'installation d\'une VMC hygroréglable', 'remplacement de la chaudière par une PAC air/eau',
+           'isolation des combles perdus', 'isolation du plancher bas']
+
+
+def _t(tag, value):
+    return f'<{tag}>{escape(str(value))}</{tag}>'
+
+
+def generate_dpe_xml(installations=2, packs=3, travaux=3, fiches=60, murs=8, seed=0):
+    """
+    Returns the bytes of a synthetic DPE.
+
+    installations: heating and ECS installations (each with a generator, every
+    second heating one with its own emitter), packs: pack_travaux, travaux: works
+    per pack, fiches: sous_fiche_technique entries, murs: walls in the envelope.
+    """
+    rng = random.Random(seed)
+    out = ['<?xml version="1.0" encoding="utf-8"?>',
+           '<dpe xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" version="2.4">']
+    out.append(_t('numero_dpe', f'25{rng.randint(0, 99):02d}E{rng.randint(0, 10**8):08d}X'))
+
+    year = rng.randint(2021, 2025)
+    out.append('<administratif>')
+    out.append(_t('date_visite_diagnostiqueur', f'{year}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}'))
+    out.append(_t('date_etablissement_dpe', f'{year}-0{rng.randint(1, 9)}-2{rng.randint(0, 8)}'))
+    out.append('<diagnostiqueur><nom_diagnostiqueur>Dupont</nom_diagnostiqueur><numero_certification_diagnostiqueur>C1234</numero_certification_diagnostiqueur></diagnostiqueur>')
+    out.append('<geolocalisation><adresses><adresse_bien>')
+    out.append(_t('label_brut', f'{rng.randint(1, 120)} rue de la République {rng.choice(["69001 Lyon", "75011 Paris", "13001 Marseille"])}'))
+    out.append(_t('enum_statut_geocodage_ban_id', 1))
+    out.append('</adresse_bien></adresses></geolocalisation>')
+    out.append(_t('enum_modele_dpe_id', 1))
+    out.append('</administratif>')
+
+    out.append('<logement>')
+    out.append('<caracteristique_generale>')
+    out.append(_t('annee_construction', rng.randint(1850, 2020)))
+    out.append(_t('enum_periode_construction_id', rng.randint(1, 10)))
+    out.append(_t('enum_methode_application_dpe_log_id', 2))
+    out.append(_t('surface_habitable_logement', round(rng.uniform(18, 180), 1)))
+    out.append(_t('nombre_niveau_logement', rng.randint(1, 3)))
+    out.append(_t('hsp', 2.5))
+    out.append('</caracteristique_generale>')
+    out.append('<meteo>' + _t('enum_zone_climatique_id', rng.randint(1, 8)) + _t('enum_classe_altitude_id', rng.randint(1, 3))
+               + _t('batiment_materiaux_anciens', 0) + '</meteo>')
+
+    out.append('<enveloppe><inertie>' + _t('inertie_plancher_bas_lourd', 1) + _t('enum_classe_inertie_id', rng.randint(1, 4)) + '</inertie>')
+    out.append('<mur_collection>')
+    for i in range(murs):
+        out.append('<mur><donnee_entree>' + _t('description', f'Mur {i} Nord, Est, Sud, Ouest - non isolé')
+                   + _t('surface_paroi_opaque', round(rng.uniform(5, 40), 2)) + _t('enum_materiaux_structure_mur_id', rng.randint(1, 20))
+                   + '</donnee_entree><donnee_intermediaire>' + _t('umur', round(rng.uniform(0.3, 2.5), 2)) + _t('b', 1)
+                   + '</donnee_intermediaire></mur>')
+    out.append('</mur_collection><baie_vitree_collection>')
+    for i in range(max(1, murs // 2)):
+        out.append('<baie_vitree><donnee_entree>' + _t('description', f'Fenêtre {i} - double vitrage') + _t('surface_totale_baie', round(rng.uniform(1, 4), 2))
+                   + '</donnee_entree></baie_vitree>')
+    out.append('</baie_vitree_collection></enveloppe>')
+
+    out.append('<ventilation_collection><ventilation><donnee_entree>' + _t('description', 'VMC simple flux autoréglable')
+               + '</donnee_entree></ventilation></ventilation_collection>')
+
+    out.append('<installation_chauffage_collection>')
+    for i in range(installations):
+        out.append('<installation_chauffage><donnee_entree>')
+        out.append(_t('description', f'Installation {i + 1} Emetteur(s): {rng.choice(EMETTEURS).lower()}'))
+        out.append(_t('surface_chauffee', round(rng.uniform(18, 180), 1)))
+        out.append('</donnee_entree><generateur_chauffage_collection><generateur_chauffage><donnee_entree>')
+        out.append(_t('description', rng.choice(GENERATEURS)) + _t('enum_type_generateur_ch_id', rng.randint(1, 170)))
+        out.append('</donnee_entree><donnee_intermediaire>' + _t('conso_ch', round(rng.uniform(1000, 20000), 1))
+                   + '</donnee_intermediaire></generateur_chauffage></generateur_chauffage_collection>')
+        if i % 2:
+            out.append('<emetteur_chauffage_collection><emetteur_chauffage><donnee_entree>' + _t('description', rng.choice(EMETTEURS))
+                       + '</donnee_entree></emetteur_chauffage></emetteur_chauffage_collection>')
+        out.append('</installation_chauffage>')
+    out.append('</installation_chauffage_collection>')
+
+    out.append('<installation_ecs_collection>')
+    for i in range(installations):
+        out.append('<installation_ecs><donnee_entree>' + _t('description', f'Installation ECS {i + 1}') + '</donnee_entree>')
+        out.append('<generateur_ecs_collection><generateur_ecs><donnee_entree>' + _t('description', rng.choice(ECS))
+                   + '</donnee_entree></generateur_ecs></generateur_ecs_collection></installation_ecs>')
+    out.append('</installation_ecs_collection>')
+
+    conso = rng.uniform(40, 600)
+    out.append('<sortie><deperdition>')
+    for tag in ('deperdition_mur', 'deperdition_plancher_haut', 'deperdition_plancher_bas', 'deperdition_baie_vitree',
+                'deperdition_porte', 'deperdition_pont_thermique', 'deperdition_renouvellement_air'):
+        out.append(_t(tag, round(rng.uniform(0, 80), 2)))
+    out.append('</deperdition><ep_conso>')
+    out.append(_t('ep_conso_ch', round(conso * 0.7, 1)) + _t('ep_conso_5_usages', round(conso * 60, 1)))
+    out.append(_t('ep_conso_5_usages_m2', round(conso, 1)) + _t('classe_bilan_dpe', rng.choice('ABCDEFG')))
+    out.append('</ep_conso><emission_ges>')
+    out.append(_t('emission_ges_5_usages_m2', round(rng.uniform(2, 120), 1)) + _t('classe_emission_ges', rng.choice('ABCDEFG')))
+    out.append('</emission_ges></sortie>')
+    out.append('<production_elec_enr xsi:nil="true"/>')
+    out.append('</logement>')
+
+    out.append('<descriptif_travaux><pack_travaux_collection>')
+    for p in range(packs):
+        out.append('<pack_travaux>' + _t('enum_num_pack_travaux_id', p + 1))
+        low = rng.randint(50, 500)
+        out.append(_t('cout_pack_travaux_min', low) + _t('cout_pack_travaux_max', low + rng.randint(50, 800)))
+        out.append(_t('conso_5_usages_apres_travaux', round(conso * rng.uniform(0.2, 0.9), 1)))
+        out.append(_t('emission_ges_5_usages_apres_travaux', round(rng.uniform(1, 60), 1)))
+        out.append('<travaux_collection>')
+        for _ in range(travaux):
+            out.append('<travaux>' + _t('enum_lot_travaux_id', rng.randint(1, 10)) + _t('description_travaux', rng.choice(TRAVAUX))
+                       + _t('performance_recommande', f'R > {rng.randint(3, 7)},5 m².K/W') + '</travaux>')
+        out.append('</travaux_collection></pack_travaux>')
+    out.append('</pack_travaux_collection></descriptif_travaux>')
+
+    out.append('<fiche_technique_collection>')
+    per_fiche = 20
+    for start in range(0, fiches, per_fiche):
+        out.append('<fiche_technique>' + _t('enum_categorie_fiche_technique_id', start // per_fiche + 1) + '<sous_fiche_technique_collection>')
+        for i in range(start, min(fiches, start + per_fiche)):
+            desc, values = FICHE_DESCRIPTIONS[i % len(FICHE_DESCRIPTIONS)]
+            out.append('<sous_fiche_technique>' + _t('description', desc) + _t('valeur', rng.choice(values))
+                       + _t('detail_origine_donnee', 'observée ou mesurée') + '</sous_fiche_technique>')
+        out.append('</sous_fiche_technique_collection></fiche_technique>')
+    out.append('</fiche_technique_collection>')
+
+    out.append('</dpe>')
+    return '\n'.join(out).encode('utf-8')
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Génère des fichiers DPE XML synthétiques.")
+    ap.add_argument('-o', '--output', required=True, help="Dossier de sortie")
+    ap.add_argument('--count', type=int, default=1)
+    ap.add_argument('--installations', type=int, default=2)
+    ap.add_argument('--packs', type=int, default=3)
+    ap.add_argument('--travaux', type=int, default=3)
+    ap.add_argument('--fiches', type=int, default=60)
+    ap.add_argument('--murs', type=int, default=8)
+    ap.add_argument('--seed', type=int, default=0)
+    args = ap.parse_args(argv)
+
+    os.makedirs(args.output, exist_ok=True)
+    for i in range(args.count):
+        content = generate_dpe_xml(args.installations, args.packs, args.travaux, args.fiches, args.murs, seed=args.seed + i)
+        with open(os.path.join(args.output, f'synthetique_{i:06d}.xml'), 'wb') as f:
+            f.write(content)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+import sys
+
+from src.bulk import main
+
+if __name__ == '__main__':
+    # Ex: python bulk_parse.py dossier_dpe/ -o resultats.csv
+    sys.exit(main())
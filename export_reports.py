@@ -0,0 +1,7 @@
+import sys
+
+from src.report_export import main
+
+if __name__ == '__main__':
+    # Ex: python export_reports.py dossier_dpe/ -o rapports/ --pdf
+    sys.exit(main())
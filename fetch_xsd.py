@@ -0,0 +1,7 @@
+import sys
+
+from src.validation import main
+
+if __name__ == '__main__':
+    # Ex: python fetch_xsd.py https://.../DPE.xsd   (écrit schemas/dpe.xsd)
+    sys.exit(main())
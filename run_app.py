@@ -1,7 +1,55 @@
-from nicegui import ui
-import src.nice_ui # To ensure the page is registered
+import argparse
+import os
+import secrets
+
+from nicegui import app, ui
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Lecteur DPE (interface web et API JSON).")
+    ap.add_argument('--prod', action='store_true', default=os.environ.get('DPE_PROD', '0') not in ('0', 'false', 'no', ''),
+                    help="Mode production: sans rechargement automatique, analyses dans un pool de processus préchauffé (DPE_PROD=1)")
+    ap.add_argument('--host', default=os.environ.get('DPE_HOST'),
+                    help="Adresse d'écoute (DPE_HOST, défaut: 127.0.0.1, 0.0.0.0 en production)")
+    ap.add_argument('--port', type=int, default=int(os.environ.get('DPE_PORT', 8080)), help="Port (DPE_PORT, défaut: 8080)")
+    ap.add_argument('--workers', type=int, default=None,
+                    help="Processus d'analyse (DPE_PARSE_WORKERS, défaut: nombre de coeurs)")
+    ap.add_argument('--pool-size', type=int, default=None,
+                    help="Analyses simultanées au maximum (DPE_PARSE_MAX_CONCURRENT, défaut: nombre de processus)")
+    ap.add_argument('--graceful-timeout', type=float, default=float(os.environ.get('DPE_GRACEFUL_TIMEOUT', 30)),
+                    help="Délai laissé aux requêtes en cours à l'arrêt, en secondes (DPE_GRACEFUL_TIMEOUT, défaut: 30)")
+    ap.add_argument('--storage-secret', default=os.environ.get('DPE_STORAGE_SECRET'),
+                    help="Clé de signature du cookie de session (DPE_STORAGE_SECRET, défaut: aléatoire à chaque lancement)")
+    return ap.parse_args()
+
 
 if __name__ in {"__main__", "__mp_main__"}:
-    # native=True would open in a window, but standard browser is often preferred for local web tools
-    # user requested: "le programme ouvre une page web pour l'interaction"
-    ui.run(title="Lecteur DPE", port=8080, reload=True)
+    args = parse_args()
+
+    # The parser pool is configured from the environment when src.parse_pool is imported
+    if args.workers:
+        os.environ['DPE_PARSE_WORKERS'] = str(args.workers)
+    if args.pool_size:
+        os.environ['DPE_PARSE_MAX_CONCURRENT'] = str(args.pool_size)
+    if args.prod:
+        # NiceGUI keeps each client's state in its server process, so the UI runs in a single
+        # event loop; the CPU-bound parsing is what gets spread over every core
+        os.environ.setdefault('DPE_PARSE_EXECUTOR', 'process')
+        os.environ.setdefault('DPE_PARSE_DRAIN', '1')
+
+    import src.nice_ui # To ensure the page is registered
+    import src.api # JSON endpoints (/api/...)
+    from src.parse_pool import parse_pool
+
+    # The session cookie identifies each browser, for the results kept across reloads (src.sessions);
+    # these results live in memory, so a random key per launch loses nothing
+    storage_secret = args.storage_secret or secrets.token_urlsafe(32)
+
+    if args.prod:
+        app.on_startup(parse_pool.warm)
+        ui.run(title="Lecteur DPE", host=args.host or '0.0.0.0', port=args.port, reload=False, show=False,
+               timeout_graceful_shutdown=args.graceful_timeout, storage_secret=storage_secret)
+    else:
+        # native=True would open in a window, but standard browser is often preferred for local web tools
+        # user requested: "le programme ouvre une page web pour l'interaction"
+        ui.run(title="Lecteur DPE", host=args.host, port=args.port, reload=True, storage_secret=storage_secret)
@@ -0,0 +1,230 @@
+"""
+JSON endpoints for other services, served next to the NiceGUI pages
+(no UI element is built for these requests).
+
+    POST /api/parse                 one XML (raw body or multipart field)   -> JSON
+                                    ?valider=1: + 'validation', the XSD problems (src.validation)
+    POST /api/parse/batch           several files and/or archives           -> NDJSON stream
+    GET  /api/etiquette/{echelle}   ?valeur=...&classe=...                  -> SVG
+    GET  /api/etiquette/{echelle}/{classe}/{valeur}.svg                     -> SVG (cache illimité)
+"""
+import asyncio
+import hashlib
+import math
+from functools import lru_cache
+from itertools import islice
+
+import orjson
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+from nicegui import app
+
+from src.archives import is_multi_archive, iter_archive_members
+from src.dpe_label_generator import SVG_CACHE_SIZE, render_scale_svg
+from src.parse_pool import ParserBusy, parse_pool
+from src.parser import MAX_XML_BYTES
+from src.thresholds import CLASSES, classify
+from src.uploads import UploadTooLarge, receive_upload
+from src.validation import validate_dpe_file
+
+JSON_TYPE = 'application/json'
+NDJSON_TYPE = 'application/x-ndjson'
+
+
+def dumps(data):
+    """orjson with the same fallback as the UI's json.dumps(default=str)."""
+    return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+def json_response(data, status_code=200):
+    return Response(dumps(data), status_code=status_code, media_type=JSON_TYPE)
+
+
+async def _file_chunks(upload_file, chunk_size=256 * 1024):
+    while chunk := await upload_file.read(chunk_size):
+        yield chunk
+
+
+async def read_files(request):
+    """
+    Returns [SpooledUpload] from a multipart form (every file field) or from
+    the raw body (named by the `nom` query parameter); the caller closes them.
+    Raises UploadTooLarge when a file exceeds MAX_UPLOAD_BYTES.
+    """
+    files = []
+    try:
+        if request.headers.get('content-type', '').startswith('multipart/form-data'):
+            async with request.form() as form:
+                for _, value in form.multi_items():
+                    if hasattr(value, 'read'):
+                        files.append(await receive_upload(_file_chunks(value), value.filename or 'fichier.xml'))
+        else:
+            upload = await receive_upload(request.stream(), request.query_params.get('nom', 'fichier.xml'))
+            if upload.size:
+                files.append(upload)
+    except BaseException:
+        close_files(files)
+        raise
+    return files
+
+
+def close_files(files):
+    for upload in files:
+        upload.close()
+
+
+async def parse_one(content):
+    """(status code, data) for one XML document."""
+    try:
+        data = await parse_pool.parse(content)
+    except ParserBusy:
+        return 503, {'error': "Serveur occupé, veuillez réessayer dans quelques instants."}
+    except asyncio.TimeoutError:
+        return 504, {'error': "Analyse trop longue, fichier abandonné."}
+    return (422 if 'error' in data else 200), data
+
+
+def validate_upload(upload):
+    with upload.open() as source:
+        return validate_dpe_file(source)
+
+
+@app.post('/api/parse')
+async def parse_endpoint(request: Request):
+    """
+    Parses one DPE XML and returns the parse_dpe_file dict as JSON, with the
+    list of its XSD problems under 'validation' when `valider` is set.
+    """
+    validate = request.query_params.get('valider', '0') not in ('0', 'false', 'non', '')
+    try:
+        files = await read_files(request)
+    except UploadTooLarge as e:
+        return json_response({'error': str(e)}, 413)
+    try:
+        if len(files) != 1:
+            return json_response({'error': "Un fichier XML est attendu."}, 400)
+        status, data = await parse_one(files[0])
+        if validate and status == 200:
+            try:
+                data = {**data, 'validation': await asyncio.to_thread(validate_upload, files[0])}
+            except RuntimeError as e:  # lxml or the schema missing
+                return json_response({'error': str(e)}, 501)
+    finally:
+        close_files(files)
+    return json_response(data, status)
+
+
+async def iter_documents(files):
+    """
+    Yields windows of (name, SpooledUpload or XML bytes), archives being read
+    member by member off the event loop.
+    """
+    window = []
+    for upload in files:
+        name = upload.name
+        if not is_multi_archive(name, upload.head()):
+            window.append((name, upload))
+            if len(window) >= parse_pool.max_concurrent:
+                yield window
+                window = []
+            continue
+        with upload.open() as source:
+            members = iter_archive_members(source, name, max_bytes=MAX_XML_BYTES, errors=True)
+            while True:
+                try:
+                    batch = await asyncio.to_thread(lambda: list(islice(members, parse_pool.max_concurrent)))
+                except Exception as e:
+                    window.append((name, {'error': f"Archive illisible: {str(e)}"}))
+                    break
+                if not batch:
+                    break
+                window.extend((f"{name}/{member}", xml) for member, xml in batch)
+                if len(window) >= parse_pool.max_concurrent:
+                    yield window
+                    window = []
+    if window:
+        yield window
+
+
+async def _parse_entry(name, content):
+    if isinstance(content, dict):  # Unreadable archive or member
+        return {'fichier': name, **content}
+    _, data = await parse_one(content)
+    return {'fichier': name, **data}
+
+
+@app.post('/api/parse/batch')
+async def parse_batch_endpoint(request: Request):
+    """
+    Parses several XML files and/or archives (.zip, .tar.gz...) and streams one
+    JSON line per DPE, in order, as soon as each window of files is parsed.
+    """
+    try:
+        files = await read_files(request)
+    except UploadTooLarge as e:
+        return json_response({'error': str(e)}, 413)
+    if not files:
+        return json_response({'error': "Aucun fichier reçu."}, 400)
+
+    async def lines():
+        try:
+            async for window in iter_documents(files):
+                for entry in await asyncio.gather(*(_parse_entry(name, content) for name, content in window)):
+                    yield dumps(entry) + b'\n'
+        finally:
+            close_files(files)
+
+    # Also cleaned up when the client goes away before the stream starts
+    return StreamingResponse(lines(), media_type=NDJSON_TYPE, background=BackgroundTask(close_files, files))
+
+
+ECHELLES = {'energie': ('dpe', 'energy'), 'climat': ('ges', 'ges')}
+SVG_TYPE = 'image/svg+xml'
+# Versioned URLs (label_url) never change content; the query form may change with the rendering code
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=86400'
+
+
+@lru_cache(maxsize=SVG_CACHE_SIZE)
+def _label(scale, classe, valeur):
+    """(SVG bytes, strong ETag) of a label; the ETag is a hash of the bytes."""
+    svg = render_scale_svg(scale, valeur, classe).encode()
+    return svg, f'"{hashlib.sha256(svg).hexdigest()[:32]}"'
+
+
+def svg_response(request, scale, classe, valeur, cache_control):
+    svg, etag = _label(scale, classe, valeur)
+    headers = {'ETag': etag, 'Cache-Control': cache_control}
+    if etag in request.headers.get('if-none-match', ''):
+        return Response(status_code=304, headers=headers)
+    return Response(svg, media_type=SVG_TYPE, headers=headers)
+
+
+def unknown_scale(echelle):
+    return json_response({'error': f"Échelle inconnue: {echelle} (energie ou climat)"}, 404)
+
+
+@app.get('/api/etiquette/{echelle}/{classe}/{valeur}.svg')
+def label_file_endpoint(request: Request, echelle: str, classe: str, valeur: int):
+    """
+    SVG label addressed by scale, class and integer value (see label_url);
+    '-' as class gives the scale without arrow.
+    """
+    if echelle not in ECHELLES:
+        return unknown_scale(echelle)
+    classe = classe.upper()
+    if classe not in CLASSES:
+        classe, valeur = '-', 0
+    return svg_response(request, ECHELLES[echelle][0], classe, valeur, IMMUTABLE)
+
+
+@app.get('/api/etiquette/{echelle}')
+def label_endpoint(request: Request, echelle: str, valeur: float, classe: str = None):
+    """SVG label of the 'energie' or 'climat' scale; the class is computed from the value when omitted."""
+    if echelle not in ECHELLES:
+        return unknown_scale(echelle)
+    if not math.isfinite(valeur):
+        return json_response({'error': f"Valeur invalide: {valeur} (nombre fini attendu)"}, 422)
+    scale, type = ECHELLES[echelle]
+    return svg_response(request, scale, (classe or classify(valeur, type)).upper(), int(valeur), REVALIDATE)
@@ -0,0 +1,164 @@
+import gzip
+import io
+import os
+import tarfile
+import zipfile
+import zlib
+
+from src.utils import format_size
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar.gz', '.tgz', '.tar', '.xml.gz')
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZIP_MAGIC = b'PK\x03\x04'
+
+
+def is_archive(name):
+    """True if the file name looks like a supported archive."""
+    return name.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def is_multi_archive(name, content=b''):
+    """
+    True for archives that may hold several DPEs (.zip, .tar, .tar.gz), by
+    name or by content; single .xml.gz files are read by parse_dpe_file itself.
+    """
+    lower = (name or '').lower()
+    if lower.endswith(('.zip', '.tar.gz', '.tgz', '.tar')):
+        return True
+    if content[:4] == ZIP_MAGIC:
+        return True
+    return content[:2] == GZIP_MAGIC and _is_tar(io.BytesIO(content))
+
+
+def _peek(fileobj, size):
+    pos = fileobj.tell()
+    head = fileobj.read(size)
+    fileobj.seek(pos)
+    return head
+
+
+def open_xml_source(source):
+    """
+    Returns something ET.parse / ET.iterparse can read, transparently
+    decompressing gzip (by `.gz` suffix for paths, by magic bytes for
+    seekable file objects).
+    """
+    if isinstance(source, (str, os.PathLike)):
+        return gzip.open(source) if str(source).lower().endswith('.gz') else source
+    if hasattr(source, 'seekable') and source.seekable() and _peek(source, 2) == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=source)
+    return source
+
+
+def _is_xml_member(name):
+    base = os.path.basename(name)
+    return not base.startswith('.') and base.lower().endswith(('.xml', '.xml.gz'))
+
+
+def _read_limited(fileobj, name, max_bytes):
+    """Reads a member, refusing more than `max_bytes` (decompressed) so that zip bombs stay bounded."""
+    if not max_bytes:
+        return fileobj.read()
+    content = fileobj.read(max_bytes + 1)
+    if len(content) > max_bytes:
+        raise ValueError(f"{name} : fichier trop volumineux une fois décompressé (limite: {format_size(max_bytes)})")
+    return content
+
+
+def _maybe_gunzip(name, content, max_bytes=None):
+    if name.lower().endswith('.gz') or content[:2] == GZIP_MAGIC:
+        with gzip.GzipFile(fileobj=io.BytesIO(content)) as gz:
+            return _read_limited(gz, name, max_bytes)
+    return content
+
+
+# Failures confined to one member (too large, corrupt gzip, bad CRC): the next members can still be read
+MEMBER_ERRORS = (ValueError, OSError, EOFError, zlib.error, zipfile.BadZipFile)
+
+
+def _read_member(open_member, name, max_bytes, errors):
+    try:
+        with open_member() as member:
+            content = _read_limited(member, name, max_bytes)
+        return _maybe_gunzip(name, content, max_bytes)
+    except MEMBER_ERRORS as e:
+        if not errors:
+            raise
+        return {'error': f"Fichier illisible dans l'archive: {str(e)}"}
+
+
+def iter_archive_members(source, name=None, max_bytes=None, errors=False):
+    """
+    Yields (member name, XML bytes) for each XML file of a .zip, .tar(.gz)
+    or .xml.gz archive, one member at a time (nothing is extracted to disk).
+
+    `source` is a path or a binary file object; `name` helps to detect the
+    format of file objects (magic bytes are used otherwise). With `max_bytes`,
+    a member larger than that once decompressed raises ValueError.
+
+    With `errors`, a member that cannot be read is yielded with an error dict
+    instead of its bytes and the next members are still read; only failures
+    of the archive itself raise.
+    """
+    label = name or (str(source) if isinstance(source, (str, os.PathLike)) else '')
+    lower = label.lower()
+
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            yield from iter_archive_members(f, label, max_bytes, errors)
+        return
+
+    head = _peek(source, 4) if source.seekable() else b''
+    if lower.endswith('.zip') or head == ZIP_MAGIC:
+        with zipfile.ZipFile(source) as zf:
+            for info in zf.infolist():
+                if not info.is_dir() and _is_xml_member(info.filename):
+                    yield info.filename, _read_member(lambda: zf.open(info), info.filename, max_bytes, errors)
+    elif lower.endswith(('.tar.gz', '.tgz', '.tar')) or (head[:2] == GZIP_MAGIC and not lower.endswith('.xml.gz')
+                                                            and _is_tar(source)):
+        # Stream mode: members are read in order, no random access needed
+        with tarfile.open(fileobj=source, mode='r|*') as tf:
+            for member in tf:
+                if member.isfile() and _is_xml_member(member.name):
+                    yield member.name, _read_member(lambda: tf.extractfile(member), member.name, max_bytes, errors)
+    elif head[:2] == GZIP_MAGIC or lower.endswith('.gz'):
+        member = os.path.basename(label)[:-3] if lower.endswith('.gz') else 'dpe.xml'
+        yield member, _read_limited(gzip.GzipFile(fileobj=source), member, max_bytes)
+    else:
+        raise ValueError(f"Format d'archive non supporté: {label or '?'}")
+
+
+def _is_tar(fileobj):
+    """True if a gzip file object contains a tar archive (checks the 'ustar' magic)."""
+    pos = fileobj.tell()
+    try:
+        with gzip.GzipFile(fileobj=fileobj) as gz:
+            block = gz.read(512)
+        return len(block) == 512 and block[257:262] == b'ustar'
+    except (OSError, EOFError, zlib.error):  # Truncated or corrupt gzip: not a tar we can read
+        return False
+    finally:
+        fileobj.seek(pos)
+
+
+def count_archive_members(path):
+    """Number of XML members for zip and single gzip files, None when it needs a full pass (tar)."""
+    lower = str(path).lower()
+    if lower.endswith('.zip'):
+        with zipfile.ZipFile(path) as zf:
+            return sum(1 for info in zf.infolist() if not info.is_dir() and _is_xml_member(info.filename))
+    if lower.endswith('.xml.gz'):
+        return 1
+    return None
+
+
+def parse_dpe_archive(source, name=None, streaming=True):
+    """
+    Yields (member name, data) for every DPE of an archive.
+    Members are parsed one after the other; see src.bulk for the parallel version.
+    """
+    from src.parser import parse_dpe_file
+
+    for member, content in iter_archive_members(source, name):
+        yield member, parse_dpe_file(io.BytesIO(content), streaming=streaming)
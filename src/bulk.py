@@ -0,0 +1,349 @@
+import argparse
+import csv
+import glob
+import io
+import json
+import os
+import sys
+import tarfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from src.archives import ARCHIVE_SUFFIXES, count_archive_members, is_archive, iter_archive_members
+from src.columnar import FORMATS as COLUMNAR_FORMATS, ColumnarWriter
+from src.parser import MAX_XML_BYTES, parse_dpe_file
+from src.store import DpeStore
+from src.validation import load_schema, validate_dpe_file
+
+# Columns written in CSV mode (nested values are JSON-encoded)
+CSV_FIELDS = [
+    'fichier', 'dpe_id', 'date', 'date_fin_validite', 'adresse',
+    'surface', 'nombre_niveaux', 'annee_construction', 'periode_construction',
+    'conso_kwh', 'classe_energie', 'conso_ges', 'classe_climat',
+    'zone_climatique_id', 'zone_climatique', 'altitude_id', 'altitude',
+    'chauffage_type', 'chauffage_generateur', 'chauffage_emetteur', 'chauffage_distribution',
+    'ecs_type', 'ventilation_type', 'hsp', 'mur_materiaux', 'isolation_type',
+    'plancher_bas_type', 'plancher_haut_type', 'vitrage_type', 'baie_type',
+    'inertie_id', 'has_enr', 'deperditions', 'packs_travaux',
+]
+
+
+def collect_files(inputs):
+    """
+    Expands directories (recursively), glob patterns and plain paths
+    into a sorted list of XML files and archives (.zip, .tar.gz, .xml.gz...).
+    """
+    files = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for pattern in ('*.xml',) + tuple(f'*{suffix}' for suffix in ARCHIVE_SUFFIXES):
+                files.update(glob.glob(os.path.join(item, '**', pattern), recursive=True))
+        elif os.path.isfile(item):
+            files.add(item)
+        else:
+            files.update(p for p in glob.glob(item, recursive=True) if os.path.isfile(p))
+    return sorted(files)
+
+
+def _reads_directly(path):
+    """Plain XML and single .xml.gz files are opened by parse_dpe_file in the worker."""
+    return not is_archive(path) or path.lower().endswith('.xml.gz')
+
+
+def iter_tasks(paths):
+    """
+    Yields (label, payload) for each DPE: payload is a path for files the
+    worker can open itself, the XML bytes of an archive member (label
+    'archive.zip!member.xml'), or an error dict for unreadable archives
+    and members (the next members of an archive are still read).
+    """
+    for path in paths:
+        if _reads_directly(path):
+            yield path, path
+            continue
+        try:
+            for member, content in iter_archive_members(path, errors=True):
+                yield f"{path}!{member}", content
+        except (OSError, ValueError, EOFError, zipfile.BadZipFile, tarfile.TarError) as e:
+            yield path, {'error': f"Archive illisible: {str(e)}"}
+
+
+def count_tasks(paths):
+    """Number of DPEs to parse, or None if unknown without a full pass (tar archives)."""
+    total = 0
+    for path in paths:
+        if _reads_directly(path):
+            total += 1
+            continue
+        try:
+            count = count_archive_members(path)
+        except (OSError, zipfile.BadZipFile):
+            count = 1  # Reported as one error
+        if count is None:
+            return None
+        total += count
+    return total
+
+
+def parse_task(task):
+    """Worker: parses one file or archive member, never raises."""
+    label, payload = task
+    if isinstance(payload, dict):
+        return label, payload
+    try:
+        source = payload if isinstance(payload, str) else io.BytesIO(payload)
+        return label, parse_dpe_file(source, streaming=True)
+    except Exception as e:
+        return label, {'error': f"Erreur: {str(e)}"}
+
+
+def parse_batch(tasks):
+    return [parse_task(task) for task in tasks]
+
+
+def validate_task(task, data):
+    """Worker: XSD problems of a successfully parsed file or archive member (see src.validation)."""
+    if 'error' in data:
+        return []
+    _, payload = task
+    try:
+        source = payload if isinstance(payload, str) else io.BytesIO(payload)
+        return validate_dpe_file(source)
+    except Exception as e:
+        return [{'ligne': None, 'chemin': None, 'message': f"Validation impossible: {str(e)}"}]
+
+
+def _read_task(task):
+    """
+    The task with its file read into memory, so that the parse and the
+    validation share a single read. Files over MAX_XML_BYTES stay as a path:
+    the parser refuses them after reading no more than the limit.
+    """
+    label, payload = task
+    if not isinstance(payload, str):
+        return task
+    try:
+        if MAX_XML_BYTES and os.path.getsize(payload) > MAX_XML_BYTES:
+            return task
+        with open(payload, 'rb') as f:
+            return label, f.read()
+    except OSError as e:
+        return label, {'error': f"Erreur: {str(e)}"}
+
+
+def parse_validate_batch(tasks):
+    """parse_batch, each data dict coming with its list of XSD problems: (label, data, problems)."""
+    results = []
+    for task in tasks:
+        task = _read_task(task)
+        label, data = parse_task(task)
+        results.append((label, data, validate_task(task, data)))
+    return results
+
+
+def iter_parse(paths, workers=None, chunksize=16, max_in_flight=None, handler=parse_batch):
+    """
+    Parses the files (and archive members) across a process pool.
+    Yields (label, data) in input order.
+
+    Archive members are read in the main process and sent to the workers in
+    batches of `chunksize`; at most `max_in_flight` batches (default: twice
+    the number of workers) are pending at once, which bounds memory use.
+    `handler` is the (picklable) function run on each batch of tasks.
+    """
+    tasks = iter_tasks(paths)
+    if workers == 1:
+        for task in tasks:
+            yield from handler([task])
+        return
+
+    max_in_flight = max_in_flight or 2 * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        while True:
+            batch = list(islice(tasks, chunksize))
+            if not batch:
+                break
+            pending.append(pool.submit(handler, batch))
+            if len(pending) >= max_in_flight:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+class JsonlWriter:
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, path, data):
+        self.f.write(json.dumps({'fichier': path, **data}, ensure_ascii=False, default=str) + '\n')
+
+
+class CsvWriter:
+    def __init__(self, f):
+        self.writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction='ignore')
+        self.writer.writeheader()
+
+    def write(self, path, data):
+        row = {'fichier': path, **data}
+        for key in ('deperditions', 'packs_travaux'):
+            row[key] = json.dumps(row.get(key), ensure_ascii=False)
+        self.writer.writerow(row)
+
+
+class SqliteWriter:
+    """Writes into a DpeStore, one transaction per `batch_size` files."""
+
+    def __init__(self, store, batch_size=1000):
+        self.store = store
+        self.batch_size = batch_size
+        self.batch = []
+
+    def write(self, path, data):
+        self.batch.append((path, data))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        self.store.add_many(self.batch, self.batch_size)
+        self.batch = []
+
+
+WRITERS = {'jsonl': JsonlWriter, 'csv': CsvWriter, 'sqlite': SqliteWriter}
+
+
+def run(paths, writer, workers=None, chunksize=16, progress=sys.stderr, max_in_flight=None, validation=None):
+    """
+    Parses `paths` and writes every successful result with `writer`.
+    Returns a summary dict with counters and the per-file errors.
+
+    With a `validation` text file, every parsed DPE is also validated against
+    the XSD schema and the files with problems are written to it as JSON
+    lines ({'fichier': ..., 'problemes': [...]}).
+    """
+    total = count_tasks(paths)
+    errors = []
+    invalid = 0
+    done = 0
+    start = time.perf_counter()
+    last_report = 0.0
+
+    if validation is not None:
+        load_schema()  # Compiled before the pool starts: the forked workers inherit it
+        results = iter_parse(paths, workers, chunksize, max_in_flight, handler=parse_validate_batch)
+    else:
+        results = ((path, data, None) for path, data in iter_parse(paths, workers, chunksize, max_in_flight))
+
+    for path, data, problems in results:
+        done += 1
+        if 'error' in data:
+            errors.append((path, data['error']))
+        else:
+            writer.write(path, data)
+        if problems:
+            invalid += 1
+            validation.write(json.dumps({'fichier': path, 'problemes': problems}, ensure_ascii=False) + '\n')
+
+        now = time.perf_counter()
+        if progress and (now - last_report >= 1.0 or done == total):
+            last_report = now
+            rate = done / (now - start) if now > start else 0.0
+            count = f"{done}/{total}" if total is not None else str(done)
+            checked = f" - {invalid} non conformes" if validation is not None else ''
+            progress.write(f"\r{count} fichiers - {rate:.1f} fichiers/s - {len(errors)} erreurs{checked}")
+            progress.flush()
+
+    if hasattr(writer, 'flush'):
+        writer.flush()
+    elapsed = time.perf_counter() - start
+    if progress and done:
+        progress.write('\n')
+    return {
+        'total': done,
+        'ok': done - len(errors),
+        'errors': errors,
+        'invalid': invalid,
+        'elapsed': elapsed,
+        'files_per_second': done / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Analyse en masse de fichiers DPE (XML, ou archives .zip, .tar.gz, .xml.gz).")
+    ap.add_argument('inputs', nargs='+', help="Dossiers, fichiers, archives ou motifs glob (ex: 'dpe/**/*.xml')")
+    ap.add_argument('-o', '--output', default='-', help="Fichier de sortie (défaut: stdout)")
+    ap.add_argument('-f', '--format', choices=sorted([*WRITERS, *COLUMNAR_FORMATS]), default=None,
+                    help="Format de sortie (déduit de l'extension .csv/.sqlite/.db/.parquet/.arrow, sinon jsonl)")
+    ap.add_argument('-j', '--workers', type=int, default=None, help="Nombre de processus (défaut: nombre de coeurs)")
+    ap.add_argument('--chunksize', type=int, default=16, help="Fichiers envoyés par lot à chaque processus")
+    ap.add_argument('--max-in-flight', type=int, default=None,
+                    help="Lots en attente au maximum (borne la mémoire, défaut: 2 x processus)")
+    ap.add_argument('--row-group-size', type=int, default=10000,
+                    help="DPE par groupe de lignes en Parquet / Arrow (défaut: 10000)")
+    ap.add_argument('--valider', metavar='RAPPORT',
+                    help="Valider aussi chaque DPE avec le schéma XSD de l'Ademe (DPE_XSD, nécessite lxml) "
+                         "et écrire les problèmes dans ce fichier JSON lines")
+    ap.add_argument('-q', '--quiet', action='store_true', help="Pas d'affichage de progression")
+    args = ap.parse_args(argv)
+
+    fmt = args.format
+    if fmt is None:
+        ext = os.path.splitext(args.output.lower())[1]
+        fmt = 'csv' if ext == '.csv' else 'sqlite' if ext in ('.sqlite', '.db') else 'jsonl'
+        fmt = next((name for name, suffix in COLUMNAR_FORMATS.items() if ext == suffix), fmt)
+
+    paths = collect_files(args.inputs)
+    if not paths:
+        print("Aucun fichier XML ou archive trouvé.", file=sys.stderr)
+        return 1
+
+    progress = None if args.quiet else sys.stderr
+    validation = None
+    if args.valider:
+        try:
+            load_schema()
+        except RuntimeError as e:
+            ap.error(str(e))
+        validation = open(args.valider, 'w', encoding='utf-8')
+
+    def run_with(writer):
+        return run(paths, writer, args.workers, args.chunksize, progress, args.max_in_flight, validation)
+
+    try:
+        if fmt == 'sqlite':
+            if args.output == '-':
+                ap.error("le format sqlite nécessite un fichier de sortie (-o base.sqlite)")
+            with DpeStore(args.output) as store:
+                summary = run_with(SqliteWriter(store))
+        elif fmt in COLUMNAR_FORMATS:
+            if args.output == '-':
+                ap.error(f"le format {fmt} nécessite un fichier de sortie (-o portefeuille{COLUMNAR_FORMATS[fmt]})")
+            try:
+                writer = ColumnarWriter(args.output, fmt, args.row_group_size)
+            except RuntimeError as e:
+                ap.error(str(e))
+            with writer:
+                summary = run_with(writer)
+        elif args.output == '-':
+            summary = run_with(WRITERS[fmt](sys.stdout))
+        else:
+            with open(args.output, 'w', encoding='utf-8', newline='') as out:
+                summary = run_with(WRITERS[fmt](out))
+    finally:
+        if validation is not None:
+            validation.close()
+
+    print(f"{summary['ok']}/{summary['total']} fichiers analysés en {summary['elapsed']:.1f}s "
+          f"({summary['files_per_second']:.1f} fichiers/s)", file=sys.stderr)
+    for path, err in summary['errors']:
+        print(f"  {path}: {err}", file=sys.stderr)
+    if validation is not None:
+        print(f"{summary['invalid']} fichiers non conformes au schéma XSD (détail: {args.valider})", file=sys.stderr)
+    return 0 if not summary['errors'] else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from src.parser import PARSER_VERSION, parse_dpe_file
+
+
+class ParseCache:
+    """
+    Content-addressed cache of parse_dpe_file results.
+
+    Entries are keyed by the SHA-256 of the uploaded bytes plus PARSER_VERSION,
+    so bumping the version invalidates everything parsed by older logic.
+    Two tiers: an in-memory LRU and an optional on-disk directory of JSON
+    files that survives restarts (oldest files are evicted first). The disk
+    tier is scanned once at startup; its size is then tracked as entries are
+    written and evicted, so a write never lists the directory.
+    Returned dicts are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries=256, disk_dir=None, disk_max_bytes=200 * 1024 * 1024,
+                 version=PARSER_VERSION):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.version = version
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = OrderedDict()  # path -> size, next to evict first
+        self._disk_total = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_scan()
+
+    def key(self, content):
+        return self.digest_key(hashlib.sha256(content).hexdigest())
+
+    def digest_key(self, digest):
+        """Key of content whose SHA-256 hex digest is already known (e.g. hashed while uploading)."""
+        return f"{self.version}-{digest}"
+
+    def get(self, content):
+        """Returns the cached data for `content`, or None."""
+        return self.lookup(self.key(content))
+
+    def put(self, content, data):
+        """Stores a successful parse result (error dicts are not cached)."""
+        self.store(self.key(content), data)
+
+    def lookup(self, key):
+        """Returns the cached data for a key from key() / digest_key(), or None."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return data
+
+        data = self._disk_read(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._memory_put(key, data)
+        return data
+
+    def store(self, key, data):
+        """Stores a successful parse result under a key (error dicts are not cached)."""
+        if 'error' in data:
+            return
+        with self._lock:
+            self._memory_put(key, data)
+        self._disk_write(key, data)
+
+    def get_or_parse(self, content):
+        """Returns the parse result for `content`, parsing only on a miss."""
+        data = self.get(content)
+        if data is None:
+            data = parse_dpe_file(io.BytesIO(content))
+            self.put(content, data)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._disk.clear()
+            self._disk_total = 0
+        for path, _, _ in self._disk_entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'entries': len(self._memory),
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_total,
+                'version': self.version,
+            }
+
+    # --- Internals ---
+
+    def _memory_put(self, key, data):
+        self._memory[key] = data
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_read(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            os.utime(path)  # Refresh for oldest-first eviction after a restart
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            if path in self._disk:
+                self._disk.move_to_end(path)
+        return data
+
+    def _disk_write(self, key, data):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, default=str)
+                size = f.tell()
+            os.replace(tmp, path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_total += size - self._disk.pop(path, 0)
+            self._disk[path] = size
+        self._disk_evict()
+
+    def _disk_entries(self):
+        if not self.disk_dir:
+            return []
+        entries = []
+        with os.scandir(self.disk_dir) as it:
+            for entry in it:
+                if entry.name.endswith('.json'):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((entry.path, st.st_mtime, st.st_size))
+        return entries
+
+    def _disk_scan(self):
+        """Indexes the existing files: entries from another parser version first, then oldest first."""
+        current = f"{self.version}-"
+        entries = sorted(self._disk_entries(), key=lambda e: (os.path.basename(e[0]).startswith(current), e[1]))
+        self._disk = OrderedDict((path, size) for path, _, size in entries)
+        self._disk_total = sum(self._disk.values())
+        self._disk_evict()
+
+    def _disk_evict(self):
+        while True:
+            with self._lock:
+                if self._disk_total <= self.disk_max_bytes or not self._disk:
+                    return
+                path, size = self._disk.popitem(last=False)
+                self._disk_total -= size
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Already gone
+
+
+def _cache_from_env():
+    return ParseCache(
+        max_entries=int(os.environ.get('DPE_CACHE_SIZE', 256)),
+        disk_dir=os.environ.get('DPE_CACHE_DIR') or None,
+        disk_max_bytes=int(os.environ.get('DPE_CACHE_DISK_MB', 200)) * 1024 * 1024,
+    )
+
+# Shared cache used by the web UI (configured through environment variables)
+parse_cache = _cache_from_env()
@@ -0,0 +1,172 @@
+"""
+Columnar export of parse_dpe_file results (Parquet or Arrow IPC, requires pyarrow).
+
+Four tables, linked by `dpe_index` (order of the DPE in the export):
+
+    <nom>.parquet               one row per DPE, scalar fields
+    <nom>.packs.parquet         one row per pack_travaux
+    <nom>.travaux.parquet       one row per work of a pack
+    <nom>.deperditions.parquet  one row per (DPE, poste) share of the heat losses
+
+Repeated strings (classes, generators, materials...) are dictionary-encoded,
+and rows are written in row groups of `row_group_size` DPEs as they arrive.
+"""
+import os
+
+# Free-text columns; every other string column is dictionary-encoded
+TEXT_COLUMNS = ('fichier', 'dpe_id', 'date', 'date_fin_validite', 'adresse')
+FLOAT_COLUMNS = ('surface', 'conso_kwh', 'conso_ges')
+INT_COLUMNS = ('nombre_niveaux', 'annee_construction')
+CATEGORY_COLUMNS = (
+    'classe_energie', 'classe_climat', 'periode_construction', 'zone_climatique_id', 'zone_climatique',
+    'altitude_id', 'altitude', 'chauffage_type', 'chauffage_generateur', 'chauffage_emetteur',
+    'chauffage_distribution', 'ecs_type', 'ventilation_type', 'hsp', 'mur_materiaux', 'isolation_type',
+    'plancher_bas_type', 'plancher_haut_type', 'vitrage_type', 'baie_type', 'inertie_id',
+)
+PACK_FLOAT_COLUMNS = ('cout_min', 'cout_max', 'conso_apres', 'ges_apres')
+
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _schemas(pa):
+    category = pa.dictionary(pa.int32(), pa.string())
+    dpe = pa.schema(
+        [('dpe_index', pa.int64())]
+        + [(name, pa.string()) for name in TEXT_COLUMNS]
+        + [(name, pa.float64()) for name in FLOAT_COLUMNS]
+        + [(name, pa.int32()) for name in INT_COLUMNS]
+        + [(name, category) for name in CATEGORY_COLUMNS]
+        + [('has_enr', pa.bool_())]
+    )
+    packs = pa.schema(
+        [('dpe_index', pa.int64()), ('num', pa.int16())]
+        + [(name, pa.float64()) for name in PACK_FLOAT_COLUMNS]
+        + [('classe_energie_apres', category), ('classe_climat_apres', category)]
+    )
+    travaux = pa.schema([('dpe_index', pa.int64()), ('num', pa.int16()), ('titre', category), ('description', category)])
+    deperditions = pa.schema([('dpe_index', pa.int64()), ('poste', category), ('part', pa.int16())])
+    return {'': dpe, 'packs': packs, 'travaux': travaux, 'deperditions': deperditions}
+
+
+class ColumnarWriter:
+    """
+    Bulk writer (see src.bulk) streaming DPEs into Parquet or Arrow IPC files.
+
+    `path` is the main table file ('portefeuille.parquet'); the exploded
+    tables are written next to it ('portefeuille.packs.parquet'...).
+    """
+
+    def __init__(self, path, format='parquet', row_group_size=10000, compression='zstd'):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise RuntimeError("L'export Parquet / Arrow nécessite pyarrow (pip install pyarrow).")
+        if format not in FORMATS:
+            raise ValueError(f"Format inconnu: {format} ({', '.join(FORMATS)})")
+
+        self.pa = pa
+        self.format = format
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.schemas = _schemas(pa)
+        base, ext = os.path.splitext(path)
+        self.paths = {table: f"{base}.{table}{ext or FORMATS[format]}" if table else f"{base}{ext or FORMATS[format]}"
+                      for table in self.schemas}
+        self.writers = {}
+        self.count = 0
+        # Dictionaries only grow across row groups, so that Arrow IPC files get deltas, not replacements
+        self.dictionaries = {(table, field.name): {} for table, schema in self.schemas.items()
+                             for field in schema if pa.types.is_dictionary(field.type)}
+        self._reset()
+
+    def _reset(self):
+        self.columns = {table: {name: [] for name in schema.names} for table, schema in self.schemas.items()}
+        self.buffered = 0
+
+    def _open(self, table):
+        schema = self.schemas[table]
+        if self.format == 'parquet':
+            import pyarrow.parquet as pq
+            return pq.ParquetWriter(self.paths[table], schema, compression=self.compression)
+        options = self.pa.ipc.IpcWriteOptions(compression=self.compression, emit_dictionary_deltas=True)
+        return self.pa.ipc.new_file(self.paths[table], schema, options=options)
+
+    def write(self, path, data):
+        index = self.count
+        self.count += 1
+
+        main = self.columns['']
+        main['dpe_index'].append(index)
+        main['fichier'].append(path)
+        for name in TEXT_COLUMNS[1:] + FLOAT_COLUMNS + CATEGORY_COLUMNS:
+            main[name].append(data.get(name))
+        for name in INT_COLUMNS:
+            main[name].append(_int(data.get(name)))
+        main['has_enr'].append(data.get('has_enr'))
+
+        packs, travaux = self.columns['packs'], self.columns['travaux']
+        for pack in data.get('packs_travaux', []):
+            num = _int(pack.get('num'))
+            packs['dpe_index'].append(index)
+            packs['num'].append(num)
+            for name in PACK_FLOAT_COLUMNS:
+                packs[name].append(pack.get(name))
+            packs['classe_energie_apres'].append(pack.get('classe_energie_apres'))
+            packs['classe_climat_apres'].append(pack.get('classe_climat_apres'))
+            for t in pack.get('travaux', []):
+                if isinstance(t, dict):
+                    travaux['dpe_index'].append(index)
+                    travaux['num'].append(num)
+                    travaux['titre'].append(t.get('titre'))
+                    travaux['description'].append(t.get('description'))
+
+        deps = self.columns['deperditions']
+        for poste, part in (data.get('deperditions') or {}).items():
+            deps['dpe_index'].append(index)
+            deps['poste'].append(poste)
+            deps['part'].append(part)
+
+        self.buffered += 1
+        if self.buffered >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered DPEs as one row group of each table."""
+        if not self.buffered:
+            return
+        for table, schema in self.schemas.items():
+            columns = dict(self.columns[table])
+            for field in schema:
+                if self.pa.types.is_dictionary(field.type):
+                    columns[field.name] = self._encode(self.dictionaries[table, field.name], columns[field.name])
+            batch = self.pa.Table.from_pydict(columns, schema=schema)
+            if table not in self.writers:
+                self.writers[table] = self._open(table)
+            self.writers[table].write_table(batch)
+        self._reset()
+
+    def _encode(self, dictionary, values):
+        codes = [None if value is None else dictionary.setdefault(value, len(dictionary)) for value in values]
+        return self.pa.DictionaryArray.from_arrays(self.pa.array(codes, self.pa.int32()),
+                                                   self.pa.array(list(dictionary), self.pa.string()))
+
+    def close(self):
+        self.flush()
+        for table in self.schemas:
+            if table not in self.writers:  # Nothing written: still create the (empty) file
+                self.writers[table] = self._open(table)
+            self.writers[table].close()
+        self.writers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,128 +1,149 @@
 import base64
+import hashlib
+from functools import lru_cache
 
-def generate_dpe_svg(conso, classe):
+from src.metrics import timed
+from src.thresholds import CLASSES, SEUILS_ENERGIE, SEUILS_GES
+
+COULEURS_DPE = ('#009c6d', '#52b153', '#78bd76', '#f4e70f', '#f0b50f', '#eb8235', '#d7221f')
+COULEURS_GES = ('#A3E3F5', '#7AB1D6', '#5E8CB8', '#426899', '#2F487A', '#1F2C5C', '#10143D')
+
+
+def _paliers(couleurs, seuils):
     """
-    Génère une étiquette DPE compacte au format SVG.
-    Retourne le code SVG sous forme de chaîne.
+    Couleurs et paliers d'une échelle, à partir des seuils partagés.
+    Format: (Classe, Couleur, BorneMin, BorneMax)
+    Les bornes Max sont indicatives pour l'affichage du texte
+    """
+    bornes_min = (0,) + tuple(s + 1 for s in seuils)
+    bornes_max = seuils + (9999,)
+    return list(zip(CLASSES, couleurs, bornes_min, bornes_max))
+
+PALIERS_DPE = _paliers(COULEURS_DPE, SEUILS_ENERGIE)
+PALIERS_GES = _paliers(COULEURS_GES, SEUILS_GES)
+
+WIDTH = 350
+HEIGHT = 280
+START_Y = 65
+STEP_HEIGHT = 24
+ARROW_WIDTH_BASE = 70
+ARROW_STEP = 12
+LEFT_MARGIN = 20
+
+# Taille du cache des étiquettes rendues (clé: échelle, classe, valeur entière)
+SVG_CACHE_SIZE = 4096
+
+
+def _build_scale(titre, unite, paliers, borne_g, classes_texte_noir=()):
     """
-    
-    # Couleurs et paliers DPE
-    # Format: (Classe, Couleur, BorneMin, BorneMax)
-    # Les bornes Max sont indicatives pour l'affichage du texte
-    paliers = [
-        ('A', '#009c6d', 0, 70),
-        ('B', '#52b153', 71, 110),
-        ('C', '#78bd76', 111, 180),
-        ('D', '#f4e70f', 181, 250),
-        ('E', '#f0b50f', 251, 330),
-        ('F', '#eb8235', 331, 420),
-        ('G', '#d7221f', 421, 9999)
+    Construit une fois la partie statique d'une échelle (titre + 7 bandes).
+    Retourne (bandes, positions) où `bandes` est la liste des fragments SVG
+    (en-tête inclus) et `positions[classe]` = (index du fragment, x, y) de la flèche.
+    """
+    fragments = [
+        f'<svg width="{WIDTH}" height="{HEIGHT}" viewBox="0 0 {WIDTH} {HEIGHT}" xmlns="http://www.w3.org/2000/svg" font-family="Arial, sans-serif">'
+        f'<text x="50%" y="30" text-anchor="middle" font-weight="bold" font-size="16" fill="#333">{titre}</text>'
+        f'<text x="50%" y="48" text-anchor="middle" font-size="12" fill="#666">{unite}</text>'
     ]
+    positions = {}
+    current_y = START_Y
 
-    width = 350
-    height = 280
-    
-    svg = f'<svg width="{width}" height="{height}" viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" font-family="Arial, sans-serif">'
-    
-    
-    svg += f'<text x="50%" y="30" text-anchor="middle" font-weight="bold" font-size="16" fill="#333">Consommation</text>'
-    svg += f'<text x="50%" y="48" text-anchor="middle" font-size="12" fill="#666">(kWh/m²/an)</text>'
-    
-    start_y = 65
-    step_height = 24
-    arrow_width_base = 70
-    arrow_step = 12
-    
-    current_y = start_y
-    
     for p_classe, p_color, p_min, p_max in paliers:
-        w = arrow_width_base + (ord(p_classe) - ord('A')) * arrow_step
-        h = step_height - 4
-        
-        # Add left padding for centering? Or just keep left aligned with margin.
-        left_margin = 20
-        
-        points = f"{left_margin},{current_y} {left_margin+w-10},{current_y} {left_margin+w},{current_y+h/2} {left_margin+w-10},{current_y+h} {left_margin},{current_y+h}"
-        
-        svg += f'<polygon points="{points}" fill="{p_color}" />'
-        
-        svg += f'<text x="{left_margin+w-18}" y="{current_y+h-5}" font-weight="bold" font-size="14" fill="white">{p_classe}</text>'
-        
-        range_txt = f"≤ {p_max}" if p_classe == 'A' else f"> {420}" if p_classe == 'G' else f"{p_min} à {p_max}"
-        
+        w = ARROW_WIDTH_BASE + (ord(p_classe) - ord('A')) * ARROW_STEP
+        h = STEP_HEIGHT - 4
+
+        points = f"{LEFT_MARGIN},{current_y} {LEFT_MARGIN+w-10},{current_y} {LEFT_MARGIN+w},{current_y+h/2} {LEFT_MARGIN+w-10},{current_y+h} {LEFT_MARGIN},{current_y+h}"
+
+        band = f'<polygon points="{points}" fill="{p_color}" />'
+        band += f'<text x="{LEFT_MARGIN+w-18}" y="{current_y+h-5}" font-weight="bold" font-size="14" fill="white">{p_classe}</text>'
+
+        range_txt = f"≤ {p_max}" if p_classe == 'A' else f"> {borne_g}" if p_classe == 'G' else f"{p_min} à {p_max}"
         if w > 60:
-             svg += f'<text x="{left_margin+8}" y="{current_y+h/2 + 4}" font-size="11" fill="white" font-weight="bold">{range_txt}</text>'
-        
-        if classe == p_classe:
-            arrow_x = left_margin + w + 15
-            arrow_center_y = current_y + h/2
-            box_w = 70
-            
-            svg += f'<path d="M{arrow_x} {arrow_center_y} L{arrow_x+10} {arrow_center_y-10} L{arrow_x+10+box_w} {arrow_center_y-10} L{arrow_x+10+box_w} {arrow_center_y+10} L{arrow_x+10} {arrow_center_y+10} Z" fill="black" />'
-            svg += f'<text x="{arrow_x+10+box_w/2}" y="{arrow_center_y+5}" text-anchor="middle" font-weight="bold" font-size="18" fill="white">{int(conso)}</text>'
-            
-        current_y += step_height
-
-    svg += '</svg>'
-    return svg
+            txt_fill = "black" if p_classe in classes_texte_noir else "white"
+            band += f'<text x="{LEFT_MARGIN+8}" y="{current_y+h/2 + 4}" font-size="11" fill="{txt_fill}" font-weight="bold">{range_txt}</text>'
+
+        fragments.append(band)
+        # La flèche de valeur se place juste après la bande de la classe
+        positions[p_classe] = (len(fragments), LEFT_MARGIN + w + 15, current_y + h/2)
+
+        current_y += STEP_HEIGHT
+
+    fragments.append('</svg>')
+    return fragments, positions
+
+_SCALES = {
+    'dpe': _build_scale('Consommation', '(kWh/m²/an)', PALIERS_DPE, SEUILS_ENERGIE[-1]),
+    'ges': _build_scale('Émissions GES', '(kg CO₂/m²/an)', PALIERS_GES, SEUILS_GES[-1], classes_texte_noir=('A', 'B')),
+}
+
+# Partie statique pré-assemblée de chaque échelle: avant / après la flèche, par classe
+_TEMPLATES = {
+    scale: (
+        ''.join(fragments),
+        {c: (''.join(fragments[:i]), ''.join(fragments[i:]), x, y) for c, (i, x, y) in positions.items()},
+    )
+    for scale, (fragments, positions) in _SCALES.items()
+}
+
+
+def _arrow(arrow_x, arrow_center_y, value):
+    box_w = 70
+    return (
+        f'<path d="M{arrow_x} {arrow_center_y} L{arrow_x+10} {arrow_center_y-10} L{arrow_x+10+box_w} {arrow_center_y-10} L{arrow_x+10+box_w} {arrow_center_y+10} L{arrow_x+10} {arrow_center_y+10} Z" fill="black" />'
+        f'<text x="{arrow_x+10+box_w/2}" y="{arrow_center_y+5}" text-anchor="middle" font-weight="bold" font-size="18" fill="white">{value}</text>'
+    )
+
+
+# Version du rendu : change dès que les gabarits ou la flèche changent, ce qui
+# permet de servir les URLs d'étiquettes avec un cache illimité (voir label_url)
+LABEL_VERSION = hashlib.sha256(
+    (''.join(full for full, _ in _TEMPLATES.values()) + _arrow(0, 0, 0)).encode()
+).hexdigest()[:12]
+
+# Nom de chaque échelle dans les URLs
+URL_SCALES = {'dpe': 'energie', 'ges': 'climat'}
+
+
+@lru_cache(maxsize=SVG_CACHE_SIZE)
+def _render(scale, classe, value):
+    before, after, x, y = _TEMPLATES[scale][1][classe]
+    return before + _arrow(x, y, value) + after
+
+
+@timed('svg')
+def render_scale_svg(scale, value, classe):
+    """
+    Rend l'échelle `scale` ('dpe' ou 'ges') avec la flèche sur `classe`.
+    Seules la flèche et la valeur sont ajoutées au gabarit statique ; le
+    résultat est mémorisé par (classe, int(valeur)).
+    """
+    full, by_class = _TEMPLATES[scale]
+    if classe not in by_class:
+        return full
+    return _render(scale, classe, int(value))
+
+
+def label_url(scale, value, classe):
+    """
+    Chemin de l'étiquette servie par l'API (voir src.api) : une URL par
+    (échelle, classe, valeur entière), versionnée par LABEL_VERSION.
+    Sans classe ou sans valeur, l'échelle est rendue sans flèche ('-').
+    """
+    if classe in CLASSES and value is not None:
+        return f"/api/etiquette/{URL_SCALES[scale]}/{classe}/{int(value)}.svg?v={LABEL_VERSION}"
+    return f"/api/etiquette/{URL_SCALES[scale]}/-/0.svg?v={LABEL_VERSION}"
+
+
+def generate_dpe_svg(conso, classe):
+    """
+    Génère une étiquette DPE compacte au format SVG.
+    Retourne le code SVG sous forme de chaîne.
+    """
+    return render_scale_svg('dpe', conso, classe)
 
 
 def generate_ges_svg(emission, classe):
     """
     Génère une étiquette GES compacte au format SVG.
     """
-    # ... (colors same as before) ...
-    paliers = [
-        ('A', '#A3E3F5', 0, 6),
-        ('B', '#7AB1D6', 7, 11),
-        ('C', '#5E8CB8', 12, 30),
-        ('D', '#426899', 31, 50),
-        ('E', '#2F487A', 51, 70),
-        ('F', '#1F2C5C', 71, 100),
-        ('G', '#10143D', 101, 9999)
-    ]
-
-    width = 350
-    height = 280
-    
-    svg = f'<svg width="{width}" height="{height}" viewBox="0 0 {width} {height}" xmlns="http://www.w3.org/2000/svg" font-family="Arial, sans-serif">'
-    
-    
-    svg += f'<text x="50%" y="30" text-anchor="middle" font-weight="bold" font-size="16" fill="#333">Émissions GES</text>'
-    svg += f'<text x="50%" y="48" text-anchor="middle" font-size="12" fill="#666">(kg CO₂/m²/an)</text>'
-    
-    start_y = 65
-    step_height = 24
-    arrow_width_base = 70
-    arrow_step = 12
-    
-    current_y = start_y
-    
-    for p_classe, p_color, p_min, p_max in paliers:
-        w = arrow_width_base + (ord(p_classe) - ord('A')) * arrow_step
-        h = step_height - 4
-        
-        left_margin = 20
-        
-        points = f"{left_margin},{current_y} {left_margin+w-10},{current_y} {left_margin+w},{current_y+h/2} {left_margin+w-10},{current_y+h} {left_margin},{current_y+h}"
-        
-        svg += f'<polygon points="{points}" fill="{p_color}" />'
-        svg += f'<text x="{left_margin+w-18}" y="{current_y+h-5}" font-weight="bold" font-size="14" fill="white">{p_classe}</text>'
-        
-        range_txt = f"≤ {p_max}" if p_classe == 'A' else f"> {100}" if p_classe == 'G' else f"{p_min} à {p_max}"
-        if w > 60:
-             txt_fill = "black" if p_classe in ['A', 'B'] else "white"
-             svg += f'<text x="{left_margin+8}" y="{current_y+h/2 + 4}" font-size="11" fill="{txt_fill}" font-weight="bold">{range_txt}</text>'
-
-        if classe == p_classe:
-            arrow_x = left_margin + w + 15
-            arrow_center_y = current_y + h/2
-            box_w = 70
-            
-            svg += f'<path d="M{arrow_x} {arrow_center_y} L{arrow_x+10} {arrow_center_y-10} L{arrow_x+10+box_w} {arrow_center_y-10} L{arrow_x+10+box_w} {arrow_center_y+10} L{arrow_x+10} {arrow_center_y+10} Z" fill="black" />'
-            svg += f'<text x="{arrow_x+10+box_w/2}" y="{arrow_center_y+5}" text-anchor="middle" font-weight="bold" font-size="18" fill="white">{int(emission)}</text>'
-            
-        current_y += step_height
-
-    svg += '</svg>'
-    return svg
+    return render_scale_svg('ges', emission, classe)
@@ -0,0 +1,233 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# Instrumentation switch, read once at import (DPE_METRICS=0 disables it)
+ENABLED = os.environ.get('DPE_METRICS', '1') not in ('0', 'false', 'no', '')
+
+# Recent observations kept per series for the quantiles
+WINDOW = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Period of the event-loop lag probe (see monitor_event_loop), and its histogram buckets (seconds)
+LOOP_LAG_INTERVAL = 0.1
+LOOP_LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Series:
+    """Count, sum and a sliding window of recent observations."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.window = deque(maxlen=WINDOW)
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.window.append(value)
+
+    def quantiles(self):
+        values = sorted(self.window)
+        if not values:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTILES}
+
+
+class Histogram:
+    """Cumulative-bucket counts since startup: a client can diff two scrapes to get the quantiles of any period."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last one: +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.total += value
+
+
+_lock = threading.Lock()
+_timings = {}  # stage -> Series (seconds)
+_sizes = {}  # name -> Series (bytes)
+_loop_lag = Histogram(LOOP_LAG_BUCKETS)
+# In a pool worker process, the observations of the running call (see recording)
+_recording = None
+
+
+def observe(stage, seconds):
+    if _recording is not None:
+        _recording.append((stage, seconds, False))
+        return
+    with _lock:
+        series = _timings.get(stage)
+        if series is None:
+            series = _timings[stage] = Series()
+        series.observe(seconds)
+
+
+def observe_bytes(name, size):
+    if _recording is not None:
+        _recording.append((name, size, True))
+        return
+    with _lock:
+        series = _sizes.get(name)
+        if series is None:
+            series = _sizes[name] = Series()
+        series.observe(size)
+
+
+@contextmanager
+def recording():
+    """
+    Collects the observations made in the block into the yielded list instead
+    of this process's series: a worker process returns them with its result,
+    and the server merges them into its own with merge().
+    """
+    global _recording
+    _recording = observations = []
+    try:
+        yield observations
+    finally:
+        _recording = None
+
+
+def merge(observations):
+    """Records observations collected by recording() in another process."""
+    for name, value, is_size in observations:
+        (observe_bytes if is_size else observe)(name, value)
+
+
+class Timer:
+    """Records the time elapsed since the previous lap under each stage name."""
+
+    __slots__ = ('prefix', 'last')
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        observe(f"{self.prefix}.{stage}", now - self.last)
+        self.last = now
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def lap(self, stage):
+        pass
+
+_NULL_TIMER = _NullTimer()
+
+
+def timer(prefix):
+    """Returns a Timer, or a shared no-op one when instrumentation is disabled."""
+    return Timer(prefix) if ENABLED else _NULL_TIMER
+
+
+def timed(stage):
+    """Decorator timing each call; returns the function untouched when disabled."""
+    def decorator(func):
+        if not ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+async def monitor_event_loop(interval=LOOP_LAG_INTERVAL):
+    """
+    Background task recording, every `interval` seconds, how late the event
+    loop wakes a sleeping task (dpe_event_loop_lag_seconds): the time every
+    client waits behind blocking work on the loop.
+    """
+    if not ENABLED:
+        return
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag = max(0.0, time.perf_counter() - start - interval)
+        with _lock:
+            _loop_lag.observe(lag)
+
+
+def rss_bytes():
+    """Resident memory of this process (Linux /proc), or None when unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def reset():
+    global _loop_lag
+    with _lock:
+        _timings.clear()
+        _sizes.clear()
+        _loop_lag = Histogram(LOOP_LAG_BUCKETS)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus(gauges=None):
+    """
+    Prometheus text exposition of the collected metrics.
+    `gauges` is an optional {name: value} dict appended as plain gauges.
+    """
+    lines = []
+    with _lock:
+        timings = {k: (s.count, s.total, s.quantiles()) for k, s in sorted(_timings.items())}
+        sizes = {k: (s.count, s.total, s.quantiles()) for k, s in sorted(_sizes.items())}
+        lag_counts, lag_count, lag_total = list(_loop_lag.counts), _loop_lag.count, _loop_lag.total
+
+    for metric, unit_help, data in (
+        ('dpe_stage_duration_seconds', 'Duration of each parsing / rendering stage', timings),
+        ('dpe_parsed_bytes', 'Size of the parsed XML files', sizes),
+    ):
+        lines.append(f"# HELP {metric} {unit_help}.")
+        lines.append(f"# TYPE {metric} summary")
+        for name, (count, total, quantiles) in data.items():
+            label = f'stage="{_escape(name)}"'
+            for q, value in quantiles.items():
+                lines.append(f'{metric}{{{label},quantile="{q}"}} {value:.9g}')
+            lines.append(f'{metric}_sum{{{label}}} {total:.9g}')
+            lines.append(f'{metric}_count{{{label}}} {count}')
+
+    if lag_count:
+        metric = 'dpe_event_loop_lag_seconds'
+        lines.append(f"# HELP {metric} Delay of the event loop in waking a sleeping task.")
+        lines.append(f"# TYPE {metric} histogram")
+        cumulative = 0
+        for bound, count in zip(LOOP_LAG_BUCKETS + ('+Inf',), lag_counts):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_sum {lag_total:.9g}')
+        lines.append(f'{metric}_count {lag_count}')
+
+    for name, value in (gauges or {}).items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return '\n'.join(lines) + '\n'
@@ -1,10 +1,23 @@
-from nicegui import ui
-from src.parser import parse_dpe_file
-from src.utils import get_color_scale, format_value
-import io
+import asyncio
+import os
+import time
+from functools import lru_cache
+from itertools import islice
+from nicegui import app, core, ui
+from src.parse_pool import parse_pool, ParserBusy
+from src.utils import DEPERDITION_LABELS, get_color_scale, get_isolation_status, format_value
 import json
-from src.dpe_label_generator import generate_dpe_svg, generate_ges_svg
+from fastapi.responses import PlainTextResponse
+from src import metrics
+from src.archives import is_multi_archive, iter_archive_members
+from src.cache import parse_cache
+from src.dpe_label_generator import COULEURS_DPE, COULEURS_GES, label_url
+from src.parser import MAX_XML_BYTES
+from src.record import DpeRecord
+from src.sessions import session_store
+from src.uploads import MAX_BATCH_BYTES, MAX_UPLOAD_BYTES, BodyLimitMiddleware, UploadTooLarge, receive_upload, too_large_message
 
+@metrics.timed('render.dpe_badge')
 def render_dpe_badge(label, type='energy'):
     if not label:
         return
@@ -14,6 +27,11 @@ def render_dpe_badge(label, type='energy'):
     with ui.card().classes('w-full text-white text-center p-4 rounded-xl shadow-lg').style(f'background-color: {color}'):
         ui.label(f'{title} : {label}').classes('text-2xl font-bold')
 
+def label_image(scale, value, classe, alt):
+    """<img> of a DPE / GES label: the browser fetches (and caches) the SVG from the API, it is not sent over the websocket."""
+    return ui.element('img').props(f'src="{label_url(scale, value, classe)}" alt="{alt}"')
+
+@metrics.timed('render.dpe_scale')
 def render_dpe_scale(current_class, val_conso, val_ges, current_class_ges):
     # DPE & GES Scale Component using SVG Generator
     # Wrap on mobile (flex-wrap), centered
@@ -21,17 +39,16 @@ def render_dpe_scale(current_class, val_conso, val_ges, current_class_ges):
          # DPE Energy Scale - Centered with card frame
          with ui.card().classes('items-center justify-center p-6 min-w-[300px] flex-grow md:flex-grow-0 border dark:border-gray-700 shadow-sm'):
             ui.label('Étiquette Énergie').classes('text-xl font-bold mb-4 text-primary dark:text-blue-400')
-            svg_dpe = generate_dpe_svg(val_conso, current_class)
-            ui.html(svg_dpe).style('width: 350px; height: 280px;')
+            label_image('dpe', val_conso, current_class, 'Étiquette Énergie').style('width: 350px; height: 280px;')
 
          # GES Scale (Climate)
          with ui.card().classes('items-center justify-center p-6 min-w-[300px] flex-grow md:flex-grow-0 border dark:border-gray-700 shadow-sm'):
             ui.label('Étiquette Climat').classes('text-xl font-bold mb-4 text-primary dark:text-blue-400')
-            svg_ges = generate_ges_svg(val_ges, current_class_ges)
-            ui.html(svg_ges).style('width: 350px; height: 280px;')
+            label_image('ges', val_ges, current_class_ges, 'Étiquette Climat').style('width: 350px; height: 280px;')
 
 
 
+@metrics.timed('render.metrics')
 def render_metrics(data):
     # Wrap on mobile
     with ui.row().classes('w-full justify-center gap-4 mt-4 flex-wrap'):
@@ -49,9 +66,8 @@ def render_metrics(data):
             ui.label('Émissions GES').classes('text-gray-500 dark:text-gray-400')
             ui.label(format_value(data.get('conso_ges'), 'kgCO2/m²/an')).classes('text-2xl font-bold')
 
+@metrics.timed('render.travaux_section')
 def render_travaux_section(data):
-    ui.label('🛠️ Scénarios de Travaux (DPE)').classes('text-2xl font-bold mt-8 text-center w-full')
-    
     packs = data.get('packs_travaux', [])
     if packs:
         for pack in packs:
@@ -84,21 +100,18 @@ def render_travaux_section(data):
                             # Energy Badge (SVG)
                             if pack['classe_energie_apres'] != '?':
                                 with ui.card().classes('items-center justify-center p-4 border dark:border-gray-700 shadow-sm'):
-                                    svg_en = generate_dpe_svg(pack['conso_apres'], pack['classe_energie_apres'])
                                     # Use consistent scale
-                                    ui.html(svg_en).style('width: 280px; height: 280px;')
+                                    label_image('dpe', pack['conso_apres'], pack['classe_energie_apres'], 'Étiquette Énergie après travaux').style('width: 280px; height: 280px;')
 
                             # Climate Badge (SVG)
                             if pack['classe_climat_apres'] != '?':
                                 with ui.card().classes('items-center justify-center p-4 border dark:border-gray-700 shadow-sm'):
-                                    svg_ges = generate_ges_svg(pack['ges_apres'], pack['classe_climat_apres'])
-                                    ui.html(svg_ges).style('width: 280px; height: 280px;')
+                                    label_image('ges', pack['ges_apres'], pack['classe_climat_apres'], 'Étiquette Climat après travaux').style('width: 280px; height: 280px;')
     else:
         ui.label('✅ Aucun travaux prioritaire identifié (Logement performant).').classes('text-green-600 font-bold dark:text-green-400 text-center w-full')
 
+@metrics.timed('render.detailed_report')
 def render_detailed_report(data):
-    ui.label('📋 Rapport Détaillé').classes('text-2xl font-bold mt-8 mb-4 text-center w-full')
-    
     # Responsive grid: 1 col on small, 2 on medium, 3 on large screens
     with ui.grid().classes('w-full gap-8 grid-cols-1 md:grid-cols-2 lg:grid-cols-3 auto-rows-fr'):
         # --- Column 1: General ---
@@ -125,15 +138,7 @@ def render_detailed_report(data):
                 ui.label("Répartition des déperditions").classes('font-bold mb-2')
                 deps = data.get('deperditions', {})
                 if deps:
-                   labels = {
-                       'toiture': 'Toiture',
-                       'mur': 'Murs',
-                       'baies': 'Menuiseries',
-                       'plancher_bas': 'Sol',
-                       'ventilation': 'Ventil.',
-                       'ponts_thermiques': 'Ponts Th.'
-                   }
-                   for k, label in labels.items():
+                   for k, label in DEPERDITION_LABELS.items():
                        val = deps.get(k, 0)
                        if val > 0: # Only show non-zero
                            with ui.row().classes('w-full items-center mb-1 text-sm'):
@@ -144,8 +149,7 @@ def render_detailed_report(data):
              with ui.column().classes('mt-4 pt-4 border-t border-gray-200 dark:border-gray-700 w-full'):
                  ui.label('Performance Isolation').classes('font-bold mb-2')
                  dpe_class = data.get('classe_energie', 'G')
-                 status = "INSUFFISANTE" if dpe_class in ['F', 'G'] else "MOYENNE" if dpe_class in ['D', 'E'] else "BONNE" if dpe_class in ['C'] else "TRÈS BONNE"
-                 color = "#ff4b4b" if status == "INSUFFISANTE" else "#ffa500" if status == "MOYENNE" else "#90ee90" if status == "BONNE" else "#228b22"
+                 status, color = get_isolation_status(dpe_class)
                  ui.label(status).style(f'background-color: {color}; color: white; padding: 4px 12px; border-radius: 6px; font-weight: bold; display: inline-block;')
 
         # --- Column 3: Systems ---
@@ -169,41 +173,71 @@ def render_detailed_report(data):
                      ui.icon('water_drop').classes('text-blue-500')
                      ui.label(f"Installation ECS: {data.get('ecs_type')}").classes('font-medium')
 
-async def handle_upload(e, container):
-
-    
-    # Try different ways to access content
-    # Try different ways to access content
-    content = None
-    
+async def read_upload(e):
+    """
+    Receives the upload into a SpooledUpload (on disk past SPOOL_MAX_SIZE,
+    refused past MAX_UPLOAD_BYTES), or returns None (the user is notified).
+    """
+    name = upload_name(e)
     try:
-        if hasattr(e, 'content') and e.content:
-            content = e.content.read()
-            # NiceGUI/Starlette upload content might look like a file but read() returns bytes
-            
-        elif hasattr(e, 'file') and hasattr(e.file, 'read'):
-            content = e.file.read()
-            if hasattr(content, '__await__'):
-                content = await content
-                
+        if e.file.size() > MAX_UPLOAD_BYTES:
+            raise UploadTooLarge(too_large_message())
+        upload = await receive_upload(e.file.iterate(chunk_size=256 * 1024), name)
+    except UploadTooLarge as err:
+        ui.notify(f"{name} : {str(err)}", type='negative')
+        return None
     except Exception as err:
-        ui.notify(f"Erreur de lecture: {str(err)}", type='negative')
-        content = None
+        ui.notify(f"{name} : Erreur de lecture: {str(err)}", type='negative')
+        return None
 
-    if not content:
-        ui.notify("Erreur interne: Impossible de lire le fichier (format non supporté ?).", type='negative')
-        return
+    if not upload.size:
+        upload.close()
+        ui.notify(f"{name} : Erreur interne: Impossible de lire le fichier (format non supporté ?).", type='negative')
+        return None
+    return upload
 
-    data = parse_dpe_file(io.BytesIO(content))
-    
+def upload_name(e):
+    name = getattr(e, 'name', None) or getattr(getattr(e, 'file', None), 'name', None)
+    return name or 'fichier.xml'
+
+async def parse_content(name, content):
+    """Parses one uploaded file (bytes or SpooledUpload). Returns the data dict, or None (the user is notified)."""
+    if isinstance(content, dict):  # Unreadable archive member
+        ui.notify(f"{name} : {content['error']}", type='negative')
+        return None
+    # Parsed in a worker pool (repeat uploads come from the cache) so other clients are not blocked
+    try:
+        data = await parse_pool.parse(content)
+    except ParserBusy:
+        ui.notify(f"{name} : serveur occupé, veuillez réessayer dans quelques instants.", type='warning')
+        return None
+    except asyncio.TimeoutError:
+        ui.notify(f"{name} : analyse trop longue, fichier abandonné.", type='negative')
+        return None
+
+    if 'error' in data:
+        ui.notify(f"{name} : {data['error']}", type='negative')
+        return None
+    return data
+
+def lazy_expansion(text, build):
+    """Expansion whose content is built by `build()` the first time it is opened."""
+    built = False
+
+    def on_open(e):
+        nonlocal built
+        if e.value and not built:
+            built = True
+            with expansion:
+                build()
+
+    expansion = ui.expansion(text, on_value_change=on_open).classes('w-full mt-8').props('header-class="text-2xl font-bold"')
+    return expansion
+
+@metrics.timed('render.report')
+def render_report(data, container):
     container.clear()
     with container:
-        if 'error' in data:
-            ui.notify(f"Erreur: {data['error']}", type='negative')
-            return
-        
-        ui.notify("Fichier analysé avec succès !", type='positive')
-        
         # Address & Validity
         if data.get('adresse'):
             ui.label(f"📍 {data['adresse']}").classes('text-2xl font-bold mt-4 text-center')
@@ -217,14 +251,188 @@ async def handle_upload(e, container):
         
         with ui.row().classes('w-full justify-center mt-8'): # ID: render_dpe_scale_call
             render_dpe_scale(data.get('classe_energie'), data.get('conso_kwh'), data.get('conso_ges'), data.get('classe_climat'))
-            
-        ui.separator().classes('my-6')
-        render_travaux_section(data)
-        ui.separator().classes('my-6')
-        render_detailed_report(data)
-        
-        with ui.expansion('🔍 Vue Debug (Données Brutes)').classes('w-full mt-8'):
-            ui.code(json.dumps(data.get('debug_raw', {}), indent=2, default=str), language='json')
+
+        # Only the summary above is sent with the upload; the sections below are built when first opened
+        packs = data.get('packs_travaux', [])
+        lazy_expansion(f"🛠️ Scénarios de Travaux (DPE) — {len(packs)} pack(s)", lambda: render_travaux_section(data))
+        lazy_expansion('📋 Rapport Détaillé', lambda: render_detailed_report(data))
+        lazy_expansion('🔍 Vue Debug (Données Brutes)',
+                       lambda: ui.code(json.dumps(data.get('debug_raw', {}), indent=2, default=str), language='json'))
+
+# --- Comparison of several DPEs ---
+COMPARISON_COLUMNS = [
+    {'name': 'fichier', 'label': 'Fichier', 'field': 'fichier', 'sortable': True, 'align': 'left'},
+    {'name': 'adresse', 'label': 'Adresse', 'field': 'adresse', 'sortable': True, 'align': 'left'},
+    {'name': 'surface', 'label': 'Surface (m²)', 'field': 'surface', 'sortable': True},
+    {'name': 'conso_kwh', 'label': 'Conso. (kWh/m²/an)', 'field': 'conso_kwh', 'sortable': True},
+    {'name': 'classe_energie', 'label': 'Classe Énergie', 'field': 'classe_energie', 'sortable': True},
+    {'name': 'conso_ges', 'label': 'GES (kgCO2/m²/an)', 'field': 'conso_ges', 'sortable': True},
+    {'name': 'classe_climat', 'label': 'Classe Climat', 'field': 'classe_climat', 'sortable': True},
+    {'name': 'cout_pack_min', 'label': 'Pack le moins cher (€)', 'field': 'cout_pack_min', 'sortable': True},
+    {'name': 'classe_apres', 'label': 'Meilleure classe après travaux', 'field': 'classe_apres', 'sortable': True},
+]
+
+def comparison_row(row_id, name, data):
+    """Summary row of one DPE for the comparison table (raw numbers so that sorting works)."""
+    packs = data.get('packs_travaux', [])
+    cheapest = min((p['cout_min'] for p in packs), default=None)
+    best_class = min((p['classe_energie_apres'] for p in packs), default=None)
+
+    def num(value):
+        return round(value, 1) if isinstance(value, (int, float)) else value
+
+    return {
+        'id': row_id,
+        'fichier': name,
+        'adresse': data.get('adresse') or '',
+        'surface': num(data.get('surface')),
+        'conso_kwh': num(data.get('conso_kwh')),
+        'classe_energie': data.get('classe_energie'),
+        'conso_ges': num(data.get('conso_ges')),
+        'classe_climat': data.get('classe_climat'),
+        'cout_pack_min': num(cheapest),
+        'classe_apres': best_class or '-',
+    }
+
+def session_id():
+    """Id of the browser session (needs ui.run(storage_secret=...)), None without one."""
+    try:
+        return app.storage.browser.get('id')
+    except (RuntimeError, AssertionError):
+        return None
+
+def show_result(row_id, session, container, history, data=None):
+    """Renders the report of a result kept in the session and puts it on top of the history."""
+    if data is None:
+        entry = session.get(row_id)
+        if entry is None:
+            ui.notify("Ce DPE n'est plus en mémoire, veuillez renvoyer le fichier.", type='warning')
+            return
+        data = entry[1].to_dict()
+    session.view(row_id)
+    session_store.touch(session)
+    render_report(data, container)
+    render_history(session, container, history)
+
+def render_history(session, container, history):
+    """Chips of the last DPEs viewed in the session, to switch between them without parsing again."""
+    history.clear()
+    if len(session.history) < 2:
+        return
+    with history:
+        ui.label('Consultés récemment :').classes('text-gray-500 dark:text-gray-400')
+        for row_id in reversed(session.history):
+            name, record = session.get(row_id)
+            current = row_id == session.current
+            ui.chip(record.adresse or name, icon='history', color='primary' if current else 'grey-7',
+                    on_click=lambda r=row_id: show_result(r, session, container, history)).props('' if current else 'outline')
+
+def add_result(name, data, container, table, history, session):
+    """
+    Adds a parsed DPE to the session and the comparison table. The detailed
+    report is only built when a row is clicked, or right away for the first file.
+    """
+    # Compact copy, expanded again when the report is shown
+    row_id, evicted = session.add(name, DpeRecord.from_dict(data))
+    session_store.touch(session)
+    for old_id in evicted:
+        table.remove_row({'id': old_id})
+    table.add_row(comparison_row(row_id, name, data))
+    table.set_visibility(True)
+
+    if session.current is None:
+        ui.notify("Fichier analysé avec succès !", type='positive')
+        show_result(row_id, session, container, history, data)
+
+async def handle_archive_upload(name, upload, container, table, history, session):
+    """Parses every XML member of an uploaded .zip / .tar.gz, a few at a time, without extracting to disk."""
+    source = upload.open()
+    members = iter_archive_members(source, name, max_bytes=MAX_XML_BYTES, errors=True)
+    count = 0
+    try:
+        while True:
+            # Decompression happens off the event loop, one window of members at a time
+            batch = await asyncio.to_thread(lambda: list(islice(members, parse_pool.max_concurrent)))
+            if not batch:
+                break
+            parsed = await asyncio.gather(*(parse_content(f"{name}/{member}", xml) for member, xml in batch))
+            for (member, _), data in zip(batch, parsed):
+                if data is not None:
+                    add_result(f"{name}/{member}", data, container, table, history, session)
+                    count += 1
+    except Exception as err:
+        ui.notify(f"{name} : archive illisible ({str(err)})", type='negative')
+        return
+    finally:
+        source.close()
+    ui.notify(f"{name} : {count} DPE analysé(s).", type='info')
+
+async def handle_upload(e, container, table, history, session):
+    """Parses one uploaded file or archive (several uploads run concurrently)."""
+    upload = await read_upload(e)
+    if upload is None:
+        return
+    name = upload.name
+
+    try:
+        if is_multi_archive(name, upload.head()):
+            await handle_archive_upload(name, upload, container, table, history, session)
+            return
+
+        data = await parse_content(name, upload)
+        if data is not None:
+            add_result(name, data, container, table, history, session)
+    finally:
+        upload.close()
+
+app.on_startup(metrics.monitor_event_loop)
+# Oversized uploads are refused before NiceGUI reads (and spools) their body. The
+# uploader sends one request per file; only the batch API route takes several at once
+app.add_middleware(BodyLimitMiddleware, path_limits={'/api/parse/batch': MAX_BATCH_BYTES})
+
+# Watch-folder mode: DPE_WATCH_DIR=/chemin/du/dossier enables the /surveillance page
+WATCH_DIR = os.environ.get('DPE_WATCH_DIR')
+watcher = None
+if WATCH_DIR:
+    from src.watch_folder import FolderWatcher
+
+    def parse_watched(path):
+        """Watcher thread: parses through the shared pool, within the same limits as uploads."""
+        while True:
+            try:
+                return asyncio.run_coroutine_threadsafe(parse_pool.parse_file(path), core.loop).result()
+            except ParserBusy:
+                time.sleep(1.0)  # Uploads come first: retry once the pool has room
+            except asyncio.TimeoutError:
+                return {'error': "Analyse trop longue, fichier abandonné."}
+
+    watcher = FolderWatcher(WATCH_DIR, debounce=float(os.environ.get('DPE_WATCH_DEBOUNCE', 1.0)), parse=parse_watched)
+    app.on_startup(watcher.start)
+
+    async def stop_watcher():
+        # Off the loop: the watcher thread may be waiting for a parse that needs it
+        await asyncio.to_thread(watcher.stop)
+
+    app.on_shutdown(stop_watcher)
+
+# After the watcher, which could otherwise start a parse on a pool already shut down
+app.on_shutdown(parse_pool.shutdown)
+
+@app.get('/metrics')
+def metrics_endpoint():
+    """Prometheus-style text metrics (stage timings, parsed bytes, cache and pool state)."""
+    stats = parse_cache.stats()
+    gauges = {
+        'dpe_cache_hits_total': stats['hits'] + stats['disk_hits'],
+        'dpe_cache_misses_total': stats['misses'],
+        'dpe_cache_entries': stats['entries'],
+        'dpe_parse_pending': parse_pool.pending,
+        'dpe_sessions': len(session_store),
+    }
+    rss = metrics.rss_bytes()
+    if rss is not None:
+        gauges['dpe_process_rss_bytes'] = rss
+    return PlainTextResponse(metrics.render_prometheus(gauges), media_type='text/plain; version=0.0.4')
 
 @ui.page('/')
 def main_page():
@@ -244,9 +452,167 @@ def main_page():
 
         ui.label('Téléchargez votre fichier DPE (XML) pour obtenir un résumé visuel.').classes('text-center text-lg text-gray-600 dark:text-gray-300 mb-8')
         
+        # Parsed DPEs of this browser session as DpeRecord, by row id: kept across reloads
+        # and reconnections (the reports are built on demand)
+        session = session_store.get(session_id())
+
+        comparison_table = ui.table(columns=COMPARISON_COLUMNS,
+                                    rows=[comparison_row(row_id, name, record.to_dict()) for row_id, (name, record) in session.results.items()],
+                                    row_key='id').classes('w-full cursor-pointer')
+        comparison_table.set_visibility(len(session) > 0)
+        comparison_table.on('rowClick', lambda e: show_result(e.args[1]['id'], session, result_container, history_row))
+
+        history_row = ui.row().classes('w-full justify-center items-center gap-2 flex-wrap')
         result_container = ui.column().classes('w-full items-center gap-8')
-        
-        ui.upload(on_upload=lambda e: handle_upload(e, result_container), 
-                  label='Choisir un fichier DPE (XML)',
+        if session.current is not None:
+            show_result(session.current, session, result_container, history_row)
+
+        ui.upload(on_upload=lambda e: handle_upload(e, result_container, comparison_table, history_row, session), 
+                  label='Choisir un ou plusieurs fichiers DPE (XML, ZIP)',
                   auto_upload=True,
-                  multiple=False).classes('w-full max-w-md shadow-md dark:bg-slate-800').props('flat bordered')
+                  multiple=True).classes('w-full max-w-md shadow-md dark:bg-slate-800').props('flat bordered')
+
+@ui.page('/surveillance')
+def watch_page():
+    dark = ui.dark_mode()
+    ui.query('body').classes('bg-slate-50 dark:bg-slate-900 text-slate-900 dark:text-slate-100 transition-colors duration-300')
+
+    with ui.column().classes('w-full max-w-screen-xl mx-auto px-4 md:px-8 py-8 items-center'):
+        with ui.row().classes('w-full justify-between items-center mb-8'):
+            ui.label('📂 Dossier surveillé').classes('text-3xl md:text-5xl font-bold text-primary dark:text-blue-400')
+            ui.button(icon='dark_mode', on_click=lambda: dark.toggle()).props('flat round color=grey')
+
+        if watcher is None:
+            ui.label("Aucun dossier surveillé : lancez l'application avec DPE_WATCH_DIR=/chemin/du/dossier.").classes('text-center text-lg text-gray-600 dark:text-gray-300')
+            return
+        ui.label(watcher.folder).classes('text-center text-lg text-gray-600 dark:text-gray-300 mb-8')
+
+        # Parsed DPEs by path; the list follows the watcher through its event sequence number
+        results = {}
+        last_seq = watcher.seq
+        for path, data in watcher.index.recent(200):
+            if 'error' not in data:
+                results[path] = DpeRecord.from_dict(data)
+
+        table = ui.table(columns=COMPARISON_COLUMNS,
+                         rows=[comparison_row(path, os.path.relpath(path, watcher.folder), record.to_dict()) for path, record in results.items()],
+                         row_key='id').classes('w-full cursor-pointer')
+        table.on('rowClick', lambda e: render_report(results[e.args[1]['id']].to_dict(), result_container))
+        result_container = ui.column().classes('w-full items-center gap-8')
+
+        def refresh():
+            nonlocal last_seq
+            events = watcher.since(last_seq)
+            for seq, path, data in events:
+                last_seq = seq
+                name = os.path.relpath(path, watcher.folder)
+                if path in results:
+                    del results[path]
+                    table.rows[:] = [row for row in table.rows if row['id'] != path]
+                if data is None:
+                    continue
+                if 'error' in data:
+                    ui.notify(f"{name} : {data['error']}", type='negative')
+                    continue
+                results[path] = DpeRecord.from_dict(data)
+                table.rows.append(comparison_row(path, name, data))
+            if events:
+                table.update()
+
+        ui.timer(1.0, refresh)
+
+# Portfolio dashboard: DPE_PORTFOLIO=portefeuille.parquet (bulk_parse.py export) or dpe.sqlite (DpeStore)
+PORTFOLIO_PATH = os.environ.get('DPE_PORTFOLIO')
+
+@lru_cache(maxsize=2)
+def _load_portfolio(path, mtime):
+    from src.stats import Portfolio
+    if path.endswith('.parquet'):
+        return Portfolio.from_parquet(path)
+    from src.store import DpeStore
+    with DpeStore(path) as store:
+        return Portfolio.from_store(store)
+
+def load_portfolio(path):
+    """Portfolio of the file, reloaded only when the file changes."""
+    return _load_portfolio(path, os.path.getmtime(path))
+
+def render_class_chart(title, distribution, colors):
+    with ui.card().classes('p-4 min-w-[300px] flex-grow dark:bg-slate-800'):
+        ui.label(title).classes('text-xl font-bold text-primary dark:text-blue-400')
+        ui.echart({
+            'xAxis': {'type': 'category', 'data': list(distribution)},
+            'yAxis': {'type': 'value'},
+            'tooltip': {},
+            'series': [{'type': 'bar', 'data': [{'value': n, 'itemStyle': {'color': color}}
+                                                for n, color in zip(distribution.values(), colors)]}],
+        }).classes('w-full h-64')
+
+GROUPINGS = {
+    'periode_construction': ('periode_construction',),
+    'zone_climatique': ('zone_climatique',),
+    'periode_zone': ('periode_construction', 'zone_climatique'),
+}
+
+@ui.page('/statistiques')
+async def stats_page():
+    dark = ui.dark_mode()
+    ui.query('body').classes('bg-slate-50 dark:bg-slate-900 text-slate-900 dark:text-slate-100 transition-colors duration-300')
+
+    with ui.column().classes('w-full max-w-screen-xl mx-auto px-4 md:px-8 py-8 items-center gap-6'):
+        with ui.row().classes('w-full justify-between items-center mb-4'):
+            ui.label('📈 Statistiques du portefeuille').classes('text-3xl md:text-5xl font-bold text-primary dark:text-blue-400')
+            ui.button(icon='dark_mode', on_click=lambda: dark.toggle()).props('flat round color=grey')
+
+        if not PORTFOLIO_PATH or not os.path.exists(PORTFOLIO_PATH):
+            ui.label("Aucun portefeuille : lancez l'application avec DPE_PORTFOLIO=portefeuille.parquet (ou dpe.sqlite).").classes('text-center text-lg text-gray-600 dark:text-gray-300')
+            return
+
+        portfolio = await asyncio.to_thread(load_portfolio, PORTFOLIO_PATH)
+        ui.label(f"{len(portfolio)} DPE - {PORTFOLIO_PATH}").classes('text-center text-lg text-gray-600 dark:text-gray-300')
+
+        with ui.row().classes('w-full justify-center gap-4 flex-wrap'):
+            render_class_chart('Classes Énergie', portfolio.class_distribution('energie'), COULEURS_DPE)
+            render_class_chart('Classes Climat', portfolio.class_distribution('climat'), COULEURS_GES)
+
+        # Median consumption, regrouped on demand
+        with ui.card().classes('w-full p-6 dark:bg-slate-800'):
+            ui.label('Consommation médiane (kWh/m²/an)').classes('text-xl font-bold text-primary dark:text-blue-400')
+            columns = [
+                {'name': 'periode_construction', 'label': 'Période', 'field': 'periode_construction', 'sortable': True, 'align': 'left'},
+                {'name': 'zone_climatique', 'label': 'Zone', 'field': 'zone_climatique', 'sortable': True, 'align': 'left'},
+                {'name': 'nombre', 'label': 'DPE', 'field': 'nombre', 'sortable': True},
+                {'name': 'conso_mediane', 'label': 'Conso. médiane', 'field': 'conso_mediane', 'sortable': True},
+            ]
+            table = ui.table(columns=columns, rows=[], row_key='id').classes('w-full')
+
+            def regroup(grouping):
+                fields = GROUPINGS[grouping]
+                rows = portfolio.median_conso_by(*fields)
+                table.columns = [c for c in columns if c['name'] not in ('periode_construction', 'zone_climatique') or c['name'] in fields]
+                table.rows = [{'id': i, **row} for i, row in enumerate(rows)]
+
+            ui.toggle({'periode_construction': 'Par période', 'zone_climatique': 'Par zone', 'periode_zone': 'Période × zone'},
+                      value='periode_construction', on_change=lambda e: regroup(e.value))
+            regroup('periode_construction')
+
+        with ui.row().classes('w-full gap-4 flex-wrap items-stretch'):
+            with ui.card().classes('p-6 min-w-[300px] flex-grow dark:bg-slate-800'):
+                ui.label('Répartition moyenne des déperditions').classes('text-xl font-bold text-primary dark:text-blue-400 mb-2')
+                for k, val in portfolio.mean_deperditions().items():
+                    if val:
+                        with ui.row().classes('w-full items-center mb-1 text-sm'):
+                            ui.label(DEPERDITION_LABELS[k]).classes('flex-grow font-medium')
+                            ui.label(f'{format_value(val)}%').classes('font-bold mr-2')
+                            ui.linear_progress(value=val/100).classes('w-1/3 rounded-full h-2').props('color=primary track-color=grey-3')
+
+            with ui.card().classes('p-6 min-w-[300px] flex-grow dark:bg-slate-800'):
+                ui.label('Coût par kWh/m²/an économisé (€)').classes('text-xl font-bold text-primary dark:text-blue-400 mb-2')
+                ui.table(columns=[
+                    {'name': 'pack', 'label': 'Pack', 'field': 'pack', 'align': 'left'},
+                    {'name': 'nombre', 'label': 'Packs', 'field': 'nombre'},
+                    {'name': 'mediane_min', 'label': 'Médiane (min)', 'field': 'mediane_min'},
+                    {'name': 'mediane_max', 'label': 'Médiane (max)', 'field': 'mediane_max'},
+                    {'name': 'moyenne_min', 'label': 'Moyenne (min)', 'field': 'moyenne_min'},
+                    {'name': 'moyenne_max', 'label': 'Moyenne (max)', 'field': 'moyenne_max'},
+                ], rows=portfolio.pack_cost_per_kwh(), row_key='pack').classes('w-full')
@@ -0,0 +1,169 @@
+import asyncio
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from src import metrics
+from src.cache import parse_cache
+from src.parser import parse_dpe_file
+from src.uploads import SpooledUpload
+
+
+class ParserBusy(Exception):
+    """Raised when too many parses are already running or waiting."""
+
+
+def parse_bytes(content):
+    """Worker entry point (top-level so it can be sent to a process pool)."""
+    return parse_dpe_file(io.BytesIO(content), streaming=True)
+
+
+def parse_path(path):
+    """Worker entry point for uploads spooled to disk: the file is streamed, never loaded whole."""
+    with open(path, 'rb') as f:
+        return parse_dpe_file(f, streaming=True)
+
+
+def run_measured(func, arg):
+    """Process pool entry point: func(arg) and the metrics it recorded, which would stay in the worker otherwise."""
+    with metrics.recording() as observations:
+        data = func(arg)
+    return data, observations
+
+
+# Smallest document going through the whole parser, used to warm the workers up
+WARM_UP_XML = b'<dpe><numero_dpe>0</numero_dpe><administratif/><logement/></dpe>'
+
+
+class ParsePool:
+    """
+    Runs parse_dpe_file off the event loop.
+
+    At most `max_concurrent` parses (no more than the workers) run at once in
+    a thread or process pool; up to `max_queue` more may wait for a slot,
+    beyond that ParserBusy is raised immediately. A slot is held until its
+    job has really finished, so a parse starts on a free worker as soon as it
+    gets one, and is abandoned `timeout` seconds later (asyncio.TimeoutError);
+    the worker itself finishes in the background, still holding the slot.
+    With `drain`, shutdown() waits for the running and queued parses
+    instead of cancelling them.
+    """
+
+    def __init__(self, kind='thread', workers=None, max_concurrent=None, max_queue=64, timeout=30.0, cache=None,
+                 drain=False):
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        # More would only wait in the executor queue, with their timeout running
+        self.max_concurrent = min(max_concurrent or self.workers, self.workers)
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.cache = cache
+        self.drain = drain
+        self.pending = 0
+        self._executor = None
+        self._semaphore = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            if self.kind == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='dpe-parse')
+        return self._executor
+
+    async def parse(self, content):
+        """
+        Returns the data dict for the uploaded bytes or SpooledUpload, from the
+        cache when possible. Spooled uploads are parsed from their file.
+        """
+        if isinstance(content, SpooledUpload):
+            key = self.cache.digest_key(content.digest) if self.cache is not None else None
+            func, arg = (parse_path, content.path) if content.spooled else (parse_bytes, content.content)
+        else:
+            # Hashing a large upload is not free either: keep it off the loop
+            key = await asyncio.to_thread(self.cache.key, content) if self.cache is not None else None
+            func, arg = parse_bytes, content
+
+        if key is not None:
+            data = await asyncio.to_thread(self.cache.lookup, key)
+            if data is not None:
+                return data
+
+        data = await self._run(func, arg)
+        if key is not None:
+            await asyncio.to_thread(self.cache.store, key, data)
+        return data
+
+    async def parse_file(self, path):
+        """Returns the data dict of an XML (or .xml.gz) file on disk, streamed by a worker (not cached)."""
+        return await self._run(parse_path, path)
+
+    async def _run(self, func, arg):
+        """Runs func(arg) on a worker within the concurrency, queue and time limits."""
+        if self.pending >= self.max_concurrent + self.max_queue:
+            raise ParserBusy()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        # Worker processes send back their parse metrics with the result
+        measured = self.kind == 'process' and metrics.ENABLED
+        self.pending += 1
+        try:
+            await self._semaphore.acquire()
+            try:
+                future = self.executor.submit(run_measured, func, arg) if measured else self.executor.submit(func, arg)
+            except BaseException:
+                self._semaphore.release()
+                raise
+            future.add_done_callback(self._release_slot(asyncio.get_running_loop()))
+            data = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        finally:
+            self.pending -= 1
+
+        if measured:
+            data, observations = data
+            metrics.merge(observations)
+        return data
+
+    def _release_slot(self, loop):
+        """Done callback (run in a worker thread) giving the slot back on the event loop."""
+        semaphore = self._semaphore
+
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(semaphore.release)
+            except RuntimeError:
+                pass  # Loop already closed (shutdown)
+
+        return release
+
+    def warm(self):
+        """Starts every worker and runs one parse in each, so the first uploads do not pay for it."""
+        futures = [self.executor.submit(parse_bytes, WARM_UP_XML) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=self.drain, cancel_futures=not self.drain)
+            self._executor = None
+        # Bound to the loop being shut down; abandoned jobs still release their slot in it
+        self._semaphore = None
+
+
+def _pool_from_env():
+    workers = os.environ.get('DPE_PARSE_WORKERS')
+    max_concurrent = os.environ.get('DPE_PARSE_MAX_CONCURRENT')
+    return ParsePool(
+        kind=os.environ.get('DPE_PARSE_EXECUTOR', 'thread'),
+        workers=int(workers) if workers else None,
+        max_concurrent=int(max_concurrent) if max_concurrent else None,
+        max_queue=int(os.environ.get('DPE_PARSE_MAX_QUEUE', 64)),
+        timeout=float(os.environ.get('DPE_PARSE_TIMEOUT', 30)),
+        cache=parse_cache,
+        drain=os.environ.get('DPE_PARSE_DRAIN', '0') not in ('0', 'false', 'no', ''),
+    )
+
+# Shared pool used by the web UI (configured through environment variables)
+parse_pool = _pool_from_env()
@@ -1,4 +1,13 @@
+import os
+import re
 import xml.etree.ElementTree as ET
+from functools import lru_cache
+from xml.parsers import expat
+
+from src import metrics
+from src.archives import open_xml_source
+from src.thresholds import classify_energie, classify_ges
+from src.utils import format_size
 
 
 def safe_text(element):
@@ -12,9 +21,434 @@ def safe_float(text):
     except (ValueError, TypeError):
         return 0.0
 
-def parse_dpe_file(uploaded_file):
+# Bump whenever the extraction logic changes the returned data (invalidates caches)
+PARSER_VERSION = "1"
+
+# Paths (relative to the <dpe> root, namespaces stripped) read by parse_dpe_file.
+# In streaming mode everything else is discarded as soon as it has been parsed.
+STREAMING_PATHS = [
+    'numero_dpe',
+    'administratif/date_etablissement_dpe',
+    'administratif/geolocalisation/adresses/adresse_bien/label_brut',
+    'logement/caracteristique_generale/surface_habitable_logement',
+    'logement/caracteristique_generale/nombre_niveau_logement',
+    'logement/caracteristique_generale/annee_construction',
+    'logement/caracteristique_generale/enum_periode_construction_id',
+    'logement/meteo/enum_classe_altitude_id',
+    'logement/meteo/enum_zone_climatique_id',
+    'logement/sortie/ep_conso/ep_conso_5_usages_m2',
+    'logement/sortie/ep_conso/classe_bilan_dpe',
+    'logement/sortie/emission_ges/emission_ges_5_usages_m2',
+    'logement/sortie/emission_ges/classe_emission_ges',
+    'logement/sortie/deperdition/deperdition_mur',
+    'logement/sortie/deperdition/deperdition_plancher_haut',
+    'logement/sortie/deperdition/deperdition_plancher_bas',
+    'logement/sortie/deperdition/deperdition_baie_vitree',
+    'logement/sortie/deperdition/deperdition_porte',
+    'logement/sortie/deperdition/deperdition_pont_thermique',
+    'logement/sortie/deperdition/deperdition_renouvellement_air',
+    'logement/installation_chauffage_collection/installation_chauffage/donnee_entree/description',
+    'logement/installation_chauffage_collection/installation_chauffage/generateur_chauffage_collection/generateur_chauffage/donnee_entree/description',
+    'logement/installation_chauffage_collection/installation_chauffage/emetteur_chauffage_collection/emetteur_chauffage/donnee_entree/description',
+    'logement/installation_ecs_collection/installation_ecs/donnee_entree/description',
+    'logement/installation_ecs_collection/installation_ecs/generateur_ecs_collection/generateur_ecs/donnee_entree/description',
+    'logement/enveloppe/inertie/enum_classe_inertie_id',
+    'logement/production_elec_enr',
+    'descriptif_travaux/pack_travaux_collection/pack_travaux/cout_pack_travaux_min',
+    'descriptif_travaux/pack_travaux_collection/pack_travaux/cout_pack_travaux_max',
+    'descriptif_travaux/pack_travaux_collection/pack_travaux/conso_5_usages_apres_travaux',
+    'descriptif_travaux/pack_travaux_collection/pack_travaux/emission_ges_5_usages_apres_travaux',
+    'descriptif_travaux/pack_travaux_collection/pack_travaux/travaux_collection/travaux/description_travaux',
+    'descriptif_travaux/pack_travaux_collection/pack_travaux/travaux_collection/travaux/performance_recommande',
+    'fiche_technique_collection/fiche_technique/sous_fiche_technique_collection/sous_fiche_technique/description',
+    'fiche_technique_collection/fiche_technique/sous_fiche_technique_collection/sous_fiche_technique/valeur',
+]
+
+# Rules mapping a sous_fiche_technique <description> to a data key.
+# Format: (substrings, key, first_wins)
+# Checked in order, the first applicable rule takes the <valeur>. A first_wins
+# rule only applies while its key is still 'Non précis' (otherwise the next
+# matching rule is tried); the others keep the last value seen.
+FICHE_TECHNIQUE_RULES = [
+    (('Hauteur moyenne sous plafond',), 'hsp', False),
+    (('Matériau mur',), 'mur_materiaux', True),
+    (('Isolation:',), 'isolation_type', True),
+    (('Type de pb',), 'plancher_bas_type', False),
+    (('Type de ph',), 'plancher_haut_type', False),
+    (('Type de vitrage',), 'vitrage_type', True),
+    (('Type ouverture',), 'baie_type', True),
+    (('Type production ECS', 'Type installation ECS'), 'ecs_type', True),
+    (('Type de ventilation',), 'ventilation_type', False),
+    (('Type de distribution',), 'chauffage_distribution', False),
+    (('Altitude',), 'altitude', False),
+    (('Zone climatique',), 'zone_climatique', False), # Might not be explicit in description like this
+    (('Année de construction',), 'periode_construction', False),
+]
+
+
+def _compile_fiche_rules(rules):
+    """
+    Returns a function giving the indices of the rules whose substrings appear
+    in a description, in rule order. One regex of all the substrings rejects
+    the descriptions matching no rule in a single pass; the others are checked
+    rule by rule, so that rules whose substrings overlap are all reported.
+    """
+    prefilter = re.compile('|'.join(re.escape(sub) for substrings, _, _ in rules for sub in substrings))
+
+    def match(desc):
+        if prefilter.search(desc) is None:
+            return ()
+        return tuple(i for i, (substrings, _, _) in enumerate(rules) if any(sub in desc for sub in substrings))
+
+    return match
+
+# Indices of the FICHE_TECHNIQUE_RULES matching a description, in rule order
+match_fiche_rules = lru_cache(maxsize=1024)(_compile_fiche_rules(FICHE_TECHNIQUE_RULES))
+
+
+def apply_fiche_rules(state, rules, val):
+    """
+    Gives the <valeur> of a sous_fiche_technique to the first applicable rule
+    of `rules` (from match_fiche_rules) in `state`, where missing keys count
+    as 'Non précis'.
+    """
+    for rule in rules:
+        _, key, first_wins = FICHE_TECHNIQUE_RULES[rule]
+        if first_wins and state.get(key, 'Non précis') != 'Non précis':
+            continue
+        state[key] = val
+        break
+
+
+class _FicheFold:
+    """
+    FICHE_TECHNIQUE_RULES applied to sous_fiche_technique elements as they
+    are streamed. Which rule takes a value depends on the keys already set,
+    and ecs_type may be set from the ECS installations, extracted afterwards:
+    the fiches are folded both without and with it, and `values` picks.
+    """
+
+    def __init__(self):
+        self.states = ({}, {'ecs_type': None})
+
+    def add(self, sub):
+        rules = match_fiche_rules(safe_text(sub.find('description')))
+        if rules:
+            val = safe_text(sub.find('valeur'))
+            for state in self.states:
+                apply_fiche_rules(state, rules, val)
+
+    def values(self, ecs_set):
+        return {key: value for key, value in self.states[ecs_set].items() if value is not None}
+
+
+# Repeated elements handed to the parser as soon as they are closed in
+# streaming mode, then dropped (see iterparse_pruned)
+PACK_TRAVAUX_PATH = 'descriptif_travaux/pack_travaux_collection/pack_travaux'
+SOUS_FICHE_PATH = 'fiche_technique_collection/fiche_technique/sous_fiche_technique_collection/sous_fiche_technique'
+
+# Marker for a wanted leaf: the element is kept with its text and attributes
+_LEAF = {}
+
+
+def _build_path_trie(paths):
+    """Compile the wanted paths into a nested dict keyed by tag name."""
+    trie = {}
+    for path in paths:
+        node = trie
+        parts = path.split('/')
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = _LEAF
+    return trie
+
+
+class XmlLimitError(ValueError):
+    """The document exceeds a size, element-count or depth limit, or declares a DTD."""
+
+
+def _env_limit(name, default):
+    return int(os.environ.get(name, default))
+
+# Limits applied to every parsed document (0 disables a limit). Real DPEs are
+# a few hundred kB, a few thousand elements and less than 10 levels deep.
+MAX_XML_BYTES = _env_limit('DPE_XML_MAX_BYTES', 100 * 1024 * 1024)
+MAX_XML_ELEMENTS = _env_limit('DPE_XML_MAX_ELEMENTS', 2_000_000)
+MAX_XML_DEPTH = _env_limit('DPE_XML_MAX_DEPTH', 64)
+
+# Bytes handed to expat at a time. Streaming mode uses smaller chunks: all
+# the elements of a chunk exist at once before they can be pruned.
+FEED_CHUNK_SIZE = 64 * 1024
+STREAMING_CHUNK_SIZE = 16 * 1024
+
+
+class _RootOpened(Exception):
+    pass
+
+
+class _DoctypeGuard:
+    """
+    Refuses DOCTYPEs for parsers built on the C TreeBuilder, which has no
+    doctype hook (DPEs never have one, and rejecting it before the parser
+    sees it stops entity expansion attacks: billion laughs, external
+    entities, before a single entity is declared). The start of the document also goes through a bare expat
+    parser until the root element opens. A DOCTYPE can only come before it,
+    so it is refused before the real parser has been fed a byte of it.
+    """
+
+    def __init__(self):
+        self.expat = expat.ParserCreate()
+        self.expat.StartDoctypeDeclHandler = self._doctype
+        self.expat.StartElementHandler = self._root
+
+    @staticmethod
+    def _doctype(*args):
+        raise XmlLimitError("DOCTYPE / entités XML non autorisés")
+
+    @staticmethod
+    def _root(*args):
+        raise _RootOpened
+
+    def check(self, chunk):
+        if self.expat is None:
+            return
+        try:
+            self.expat.Parse(chunk, False)
+        except (_RootOpened, expat.ExpatError):
+            self.expat = None  # Root reached, or malformed XML that the real parser reports itself
+
+
+def _read_chunks(source, max_bytes=MAX_XML_BYTES, chunk_size=FEED_CHUNK_SIZE):
+    """
+    Yields a binary file object in `chunk_size` chunks, raising XmlLimitError
+    past `max_bytes` (counted after decompression).
+    """
+    total = 0
+    while True:
+        chunk = source.read(chunk_size)
+        if not chunk:
+            return
+        total += len(chunk)
+        if max_bytes and total > max_bytes:
+            raise XmlLimitError(f"Fichier XML trop volumineux (limite: {format_size(max_bytes)})")
+        yield chunk
+
+
+def _event_parser():
+    """
+    (parser, events): what XMLPullParser does, minus its per-event generator.
+    The C TreeBuilder builds the elements and appends the start / end events
+    to a plain list, emptied by the caller after each feed.
+    """
+    parser = ET.XMLParser(target=ET.TreeBuilder())
+    events = []
+    parser._setevents(events, ('start', 'end'))
+    return parser, events
+
+
+def parse_tree(source, max_bytes=MAX_XML_BYTES, max_elements=MAX_XML_ELEMENTS, max_depth=MAX_XML_DEPTH):
+    """
+    Parses a whole DPE XML file (path or binary file object) and returns its
+    root element, namespaces stripped. Same limits as iterparse_pruned:
+    XmlLimitError past the byte, element or depth limit or on a DOCTYPE,
+    ET.ParseError on malformed XML.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return parse_tree(f, max_bytes, max_elements, max_depth)
+
+    max_elements = max_elements or float('inf')
+    max_depth = max_depth or float('inf')
+    guard = _DoctypeGuard()
+    parser, events = _event_parser()
+    elements = depth = 0
+
+    for chunk in _read_chunks(source, max_bytes):
+        guard.check(chunk)
+        parser.feed(chunk)
+        for event, elem in events:
+            if event == 'start':
+                if '}' in elem.tag:
+                    elem.tag = elem.tag.split('}', 1)[1]
+                depth += 1
+                elements += 1
+                if elements > max_elements:
+                    raise XmlLimitError(f"Trop d'éléments XML (limite: {max_elements})")
+                if depth > max_depth:
+                    raise XmlLimitError(f"Imbrication XML trop profonde (limite: {max_depth})")
+            else:
+                depth -= 1
+        events.clear()
+    return parser.close()
+
+
+def _trie_node(trie, path):
+    for part in path.split('/'):
+        trie = trie[part]
+    return trie
+
+
+def _record_plan(trie, paths):
+    """
+    Maps the id() of the trie nodes whose elements are dropped as soon as they
+    are closed to their record path: the records themselves, and (with None)
+    the containers with nothing wanted outside the records, such as
+    fiche_technique_collection.
+    """
+    plan = {id(_trie_node(trie, path)): path for path in paths}
+
+    def only_records(node):
+        return id(node) in plan or (node is not _LEAF and all(only_records(child) for child in node.values()))
+
+    def visit(node):
+        for child in node.values():
+            if child is _LEAF or id(child) in plan:
+                continue
+            if only_records(child):
+                plan[id(child)] = None
+            visit(child)
+
+    visit(trie)
+    return plan
+
+
+@lru_cache(maxsize=16)
+def _compile_paths(paths, record_paths):
+    """(trie, record plan) of a tuple of wanted paths and a tuple of record paths."""
+    trie = _build_path_trie(paths)
+    return trie, _record_plan(trie, record_paths)
+
+
+def iterparse_pruned(source, paths=STREAMING_PATHS, records=None, max_bytes=MAX_XML_BYTES,
+                     max_elements=MAX_XML_ELEMENTS, max_depth=MAX_XML_DEPTH):
+    """
+    Incrementally parses a DPE XML file and returns a pruned root element
+    keeping the wanted `paths` (see STREAMING_PATHS).
+
+    Namespaces are stripped from the wanted elements. Elements outside the
+    wanted paths are emptied as soon as they are closed: they stay as empty
+    shells under a wanted parent (so `if elem:` checks behave as with a full
+    tree) and are detached entirely otherwise.
+
+    `records` maps paths of repeated elements (pack_travaux,
+    sous_fiche_technique) to callables: each such element is passed to its
+    callable once closed, with its wanted descendants, then dropped, as are
+    the containers holding nothing else. Memory therefore stays flat however
+    large the file and however many records it holds.
+
+    The byte, element and depth limits raise XmlLimitError, as does any DOCTYPE.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return iterparse_pruned(f, paths, records, max_bytes, max_elements, max_depth)
+
+    records = records or {}
+    trie, plan = _compile_paths(tuple(paths), tuple(records))
+    max_elements = max_elements or float('inf')
+    max_depth = max_depth or float('inf')
+    guard = _DoctypeGuard()
+    parser, events = _event_parser()
+    root = None
+    stack = []  # (element, trie node); trie node is None outside wanted paths
+    elements = 0
+
+    for chunk in _read_chunks(source, max_bytes, STREAMING_CHUNK_SIZE):
+        guard.check(chunk)
+        parser.feed(chunk)
+        for event, elem in events:
+            if event == 'start':
+                if stack:
+                    node = stack[-1][1]
+                    if node:
+                        tag = elem.tag
+                        if '}' in tag:
+                            elem.tag = tag = tag.split('}', 1)[1]
+                        node = node.get(tag)
+                    else:
+                        node = None  # Inside an unwanted subtree: tags are never looked at
+                    stack.append((elem, node))
+                else:
+                    if '}' in elem.tag:
+                        elem.tag = elem.tag.split('}', 1)[1]
+                    root = elem
+                    stack.append((elem, trie))
+                elements += 1
+                if elements > max_elements:
+                    raise XmlLimitError(f"Trop d'éléments XML (limite: {max_elements})")
+                if len(stack) > max_depth:
+                    raise XmlLimitError(f"Imbrication XML trop profonde (limite: {max_depth})")
+            else:
+                node = stack.pop()[1]
+                if node is None:
+                    elem.clear()
+                    parent, parent_node = stack[-1]
+                    if not parent_node:
+                        parent.remove(elem)
+                elif node and id(node) in plan:
+                    path = plan[id(node)]
+                    if path is not None:
+                        records[path](elem)
+                    elem.clear()
+                    stack[-1][0].remove(elem)
+        events.clear()
+    parser.close()
+    return root
+
+
+def _pack_data(pack, num):
+    """Dict of a pack_travaux element, numbered `num`."""
+    pack_data = {
+        'num': str(num), # Renumber sequentially as requested (Pack 1, Pack 2...)
+        'cout_min': safe_float(safe_text(pack.find('cout_pack_travaux_min'))) * 100,
+        'cout_max': safe_float(safe_text(pack.find('cout_pack_travaux_max'))) * 100,
+        'conso_apres': safe_float(safe_text(pack.find('conso_5_usages_apres_travaux'))),
+        'ges_apres': safe_float(safe_text(pack.find('emission_ges_5_usages_apres_travaux'))),
+        'classe_energie_apres': '?', # Not explicitly in pack usually, calculated?
+        'travaux': []
+    }
+
+    # Calculate projected classes (approximate)
+    # Standard DPE 2021 thresholds, see src/thresholds.py
+    pack_data['classe_energie_apres'] = classify_energie(pack_data['conso_apres'])
+    pack_data['classe_climat_apres'] = classify_ges(pack_data['ges_apres'])
+
+    coll = pack.find('travaux_collection')
+    if coll:
+        for t in coll.findall('travaux'):
+            pack_data['travaux'].append({
+                'titre': safe_text(t.find('description_travaux')),
+                'description': safe_text(t.find('performance_recommande')) # Mapping performance to desc for UI
+            })
+    return pack_data
+
+
+def _source_size(source):
+    """Size in bytes of a path or file-like object, or None if unknown."""
+    try:
+        if isinstance(source, (str, os.PathLike)):
+            return os.path.getsize(source)
+        if source.seekable():
+            # Not getbuffer(): on a BytesIO sharing its bytes it makes a copy
+            position = source.tell()
+            size = source.seek(0, os.SEEK_END)
+            source.seek(position)
+            return size
+        return source.tell()
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def parse_dpe_file(uploaded_file, streaming=False):
     """
     Parses the DPE XML file.
+
+    With streaming=True the file is read with iterparse_pruned, which keeps
+    memory flat on large files (packs and fiches are extracted as they are
+    read) and returns the same data dict.
+    Gzip-compressed files (.xml.gz) are decompressed on the fly; for
+    .zip / .tar.gz archives of several DPEs, use src.archives.parse_dpe_archive.
+    Both modes refuse DOCTYPEs and files over MAX_XML_BYTES, MAX_XML_ELEMENTS
+    or MAX_XML_DEPTH (error dict).
     """
     data = {
         'surface': None,
@@ -31,9 +465,31 @@ def parse_dpe_file(uploaded_file):
         'debug_raw': {}
     }
     
+    # Per-stage timings (no-op when metrics are disabled)
+    timer = metrics.timer('parse')
+
+    # Streaming mode: packs and fiches extracted while reading
+    packs = fiches = None
+
     try:
-        tree = ET.parse(uploaded_file)
-        root = tree.getroot()
+        source = open_xml_source(uploaded_file)
+        try:
+            if streaming:
+                packs, fiches = [], _FicheFold()
+                root = iterparse_pruned(source, records={
+                    PACK_TRAVAUX_PATH: lambda pack: packs.append(_pack_data(pack, len(packs) + 1)),
+                    SOUS_FICHE_PATH: fiches.add,
+                })
+            else:
+                root = parse_tree(source)
+        finally:
+            if source is not uploaded_file:
+                source.close()  # Decompression wrapper only
+        timer.lap('xml')
+        if metrics.ENABLED:
+            size = _source_size(uploaded_file)
+            if size is not None:
+                metrics.observe_bytes('parse', size)
         
         # Helper to find nodes without worrying too much about namespaces if they change
         # For now, we assume standard structure. 
@@ -56,10 +512,7 @@ def parse_dpe_file(uploaded_file):
         # No, I should write robust code.
         
         # Quick namespace map removal strategy:
-        # Iterate and strip
-        for elem in root.iter():
-            if '}' in elem.tag:
-                elem.tag = elem.tag.split('}', 1)[1]  # Strip namespace
+        # parse_tree and iterparse_pruned strip them while parsing
 
         # --- Administratif ---
         data['dpe_id'] = safe_text(root.find('numero_dpe'))
@@ -83,6 +536,8 @@ def parse_dpe_file(uploaded_file):
                     data['date_fin_validite'] = "Non déterminé"
 
 
+        timer.lap('administratif')
+
         # --- Logement ---
         logement = root.find('logement')
         if logement:
@@ -161,55 +616,20 @@ def parse_dpe_file(uploaded_file):
             data['chauffage_type'] = data['chauffage_generateur'] if data['chauffage_generateur'] != "N/A" else "Non identifié"
 
 
+            timer.lap('logement')
+
             # --- Recommendations (Travaux) ---
-            travaux_section = root.find('descriptif_travaux')
-            if travaux_section:
-                packs = travaux_section.find('pack_travaux_collection')
-                if packs:
-                    pack_counter = 1
-                    for pack in packs.findall('pack_travaux'):
-                        pack_data = {
-                            'num': str(pack_counter), # Renumber sequentially as requested (Pack 1, Pack 2...)
-                            'cout_min': safe_float(safe_text(pack.find('cout_pack_travaux_min'))) * 100,
-                            'cout_max': safe_float(safe_text(pack.find('cout_pack_travaux_max'))) * 100,
-                            'conso_apres': safe_float(safe_text(pack.find('conso_5_usages_apres_travaux'))),
-                            'ges_apres': safe_float(safe_text(pack.find('emission_ges_5_usages_apres_travaux'))),
-                            'classe_energie_apres': '?', # Not explicitly in pack usually, calculated?
-                            'travaux': []
-                        }
-                        pack_counter += 1
-                        
-                        # Calculate projected class (approximate)
-                        # Standard DPE 2021 thresholds for EP
-                        val = pack_data['conso_apres']
-                        if val < 70: pack_data['classe_energie_apres'] = 'A'
-                        elif val < 110: pack_data['classe_energie_apres'] = 'B'
-                        elif val < 180: pack_data['classe_energie_apres'] = 'C'
-                        elif val < 250: pack_data['classe_energie_apres'] = 'D'
-                        elif val < 330: pack_data['classe_energie_apres'] = 'E'
-                        elif val < 420: pack_data['classe_energie_apres'] = 'F'
-                        else: pack_data['classe_energie_apres'] = 'G'
-                        
-                        # Calculate projected climate class
-                        val_ges = pack_data['ges_apres']
-                        if val_ges < 6: pack_data['classe_climat_apres'] = 'A'
-                        elif val_ges < 11: pack_data['classe_climat_apres'] = 'B'
-                        elif val_ges < 30: pack_data['classe_climat_apres'] = 'C'
-                        elif val_ges < 50: pack_data['classe_climat_apres'] = 'D'
-                        elif val_ges < 70: pack_data['classe_climat_apres'] = 'E'
-                        elif val_ges < 100: pack_data['classe_climat_apres'] = 'F'
-                        else: pack_data['classe_climat_apres'] = 'G'
-
-
-                        coll = pack.find('travaux_collection')
-                        if coll:
-                            for t in coll.findall('travaux'):
-                                pack_data['travaux'].append({
-                                    'titre': safe_text(t.find('description_travaux')),
-                                    'description': safe_text(t.find('performance_recommande')) # Mapping performance to desc for UI
-                                })
-                        
-                        data['packs_travaux'].append(pack_data)
+            if packs is not None:
+                data['packs_travaux'] = packs
+            else:
+                travaux_section = root.find('descriptif_travaux')
+                if travaux_section:
+                    pack_coll = travaux_section.find('pack_travaux_collection')
+                    if pack_coll:
+                        for num, pack in enumerate(pack_coll.findall('pack_travaux'), 1):
+                            data['packs_travaux'].append(_pack_data(pack, num))
+
+            timer.lap('travaux')
 
             # --- Fiche Technique (Details) ---
             # Initialise defaults
@@ -253,42 +673,21 @@ def parse_dpe_file(uploaded_file):
                 if ecs_systems:
                      data['ecs_type'] = " + ".join(sorted(list(set(ecs_systems))))
 
-            ft_coll = root.find('fiche_technique_collection')
-            if ft_coll:
-                # Iterate all sub-fiches
-                for ft in ft_coll.findall('fiche_technique'):
-                    sub_coll = ft.find('sous_fiche_technique_collection')
-                    if sub_coll:
-                        for sub in sub_coll.findall('sous_fiche_technique'):
-                            val = safe_text(sub.find('valeur'))
-                            desc = safe_text(sub.find('description'))
-                            
-                            if 'Hauteur moyenne sous plafond' in desc:
-                                data['hsp'] = val
-                            elif 'Matériau mur' in desc and data['mur_materiaux'] == 'Non précis':
-                                data['mur_materiaux'] = val
-                            elif 'Isolation:' in desc and data['isolation_type'] == 'Non précis':
-                                data['isolation_type'] = val
-                            elif 'Type de pb' in desc:
-                                data['plancher_bas_type'] = val
-                            elif 'Type de ph' in desc:
-                                data['plancher_haut_type'] = val
-                            elif 'Type de vitrage' in desc and data['vitrage_type'] == 'Non précis':
-                                data['vitrage_type'] = val
-                            elif 'Type ouverture' in desc and data['baie_type'] == 'Non précis':
-                                data['baie_type'] = val
-                            elif ('Type production ECS' in desc or 'Type installation ECS' in desc) and data['ecs_type'] == 'Non précis':
-                                data['ecs_type'] = val
-                            elif 'Type de ventilation' in desc:
-                                data['ventilation_type'] = val
-                            elif 'Type de distribution' in desc:
-                                data['chauffage_distribution'] = val
-                            elif 'Altitude' in desc:
-                                data['altitude'] = val
-                            elif 'Zone climatique' in desc: # Might not be explicit in description like this
-                                data['zone_climatique'] = val
-                            elif 'Année de construction' in desc:
-                                data['periode_construction'] = val
+            timer.lap('ecs')
+
+            if fiches is not None:
+                data.update(fiches.values(ecs_set=data['ecs_type'] != 'Non précis'))
+            else:
+                ft_coll = root.find('fiche_technique_collection')
+                if ft_coll:
+                    # Iterate all sub-fiches
+                    for ft in ft_coll.findall('fiche_technique'):
+                        sub_coll = ft.find('sous_fiche_technique_collection')
+                        if sub_coll:
+                            for sub in sub_coll.findall('sous_fiche_technique'):
+                                val = safe_text(sub.find('valeur'))
+                                desc = safe_text(sub.find('description'))
+                                apply_fiche_rules(data, match_fiche_rules(desc), val)
 
             # Fallback for construction period if not found in fiche_technique
             if not data.get('periode_construction'):
@@ -303,6 +702,8 @@ def parse_dpe_file(uploaded_file):
                 pid = safe_text(logement.find('caracteristique_generale/enum_periode_construction_id'))
                 data['periode_construction'] = period_map.get(pid, "Inconnue")
 
+            timer.lap('fiche_technique')
+
             # --- Enveloppe Details (Heat Loss & Comfort) ---
             data['deperditions'] = {}
             if sortie:
@@ -349,6 +750,10 @@ def parse_dpe_file(uploaded_file):
             enr = root.find('logement/production_elec_enr')
             data['has_enr'] = True if enr is not None and enr.get('{http://www.w3.org/2001/XMLSchema-instance}nil') != 'true' else False
 
+        timer.lap('enveloppe')
+
+    except XmlLimitError as e:
+        return {'error': f"Fichier refusé: {str(e)}"}
     except Exception as e:
         return {'error': f"Erreur XML: {str(e)}"}
     
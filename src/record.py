@@ -0,0 +1,183 @@
+"""
+Compact, immutable form of the parse_dpe_file result for holding many DPEs
+in memory: frozen slotted dataclasses, interned enumerated strings, tuples
+instead of lists, and no per-record dict of keys.
+
+    record = DpeRecord.from_dict(parse_dpe_file(path))
+    record.classe_energie, record.packs_travaux[0].cout_min
+    record.to_dict() == parse_dpe_file(path)   # lossless
+"""
+import sys
+from dataclasses import dataclass, fields
+
+from src.parser import parse_dpe_file
+
+
+class _Missing:
+    """Marks a key absent from the original dict (the parser only sets some keys when the XML has them)."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'MISSING'
+
+    def __bool__(self):
+        return False
+
+    def __reduce__(self):
+        return 'MISSING'
+
+MISSING = _Missing()
+
+# Free-text values, unique to each DPE: not worth interning
+UNIQUE_FIELDS = frozenset({'adresse', 'dpe_id', 'date', 'date_fin_validite'})
+
+
+def _value(name, value):
+    if isinstance(value, str) and name not in UNIQUE_FIELDS:
+        return sys.intern(value)
+    return value
+
+
+def _kwargs(cls, data):
+    return {name: _value(name, data[name]) for name in cls._names if name in data}
+
+
+def _to_dict(record):
+    out = {}
+    for name in record._names:
+        value = getattr(record, name)
+        if value is not MISSING:
+            out[name] = value
+    return out
+
+
+@dataclass(frozen=True, slots=True)
+class Travaux:
+    titre: str = MISSING
+    description: str = MISSING
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**_kwargs(cls, data))
+
+    def to_dict(self):
+        return _to_dict(self)
+
+
+@dataclass(frozen=True, slots=True)
+class PackTravaux:
+    num: str = MISSING
+    cout_min: float = MISSING
+    cout_max: float = MISSING
+    conso_apres: float = MISSING
+    ges_apres: float = MISSING
+    classe_energie_apres: str = MISSING
+    travaux: tuple = ()
+    classe_climat_apres: str = MISSING
+
+    @classmethod
+    def from_dict(cls, data):
+        kwargs = _kwargs(cls, data)
+        kwargs['travaux'] = tuple(Travaux.from_dict(t) if isinstance(t, dict) else t for t in data.get('travaux', ()))
+        return cls(**kwargs)
+
+    def to_dict(self):
+        out = _to_dict(self)
+        out['travaux'] = [t.to_dict() if isinstance(t, Travaux) else t for t in self.travaux]
+        return out
+
+
+@dataclass(frozen=True, slots=True)
+class Deperditions:
+    """Share of each wall type in the heat losses (%)."""
+    mur: float = MISSING
+    toiture: float = MISSING
+    plancher_bas: float = MISSING
+    baies: float = MISSING
+    ponts_thermiques: float = MISSING
+    ventilation: float = MISSING
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**_kwargs(cls, data))
+
+    def to_dict(self):
+        return _to_dict(self)
+
+
+@dataclass(frozen=True, slots=True)
+class DpeRecord:
+    """One parsed DPE; fields follow the keys of parse_dpe_file, in the same order."""
+    surface: float = None
+    conso_kwh: float = None
+    conso_ges: float = None
+    chauffage_type: str = None
+    classe_energie: str = None
+    classe_climat: str = None
+    adresse: str = None
+    dpe_id: str = None
+    date: str = None
+    packs_travaux: tuple = ()
+    recommendations: tuple = ()
+    debug_raw: tuple = ()  # (key, value) pairs
+    date_fin_validite: str = MISSING
+    nombre_niveaux: str = MISSING
+    annee_construction: str = MISSING
+    altitude_id: str = MISSING
+    zone_climatique_id: str = MISSING
+    chauffage_generateur: str = MISSING
+    chauffage_emetteur: str = MISSING
+    periode_construction: str = MISSING
+    hsp: str = MISSING
+    mur_materiaux: str = MISSING
+    isolation_type: str = MISSING
+    plancher_bas_type: str = MISSING
+    plancher_haut_type: str = MISSING
+    vitrage_type: str = MISSING
+    baie_type: str = MISSING
+    ecs_type: str = MISSING
+    ventilation_type: str = MISSING
+    chauffage_distribution: str = MISSING
+    zone_climatique: str = MISSING
+    altitude: str = MISSING
+    deperditions: Deperditions = MISSING
+    inertie_id: str = MISSING
+    has_enr: bool = MISSING
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a record from a parse_dpe_file dict (not an error dict)."""
+        unknown = data.keys() - cls._names_set
+        if unknown:
+            raise ValueError(f"Clés inconnues: {', '.join(sorted(unknown))}")
+        kwargs = _kwargs(cls, data)
+        kwargs['packs_travaux'] = tuple(PackTravaux.from_dict(p) for p in data.get('packs_travaux', ()))
+        kwargs['recommendations'] = tuple(data.get('recommendations', ()))
+        kwargs['debug_raw'] = tuple(data.get('debug_raw', {}).items())
+        if isinstance(data.get('deperditions'), dict):
+            kwargs['deperditions'] = Deperditions.from_dict(data['deperditions'])
+        return cls(**kwargs)
+
+    def to_dict(self):
+        """The exact dict parse_dpe_file returned (same keys, values and key order)."""
+        out = _to_dict(self)
+        out['packs_travaux'] = [p.to_dict() for p in self.packs_travaux]
+        out['recommendations'] = list(self.recommendations)
+        out['debug_raw'] = dict(self.debug_raw)
+        if isinstance(self.deperditions, Deperditions):
+            out['deperditions'] = self.deperditions.to_dict()
+        return out
+
+
+for _cls in (Travaux, PackTravaux, Deperditions, DpeRecord):
+    _cls._names = tuple(f.name for f in fields(_cls))
+    _cls._names_set = frozenset(_cls._names)
+
+
+def parse_dpe_record(source, streaming=True):
+    """parse_dpe_file returning a DpeRecord; raises ValueError with the parser message on error."""
+    data = parse_dpe_file(source, streaming=streaming)
+    if 'error' in data:
+        raise ValueError(data['error'])
+    return DpeRecord.from_dict(data)
@@ -0,0 +1,327 @@
+"""
+Static report export: one self-contained HTML file (optionally PDF) per DPE,
+with the same sections as the web report, without any NiceGUI client.
+
+    python export_reports.py dossier_dpe/ -o rapports/ [--pdf]
+
+With --etiquettes-url, the labels are <img> pointing at a running instance
+(see src.api) instead of inline SVG: smaller reports, labels cached once.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import uuid
+from functools import partial
+from html import escape
+
+from src.bulk import collect_files, count_tasks, iter_parse, parse_task
+from src.dpe_label_generator import label_url, render_scale_svg
+from src.utils import DEPERDITION_LABELS, format_value, get_isolation_status
+
+CSS = """
+body { font-family: system-ui, sans-serif; background: #f8fafc; color: #0f172a; margin: 0; }
+main { max-width: 1200px; margin: 0 auto; padding: 32px; }
+h1 { color: #1976d2; font-size: 2.2em; margin: 0 0 8px; }
+h2 { text-align: center; font-size: 1.6em; margin: 40px 0 16px; }
+h3 { color: #1976d2; margin-top: 0; }
+.center { text-align: center; }
+.muted { color: #64748b; }
+.row { display: flex; flex-wrap: wrap; gap: 16px; justify-content: center; }
+.card { background: white; border: 1px solid #e2e8f0; border-radius: 8px; padding: 20px; box-shadow: 0 1px 2px rgba(0,0,0,.05); }
+.metric { flex: 1; min-width: 200px; text-align: center; }
+.metric .value { font-size: 1.6em; font-weight: bold; }
+.label svg, .label img { width: 350px; height: 280px; }
+.pack { margin-bottom: 24px; }
+.pack .after svg, .pack .after img { width: 280px; height: 280px; }
+.budget { font-size: 1.3em; font-weight: bold; color: #1976d2; }
+.grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(300px, 1fr)); gap: 24px; }
+.bar { background: #e2e8f0; border-radius: 4px; height: 8px; width: 33%; }
+.bar div { background: #1976d2; border-radius: 4px; height: 8px; }
+.dep { display: flex; align-items: center; gap: 8px; font-size: .9em; margin-bottom: 4px; }
+.dep span:first-child { flex-grow: 1; }
+.status { color: white; padding: 4px 12px; border-radius: 6px; font-weight: bold; display: inline-block; }
+@media print { body { background: white; } .card { box-shadow: none; } .pack { break-inside: avoid; } }
+"""
+
+
+def _t(value):
+    return escape(str(value))
+
+
+def label_html(scale, value, classe, label_base=None):
+    """Inline SVG label, or an <img> of the label served by the instance at `label_base`."""
+    if label_base is None:
+        return render_scale_svg(scale, value, classe)
+    return f"<img src='{_t(label_base.rstrip('/') + label_url(scale, value, classe))}' alt=''>"
+
+
+def metrics_html(data):
+    niveaux = f" <span class='muted'>({_t(data['nombre_niveaux'])} niveaux)</span>" if data.get('nombre_niveaux') else ''
+    return f"""
+<div class="row">
+  <div class="card metric"><div class="muted">Surface</div><div class="value">{_t(format_value(data.get('surface'), 'm²'))}{niveaux}</div></div>
+  <div class="card metric"><div class="muted">Conso. Énergie</div><div class="value">{_t(format_value(data.get('conso_kwh'), 'kWh/m²/an'))}</div></div>
+  <div class="card metric"><div class="muted">Émissions GES</div><div class="value">{_t(format_value(data.get('conso_ges'), 'kgCO2/m²/an'))}</div></div>
+</div>"""
+
+
+def scale_html(data, label_base=None):
+    return f"""
+<div class="row" style="margin-top: 32px">
+  <div class="card label center"><h3>Étiquette Énergie</h3>{label_html('dpe', data.get('conso_kwh'), data.get('classe_energie'), label_base)}</div>
+  <div class="card label center"><h3>Étiquette Climat</h3>{label_html('ges', data.get('conso_ges'), data.get('classe_climat'), label_base)}</div>
+</div>"""
+
+
+def travaux_html(data, label_base=None):
+    packs = data.get('packs_travaux', [])
+    if not packs:
+        return "<p class='center' style='color: #16a34a; font-weight: bold'>✅ Aucun travaux prioritaire identifié (Logement performant).</p>"
+    parts = []
+    for pack in packs:
+        items = ''.join(
+            f"<li><b>{_t(t['titre'].capitalize())}</b>"
+            + (f"<br><i class='muted'>{_t(t['description'])}</i>" if t['description'] else '') + "</li>"
+            for t in pack['travaux'] if isinstance(t, dict)
+        )
+        after = ''
+        if pack['classe_energie_apres'] != '?':
+            after += f"<div class='card'>{label_html('dpe', pack['conso_apres'], pack['classe_energie_apres'], label_base)}</div>"
+        if pack['classe_climat_apres'] != '?':
+            after += f"<div class='card'>{label_html('ges', pack['ges_apres'], pack['classe_climat_apres'], label_base)}</div>"
+        budget = f"{format_value(pack['cout_min'], '€')} - {format_value(pack['cout_max'], '€')}"
+        parts.append(f"""
+<div class="card pack">
+  <h3>📦 Pack de Travaux n°{_t(pack['num'])}</h3>
+  <div class="row" style="justify-content: space-between">
+    <div style="flex: 1; min-width: 300px"><b>Travaux inclus :</b><ul>{items}</ul><hr><div class="budget">Budget Estimé : {_t(budget)}</div></div>
+    <div class="after"><p class="center"><b>Après travaux :</b></p><div class="row">{after}</div></div>
+  </div>
+</div>""")
+    return ''.join(parts)
+
+
+def detailed_html(data):
+    deps = data.get('deperditions', {})
+    rows = ''.join(
+        f"<div class='dep'><span>{label}</span><b>{_t(deps[k])}%</b><div class='bar'><div style='width: {min(deps[k], 100)}%'></div></div></div>"
+        for k, label in DEPERDITION_LABELS.items() if deps.get(k, 0) > 0
+    )
+    status, color = get_isolation_status(data.get('classe_energie', 'G'))
+    niveaux = f"<div>Nombre de niveaux: {_t(data['nombre_niveaux'])}</div>" if data.get('nombre_niveaux') else ''
+    return f"""
+<div class="grid">
+  <div class="card">
+    <h3>🏗️ Général & Bâtiment</h3>
+    <div>Période de Construction: {_t(data.get('periode_construction'))}</div>
+    <div>Altitude: {_t(format_value(data.get('altitude'), 'm'))}</div>
+    <div>Hauteur sous plafond: {_t(format_value(data.get('hsp'), 'm'))}</div>
+    {niveaux}
+    <hr><b>Système de ventilation</b>
+    <div>Type: {_t(data.get('ventilation_type', 'Non identifié'))}</div>
+  </div>
+  <div class="card">
+    <h3>🧱 Enveloppe (Isolation)</h3>
+    <b>Répartition des déperditions</b>{rows}
+    <hr><b>Performance Isolation</b><br><span class="status" style="background-color: {color}">{status}</span>
+  </div>
+  <div class="card">
+    <h3>⚙️ Systèmes</h3>
+    <b>🔥 Chauffage</b>
+    <div>Générateur: {_t(data.get('chauffage_generateur'))}</div>
+    <div>Émetteurs: {_t(data.get('chauffage_emetteur'))}</div>
+    <hr><b>🚿 Eau Chaude Sanitaire</b>
+    <div>Installation ECS: {_t(data.get('ecs_type'))}</div>
+  </div>
+</div>"""
+
+
+def render_html(data, title=None, label_base=None):
+    """
+    Returns the full report of one DPE as a standalone HTML page (inline CSS
+    and SVG; labels from `label_base` when given, see label_html).
+    """
+    title = title or data.get('adresse') or data.get('dpe_id') or 'Rapport DPE'
+    header = f"<h1 class='center'>📍 {_t(data['adresse'])}</h1>" if data.get('adresse') else ''
+    dates = []
+    if data.get('date'):
+        dates.append(f"📅 Date : {_t(data['date'])}")
+    if data.get('date_fin_validite'):
+        dates.append(f"⏳ Valide jusqu'au : {_t(data['date_fin_validite'])}")
+    return f"""<!DOCTYPE html>
+<html lang="fr">
+<head><meta charset="utf-8"><title>{_t(title)}</title><style>{CSS}</style></head>
+<body><main>
+{header}
+<p class="center muted">{' &nbsp; '.join(dates)}</p>
+{metrics_html(data)}
+{scale_html(data, label_base)}
+<h2>🛠️ Scénarios de Travaux (DPE)</h2>
+{travaux_html(data, label_base)}
+<h2>📋 Rapport Détaillé</h2>
+{detailed_html(data)}
+</main></body>
+</html>
+"""
+
+
+def html_to_pdf(html, path):
+    """Writes `html` as a PDF (requires the optional `weasyprint` package)."""
+    try:
+        from weasyprint import HTML
+    except ImportError:
+        raise RuntimeError("L'export PDF nécessite weasyprint (pip install weasyprint).")
+    HTML(string=html).write_pdf(path)
+
+
+def report_name(label, data):
+    """File name (without extension) of a report: the DPE number, or the source file name."""
+    name = data.get('dpe_id') or os.path.basename(label.replace('!', '/'))
+    name = re.sub(r'\.xml(\.gz)?$', '', name, flags=re.IGNORECASE)
+    return re.sub(r'[^\w.-]+', '_', name) or 'rapport'
+
+
+def _remove_report(path):
+    for ext in ('.html', '.pdf'):
+        try:
+            os.remove(path + ext)
+        except OSError:
+            pass
+
+
+def export_task(task, output_dir, pdf=False, label_base=None):
+    """
+    Worker: parses one file or archive member and writes its report under a
+    temporary name; returns (label, {'nom': report name, 'temp': path} or error).
+    The main process gives the final, unique names (see export).
+    """
+    label, data = parse_task(task)
+    if 'error' in data:
+        return label, data
+    path = os.path.join(output_dir, f".{uuid.uuid4().hex}.tmp")
+    try:
+        html = render_html(data, label_base=label_base)
+        with open(path + '.html', 'w', encoding='utf-8') as f:
+            f.write(html)
+        if pdf:
+            html_to_pdf(html, path + '.pdf')
+        return label, {'nom': report_name(label, data), 'temp': path}
+    except Exception as e:
+        _remove_report(path)
+        return label, {'error': f"Erreur: {str(e)}"}
+
+
+def unique_name(name, used):
+    """`name`, or `name-2`, `name-3`... when already used in this export (same DPE number or file name)."""
+    unique, n = name, 1
+    while unique in used:
+        n += 1
+        unique = f"{name}-{n}"
+    used.add(unique)
+    return unique
+
+
+def _publish(result, output_dir, pdf, used):
+    """Moves a report from its temporary name to its final one; returns the final name."""
+    name = unique_name(result['nom'], used)
+    path = os.path.join(output_dir, name)
+    try:
+        for ext in ('.html', '.pdf') if pdf else ('.html',):
+            os.replace(result['temp'] + ext, path + ext)
+    finally:
+        _remove_report(result['temp'])
+    return name
+
+
+def export_batch(output_dir, pdf, label_base, tasks):
+    return [export_task(task, output_dir, pdf, label_base) for task in tasks]
+
+
+def export(paths, output_dir, pdf=False, workers=None, chunksize=16, progress=sys.stderr, label_base=None):
+    """
+    Writes one report per DPE found in `paths` into `output_dir`, parsing and
+    rendering across a process pool. Returns a summary dict (see src.bulk.run),
+    with `renamed`: the (label, name) of the reports whose name was already
+    taken in this export, written with a -2, -3... suffix (in input order).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    total = count_tasks(paths)
+    errors = []
+    renamed = []
+    used = set()
+    done = 0
+    start = time.perf_counter()
+    last_report = 0.0
+
+    for label, result in iter_parse(paths, workers, chunksize, handler=partial(export_batch, output_dir, pdf, label_base)):
+        done += 1
+        if 'error' not in result:
+            try:
+                name = _publish(result, output_dir, pdf, used)
+            except OSError as e:
+                result = {'error': f"Erreur: {str(e)}"}
+            else:
+                if name != result['nom']:
+                    renamed.append((label, name))
+        if 'error' in result:
+            errors.append((label, result['error']))
+
+        now = time.perf_counter()
+        if progress and (now - last_report >= 1.0 or done == total):
+            last_report = now
+            rate = done / (now - start) if now > start else 0.0
+            count = f"{done}/{total}" if total is not None else str(done)
+            progress.write(f"\r{count} rapports - {rate:.1f} rapports/s - {len(errors)} erreurs")
+            progress.flush()
+
+    elapsed = time.perf_counter() - start
+    if progress and done:
+        progress.write('\n')
+    return {
+        'total': done,
+        'ok': done - len(errors),
+        'errors': errors,
+        'renamed': renamed,
+        'elapsed': elapsed,
+        'reports_per_second': done / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export de rapports DPE statiques (HTML autonome, PDF en option).")
+    ap.add_argument('inputs', nargs='+', help="Dossiers, fichiers, archives ou motifs glob (ex: 'dpe/**/*.xml')")
+    ap.add_argument('-o', '--output', required=True, help="Dossier de sortie des rapports")
+    ap.add_argument('--pdf', action='store_true', help="Écrire aussi un PDF par rapport (nécessite weasyprint)")
+    ap.add_argument('--etiquettes-url', default=None, metavar='URL',
+                    help="Étiquettes en <img> servies par une instance du Lecteur DPE (ex: http://dpe.local:8080) au lieu de SVG intégrés")
+    ap.add_argument('-j', '--workers', type=int, default=None, help="Nombre de processus (défaut: nombre de coeurs)")
+    ap.add_argument('--chunksize', type=int, default=16, help="Fichiers envoyés par lot à chaque processus")
+    ap.add_argument('-q', '--quiet', action='store_true', help="Pas d'affichage de progression")
+    args = ap.parse_args(argv)
+
+    if args.pdf:
+        try:
+            import weasyprint  # noqa: F401
+        except ImportError:
+            ap.error("l'export PDF nécessite weasyprint (pip install weasyprint)")
+
+    paths = collect_files(args.inputs)
+    if not paths:
+        print("Aucun fichier XML ou archive trouvé.", file=sys.stderr)
+        return 1
+
+    summary = export(paths, args.output, args.pdf, args.workers, args.chunksize, None if args.quiet else sys.stderr,
+                     args.etiquettes_url)
+    print(f"{summary['ok']}/{summary['total']} rapports écrits dans {args.output} en {summary['elapsed']:.1f}s "
+          f"({summary['reports_per_second']:.1f} rapports/s)", file=sys.stderr)
+    for label, err in summary['errors']:
+        print(f"  {label}: {err}", file=sys.stderr)
+    for label, name in summary['renamed']:
+        print(f"  {label}: nom déjà utilisé, rapport écrit sous {name}", file=sys.stderr)
+    return 0 if not summary['errors'] else 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
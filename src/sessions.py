@@ -0,0 +1,112 @@
+"""
+Server-side memory of the DPEs parsed in each browser session, so that a
+page reload or a reconnection shows them again without a new upload.
+
+Sessions are kept in an LRU bounded by `max_sessions` and dropped after
+`ttl` seconds without access; each one holds at most `max_results` DPEs
+(as compact DpeRecords, oldest dropped first) and the ids of the last
+`history_size` reports viewed.
+"""
+import os
+import time
+from collections import OrderedDict, deque
+
+
+class Session:
+    """Parsed DPEs of one browser session, by row id (the id used in the comparison table)."""
+
+    def __init__(self, id=None, max_results=50, history_size=8):
+        self.id = id
+        self.max_results = max_results
+        self.results = OrderedDict()  # row id -> (name, DpeRecord)
+        self.history = deque(maxlen=history_size)  # Most recently viewed last
+        self.next_id = 0
+        self.last_access = time.monotonic()
+
+    def __len__(self):
+        return len(self.results)
+
+    def add(self, name, record):
+        """Stores a record; returns (row id, ids of the results dropped to stay within max_results)."""
+        row_id = self.next_id
+        self.next_id += 1
+        self.results[row_id] = (name, record)
+        evicted = []
+        while len(self.results) > self.max_results:
+            old_id, _ = self.results.popitem(last=False)
+            evicted.append(old_id)
+        if evicted:
+            self.history = deque((i for i in self.history if i not in evicted), maxlen=self.history.maxlen)
+        return row_id, evicted
+
+    def get(self, row_id):
+        """(name, DpeRecord) of a result, or None once it has been dropped."""
+        return self.results.get(row_id)
+
+    def view(self, row_id):
+        """Marks a result as the one displayed (moves it to the end of the history)."""
+        if row_id in self.history:
+            self.history.remove(row_id)
+        self.history.append(row_id)
+
+    @property
+    def current(self):
+        """Row id of the last report viewed, or None."""
+        return self.history[-1] if self.history else None
+
+
+class SessionStore:
+    """LRU of Session objects by session id, with a time-to-live since the last access."""
+
+    def __init__(self, max_sessions=500, ttl=3600.0, max_results=50, history_size=8):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_results = max_results
+        self.history_size = history_size
+        self._sessions = OrderedDict()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id):
+        """The Session of `session_id`, created when missing or expired (not stored for a None id)."""
+        now = time.monotonic()
+        self._evict_expired(now)
+        if session_id is None:
+            return Session(None, self.max_results, self.history_size)
+
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = Session(session_id, self.max_results, self.history_size)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_access = now
+        return session
+
+    def touch(self, session):
+        """Records activity on a session (uploads, report views) so that it does not expire while in use."""
+        session.last_access = time.monotonic()
+        if self._sessions.get(session.id) is session:
+            self._sessions.move_to_end(session.id)
+
+    def _evict_expired(self, now):
+        # Least recently accessed first: stop at the first session still alive
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access <= self.ttl:
+                break
+            del self._sessions[session_id]
+
+
+def _store_from_env():
+    return SessionStore(
+        max_sessions=int(os.environ.get('DPE_SESSION_MAX', 500)),
+        ttl=float(os.environ.get('DPE_SESSION_TTL', 3600)),
+        max_results=int(os.environ.get('DPE_SESSION_MAX_RESULTS', 50)),
+        history_size=int(os.environ.get('DPE_SESSION_HISTORY', 8)),
+    )
+
+# Shared store used by the web UI (configured through environment variables)
+session_store = _store_from_env()
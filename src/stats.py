@@ -0,0 +1,267 @@
+"""
+Portfolio statistics over many parsed DPEs, computed with NumPy.
+
+The DPEs are loaded once into flat arrays (categorical fields as integer
+codes); every aggregation is then a handful of vectorized passes
+(bincount, argsort), so they stay interactive on a million records.
+
+    portfolio = Portfolio.from_records(parse_dpe_file(p) for p in paths)
+    portfolio = Portfolio.from_store(DpeStore('dpe.sqlite'))
+    portfolio = Portfolio.from_parquet('portefeuille.parquet')
+    portfolio.class_distribution()
+    portfolio.median_conso_by('periode_construction', 'zone_climatique')
+"""
+import numpy as np
+
+from src.thresholds import CLASSES
+from src.utils import DEPERDITION_LABELS, normalize_zone
+
+POSTES = tuple(DEPERDITION_LABELS)
+GROUP_FIELDS = ('periode_construction', 'zone_climatique')
+UNKNOWN = 'Inconnue'
+
+_CLASS_CODES = {c: i for i, c in enumerate(CLASSES)}
+
+
+def _floats(values):
+    return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+
+
+def _pack_nums(values):
+    """Pack numbers ('1', '2'...) as integers, -1 when not a number."""
+    return np.array([int(v) if str(v).isdigit() else -1 for v in values], dtype=np.int64)
+
+
+def _class_codes(values):
+    """Class letters -> 0..6 (A..G), -1 when unknown."""
+    return np.array([_CLASS_CODES.get(v, -1) for v in values], dtype=np.int8)
+
+
+def _categorical(values, normalize=None):
+    """
+    (labels, codes) of a column of strings; missing values get the UNKNOWN label.
+    `normalize` maps each distinct label to its canonical form, labels that
+    end up equal being merged.
+    """
+    arr = np.array([UNKNOWN if v in (None, '') else str(v) for v in values], dtype=str)
+    if not len(arr):
+        return np.array([], dtype=str), np.zeros(0, dtype=np.int64)
+    labels, codes = np.unique(arr, return_inverse=True)
+    if normalize is not None:
+        labels, merged = np.unique(np.array([normalize(label) for label in labels], dtype=str), return_inverse=True)
+        codes = merged[codes]
+    return labels, codes.astype(np.int64)
+
+
+# Canonical label of each group field: zone ids ('1'..'8') are the same zones as 'H1a'..'H3'
+_NORMALIZE = {'zone_climatique': normalize_zone}
+
+
+def _groups(dpe):
+    return {name: _categorical(dpe[name], _NORMALIZE.get(name)) for name in GROUP_FIELDS}
+
+
+def group_median(codes, values, ngroups):
+    """Per-group (count, median) of `values`, NaNs ignored, from one sort of the values."""
+    valid = ~np.isnan(values)
+    codes, values = codes[valid], values[valid]
+    # Sort by value, then by group with a stable (radix) sort: much faster than lexsort
+    order = np.argsort(values)
+    order = order[np.argsort(codes[order], kind='stable')]
+    codes, values = codes[order], values[order]
+    counts = np.bincount(codes, minlength=ngroups)
+    starts = np.cumsum(counts) - counts
+    medians = np.full(ngroups, np.nan)
+    present = counts > 0
+    lo = starts[present] + (counts[present] - 1) // 2
+    hi = starts[present] + counts[present] // 2
+    medians[present] = (values[lo] + values[hi]) / 2
+    return counts, medians
+
+
+def group_mean(codes, values, ngroups):
+    """Per-group (count, mean) of `values`, NaNs ignored."""
+    valid = ~np.isnan(values)
+    counts = np.bincount(codes[valid], minlength=ngroups)
+    sums = np.bincount(codes[valid], weights=values[valid], minlength=ngroups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return counts, np.where(counts > 0, sums / counts, np.nan)
+
+
+class Portfolio:
+    """
+    Column arrays of a set of DPEs.
+
+    DPE arrays have one entry per DPE; pack arrays one entry per pack_travaux,
+    `pack_dpe` giving the position of its DPE. `deperditions` is an
+    (n, len(POSTES)) matrix of shares in %, NaN when absent.
+    """
+
+    def __init__(self, conso_kwh, classe_energie, classe_climat, groups, deperditions,
+                 pack_dpe, pack_num, cout_min, cout_max, conso_apres):
+        self.conso_kwh = conso_kwh
+        self.classe_energie = classe_energie
+        self.classe_climat = classe_climat
+        self.groups = groups  # field -> (labels, codes)
+        self.deperditions = deperditions
+        self.pack_dpe = pack_dpe
+        self.pack_num = pack_num
+        self.cout_min = cout_min
+        self.cout_max = cout_max
+        self.conso_apres = conso_apres
+
+    def __len__(self):
+        return len(self.conso_kwh)
+
+    # --- Loading ---
+
+    @classmethod
+    def from_records(cls, records):
+        """From parse_dpe_file dicts or DpeRecords (error dicts are skipped)."""
+        dpe = {name: [] for name in ('conso_kwh', 'classe_energie', 'classe_climat') + GROUP_FIELDS}
+        deps = []
+        packs = {name: [] for name in ('dpe', 'num', 'cout_min', 'cout_max', 'conso_apres')}
+        for record in records:
+            data = record if isinstance(record, dict) else record.to_dict()
+            if 'error' in data:
+                continue
+            index = len(deps)
+            for name, column in dpe.items():
+                column.append(data.get(name))
+            shares = data.get('deperditions') or {}
+            deps.append([shares.get(poste, np.nan) for poste in POSTES])
+            for pack in data.get('packs_travaux', []):
+                packs['dpe'].append(index)
+                packs['num'].append(pack.get('num'))
+                for name in ('cout_min', 'cout_max', 'conso_apres'):
+                    packs[name].append(pack.get(name))
+
+        return cls(
+            _floats(dpe['conso_kwh']), _class_codes(dpe['classe_energie']), _class_codes(dpe['classe_climat']),
+            _groups(dpe),
+            np.array(deps, dtype=np.float64).reshape(len(deps), len(POSTES)),
+            np.array(packs['dpe'], dtype=np.int64), _pack_nums(packs['num']),
+            _floats(packs['cout_min']), _floats(packs['cout_max']), _floats(packs['conso_apres']),
+        )
+
+    @classmethod
+    def _from_tables(cls, dpe_keys, dpe, pack_keys, packs, dep_keys, postes, parts):
+        """Builds the arrays from the flat tables of a DpeStore or a columnar export."""
+        dpe_keys = np.asarray(dpe_keys, dtype=np.int64)
+        order = np.argsort(dpe_keys)
+
+        def positions(keys):
+            keys = np.asarray(keys, dtype=np.int64)
+            return order[np.searchsorted(dpe_keys, keys, sorter=order)]
+
+        deperditions = np.full((len(dpe_keys), len(POSTES)), np.nan)
+        poste_codes = np.array([POSTES.index(p) if p in POSTES else -1 for p in postes], dtype=np.int64)
+        known = poste_codes >= 0
+        if known.any():
+            deperditions[positions(np.asarray(dep_keys)[known]), poste_codes[known]] = _floats(parts)[known]
+
+        return cls(
+            _floats(dpe['conso_kwh']), _class_codes(dpe['classe_energie']), _class_codes(dpe['classe_climat']),
+            _groups(dpe),
+            deperditions,
+            positions(pack_keys) if len(pack_keys) else np.zeros(0, dtype=np.int64),
+            _pack_nums(packs['num']),
+            _floats(packs['cout_min']), _floats(packs['cout_max']), _floats(packs['conso_apres']),
+        )
+
+    @classmethod
+    def from_store(cls, store):
+        """From the indexed columns of a DpeStore (the JSON blobs are not read)."""
+        rows = store.conn.execute(
+            'SELECT id, conso_kwh, classe_energie, classe_climat, periode_construction, zone_climatique FROM dpe').fetchall()
+        keys, conso, ce, cc, periode, zone = zip(*rows) if rows else ((),) * 6
+        dpe = {'conso_kwh': conso, 'classe_energie': ce, 'classe_climat': cc,
+               'periode_construction': periode, 'zone_climatique': zone}
+        rows = store.conn.execute('SELECT dpe_rowid, num, cout_min, cout_max, conso_apres FROM pack_travaux').fetchall()
+        pack_keys, num, cout_min, cout_max, conso_apres = zip(*rows) if rows else ((),) * 5
+        packs = {'num': num, 'cout_min': cout_min, 'cout_max': cout_max, 'conso_apres': conso_apres}
+        rows = store.conn.execute('SELECT dpe_rowid, poste, part FROM deperdition').fetchall()
+        dep_keys, postes, parts = zip(*rows) if rows else ((),) * 3
+        return cls._from_tables(keys, dpe, pack_keys, packs, dep_keys, postes, parts)
+
+    @classmethod
+    def from_parquet(cls, path):
+        """From a src.columnar Parquet export ('portefeuille.parquet' and its .packs / .deperditions tables)."""
+        import pyarrow.parquet as pq
+
+        base = path[:-len('.parquet')] if path.endswith('.parquet') else path
+
+        def columns(table_path, names):
+            table = pq.read_table(table_path, columns=list(names))
+            return {name: table.column(name).to_pylist() for name in names}
+
+        dpe = columns(f"{base}.parquet", ('dpe_index', 'conso_kwh', 'classe_energie', 'classe_climat') + GROUP_FIELDS)
+        packs = columns(f"{base}.packs.parquet", ('dpe_index', 'num', 'cout_min', 'cout_max', 'conso_apres'))
+        deps = columns(f"{base}.deperditions.parquet", ('dpe_index', 'poste', 'part'))
+        return cls._from_tables(dpe['dpe_index'], dpe, packs['dpe_index'], packs,
+                                deps['dpe_index'], deps['poste'], deps['part'])
+
+    # --- Aggregations ---
+
+    def class_distribution(self, kind='energie'):
+        """{class: number of DPEs} for the 'energie' or 'climat' class."""
+        codes = self.classe_energie if kind == 'energie' else self.classe_climat
+        counts = np.bincount(codes[codes >= 0], minlength=len(CLASSES))
+        return dict(zip(CLASSES, counts.tolist()))
+
+    def median_conso_by(self, *fields):
+        """
+        Median conso_kwh per group of `fields` (among GROUP_FIELDS), as a list
+        of dicts sorted by group: {field: label, ..., 'nombre': n, 'conso_mediane': m}.
+        """
+        fields = fields or GROUP_FIELDS
+        codes = np.zeros(len(self), dtype=np.int64)
+        sizes = []
+        for field in fields:
+            labels, field_codes = self.groups[field]
+            codes = codes * len(labels) + field_codes
+            sizes.append(len(labels))
+        ngroups = int(np.prod(sizes)) if sizes else 1
+        counts, medians = group_median(codes, self.conso_kwh, ngroups)
+
+        rows = []
+        for group in np.flatnonzero(counts):
+            row = {}
+            rest = int(group)
+            for field, size in zip(reversed(fields), reversed(sizes)):
+                rest, code = divmod(rest, size)
+                row[field] = str(self.groups[field][0][code])
+            rows.append({**{f: row[f] for f in fields}, 'nombre': int(counts[group]),
+                         'conso_mediane': round(float(medians[group]), 1)})
+        return rows
+
+    def mean_deperditions(self):
+        """{poste: average share in % over the DPEs that have it}."""
+        valid = ~np.isnan(self.deperditions)
+        counts = valid.sum(axis=0)
+        sums = np.where(valid, self.deperditions, 0.0).sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(counts > 0, sums / counts, np.nan)
+        return {poste: None if np.isnan(m) else round(float(m), 1) for poste, m in zip(POSTES, means)}
+
+    def pack_cost_per_kwh(self):
+        """
+        Cost per kWh/m²/an saved (cout / (conso_kwh - conso_apres)) for each pack
+        number, for the low and high estimate: list of dicts with the number of
+        packs and the mean and median of both ratios. Packs without savings are ignored.
+        """
+        if not len(self.pack_dpe):
+            return []
+        saved = self.conso_kwh[self.pack_dpe] - self.conso_apres
+        valid = saved > 0
+        nums, codes = np.unique(self.pack_num[valid], return_inverse=True)
+        rows = {num: {'pack': str(num)} for num in nums.tolist()}
+        for bound, cost in (('min', self.cout_min), ('max', self.cout_max)):
+            ratio = cost[valid] / saved[valid]
+            counts, means = group_mean(codes, ratio, len(nums))
+            _, medians = group_median(codes, ratio, len(nums))
+            for num, count, mean, median in zip(nums.tolist(), counts, means, medians):
+                rows[num]['nombre'] = int(count)
+                rows[num][f'moyenne_{bound}'] = None if np.isnan(mean) else round(float(mean), 1)
+                rows[num][f'mediane_{bound}'] = None if np.isnan(median) else round(float(median), 1)
+        return list(rows.values())
@@ -0,0 +1,251 @@
+import json
+import re
+import sqlite3
+
+from src.utils import ZONES_CLIMATIQUES, normalize_zone
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dpe (
+    id INTEGER PRIMARY KEY,
+    dpe_id TEXT UNIQUE,
+    fichier TEXT,
+    adresse TEXT,
+    date TEXT,
+    classe_energie TEXT,
+    classe_climat TEXT,
+    conso_kwh REAL,
+    conso_ges REAL,
+    surface REAL,
+    zone_climatique TEXT,
+    altitude TEXT,
+    annee_construction INTEGER,
+    periode_construction TEXT,
+    chauffage_generateur TEXT,
+    chauffage_emetteur TEXT,
+    ecs_type TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_dpe_adresse ON dpe(adresse);
+CREATE INDEX IF NOT EXISTS idx_dpe_classe_energie ON dpe(classe_energie);
+CREATE INDEX IF NOT EXISTS idx_dpe_classe_climat ON dpe(classe_climat);
+CREATE INDEX IF NOT EXISTS idx_dpe_date ON dpe(date);
+CREATE INDEX IF NOT EXISTS idx_dpe_zone ON dpe(zone_climatique, classe_energie);
+CREATE INDEX IF NOT EXISTS idx_dpe_annee ON dpe(annee_construction);
+
+CREATE TABLE IF NOT EXISTS pack_travaux (
+    id INTEGER PRIMARY KEY,
+    dpe_rowid INTEGER NOT NULL REFERENCES dpe(id) ON DELETE CASCADE,
+    num TEXT,
+    cout_min REAL,
+    cout_max REAL,
+    conso_apres REAL,
+    ges_apres REAL,
+    classe_energie_apres TEXT,
+    classe_climat_apres TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_pack_dpe ON pack_travaux(dpe_rowid);
+
+CREATE TABLE IF NOT EXISTS travaux (
+    pack_rowid INTEGER NOT NULL REFERENCES pack_travaux(id) ON DELETE CASCADE,
+    titre TEXT,
+    description TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_travaux_pack ON travaux(pack_rowid);
+
+CREATE TABLE IF NOT EXISTS deperdition (
+    dpe_rowid INTEGER NOT NULL REFERENCES dpe(id) ON DELETE CASCADE,
+    poste TEXT,
+    part INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_deperdition_dpe ON deperdition(dpe_rowid);
+"""
+
+# Stored in PRAGMA user_version, bumped with each migration in DpeStore._migrate
+SCHEMA_VERSION = 1
+
+DPE_COLUMNS = [
+    'dpe_id', 'fichier', 'adresse', 'date', 'classe_energie', 'classe_climat',
+    'conso_kwh', 'conso_ges', 'surface', 'zone_climatique', 'altitude',
+    'annee_construction', 'periode_construction', 'chauffage_generateur',
+    'chauffage_emetteur', 'ecs_type', 'data',
+]
+
+
+def _year(value):
+    """
+    Construction year from a year or a period label: '1930' -> 1930,
+    '1949-1974' -> 1949, 'Avant 1948' -> 1947, 'Après 2021' -> 2022.
+    """
+    text = str(value or '')
+    match = re.search(r'\d{4}', text)
+    if not match:
+        return None
+    year = int(match.group())
+    if text.startswith('Avant'):
+        return year - 1
+    if text.startswith('Après'):
+        return year + 1
+    return year
+
+
+class DpeStore:
+    """
+    SQLite store of parse_dpe_file results.
+
+    The full data dict is kept as JSON (lossless) next to indexed scalar
+    columns; packs, works and heat loss shares go to child tables.
+    A DPE already stored under the same numero_dpe is replaced.
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """
+        Brings a database written by an older version up to SCHEMA_VERSION,
+        once: the version is kept in PRAGMA user_version, so opening an
+        up-to-date database (read-only ones included) writes nothing.
+        """
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+        try:
+            with self.conn:
+                if version < 1:
+                    # Zone ids ('1'..'8') stored as zone names (cheap: uses the index)
+                    self.conn.executemany('UPDATE dpe SET zone_climatique = ? WHERE zone_climatique = ?',
+                                          [(zone, zone_id) for zone_id, zone in ZONES_CLIMATIQUES.items()])
+                self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        except sqlite3.OperationalError as e:
+            if 'readonly' not in str(e):
+                raise
+            # Read-only: readable as is, migrated the next time it is opened for writing
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- Ingestion ---
+
+    def add(self, data, fichier=None):
+        self.add_many([(fichier, data)])
+
+    def add_many(self, items, batch_size=1000):
+        """
+        Stores (fichier, data) pairs, `batch_size` per transaction.
+        Error dicts are skipped. Returns the number of DPEs stored.
+        """
+        count = 0
+        batch = []
+        for fichier, data in items:
+            if 'error' in data:
+                continue
+            batch.append((fichier, data))
+            if len(batch) >= batch_size:
+                count += self._insert_batch(batch)
+                batch = []
+        if batch:
+            count += self._insert_batch(batch)
+        return count
+
+    def _insert_batch(self, batch):
+        with self.conn:
+            cur = self.conn.cursor()
+            placeholders = ', '.join('?' * len(DPE_COLUMNS))
+            for fichier, data in batch:
+                dpe_id = data.get('dpe_id') or None
+                if dpe_id:
+                    cur.execute('DELETE FROM dpe WHERE dpe_id = ?', (dpe_id,))
+                cur.execute(
+                    f"INSERT INTO dpe ({', '.join(DPE_COLUMNS)}) VALUES ({placeholders})",
+                    (
+                        dpe_id, fichier, data.get('adresse'), data.get('date'),
+                        data.get('classe_energie'), data.get('classe_climat'),
+                        data.get('conso_kwh'), data.get('conso_ges'), data.get('surface'),
+                        normalize_zone(data.get('zone_climatique')), data.get('altitude'),
+                        _year(data.get('annee_construction')) or _year(data.get('periode_construction')),
+                        data.get('periode_construction'), data.get('chauffage_generateur'),
+                        data.get('chauffage_emetteur'), data.get('ecs_type'),
+                        json.dumps(data, ensure_ascii=False, default=str),
+                    ),
+                )
+                rowid = cur.lastrowid
+
+                for pack in data.get('packs_travaux', []):
+                    cur.execute(
+                        'INSERT INTO pack_travaux (dpe_rowid, num, cout_min, cout_max, conso_apres, ges_apres, '
+                        'classe_energie_apres, classe_climat_apres) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                        (rowid, pack.get('num'), pack.get('cout_min'), pack.get('cout_max'), pack.get('conso_apres'),
+                         pack.get('ges_apres'), pack.get('classe_energie_apres'), pack.get('classe_climat_apres')),
+                    )
+                    pack_rowid = cur.lastrowid
+                    cur.executemany(
+                        'INSERT INTO travaux (pack_rowid, titre, description) VALUES (?, ?, ?)',
+                        [(pack_rowid, t.get('titre'), t.get('description')) for t in pack.get('travaux', [])],
+                    )
+
+                cur.executemany(
+                    'INSERT INTO deperdition (dpe_rowid, poste, part) VALUES (?, ?, ?)',
+                    [(rowid, poste, part) for poste, part in (data.get('deperditions') or {}).items()],
+                )
+        return len(batch)
+
+    # --- Lookups ---
+
+    def get(self, numero_dpe):
+        """Returns the stored data dict for a numero_dpe, or None."""
+        row = self.conn.execute('SELECT data FROM dpe WHERE dpe_id = ?', (numero_dpe,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def query(self, classes_energie=None, classes_climat=None, zone=None, annee_avant=None,
+              adresse=None, date_min=None, date_max=None, limit=None):
+        """
+        Filtered search, returns the matching data dicts.
+        `zone` is a prefix ('H1' matches 'H1a', 'H1b'...), `adresse` a substring,
+        `annee_avant` keeps DPEs built strictly before that year.
+        Ex: query(classes_energie=['F', 'G'], zone='H1', annee_avant=1948)
+        """
+        where, params = [], []
+        if classes_energie:
+            where.append(f"classe_energie IN ({', '.join('?' * len(classes_energie))})")
+            params.extend(classes_energie)
+        if classes_climat:
+            where.append(f"classe_climat IN ({', '.join('?' * len(classes_climat))})")
+            params.extend(classes_climat)
+        if zone:
+            where.append('zone_climatique GLOB ?')  # Unlike LIKE, GLOB can use the index
+            params.append(f'{zone}*')
+        if annee_avant is not None:
+            where.append('annee_construction < ?')
+            params.append(annee_avant)
+        if adresse:
+            where.append('adresse LIKE ?')
+            params.append(f'%{adresse}%')
+        if date_min:
+            where.append('date >= ?')
+            params.append(date_min)
+        if date_max:
+            where.append('date <= ?')
+            params.append(date_max)
+
+        sql = 'SELECT data FROM dpe'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY id'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        return [json.loads(row[0]) for row in self.conn.execute(sql, params)]
+
+    def count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM dpe').fetchone()[0]
@@ -0,0 +1,35 @@
+from bisect import bisect_right
+
+# DPE 2021 thresholds (upper bounds, exclusive) between consecutive classes
+CLASSES = ('A', 'B', 'C', 'D', 'E', 'F', 'G')
+SEUILS_ENERGIE = (70, 110, 180, 250, 330, 420)  # kWh/m²/an (énergie primaire)
+SEUILS_GES = (6, 11, 30, 50, 70, 100)  # kgCO2/m²/an
+
+SEUILS = {'energy': SEUILS_ENERGIE, 'ges': SEUILS_GES}
+
+
+def classify(value, type='energy'):
+    """
+    Returns the class letter for a consumption ('energy') or emission ('ges') value.
+    A value equal to a threshold falls in the next class (e.g. 70 -> 'B').
+    """
+    return CLASSES[bisect_right(SEUILS[type], value)]
+
+
+def classify_energie(value):
+    return classify(value, 'energy')
+
+
+def classify_ges(value):
+    return classify(value, 'ges')
+
+
+def classify_batch(values, type='energy'):
+    """
+    Vectorized classify(): returns a NumPy array of class letters for an
+    array-like of values, in a single searchsorted pass.
+    """
+    import numpy as np  # Only needed for batch analytics
+
+    idx = np.searchsorted(np.asarray(SEUILS[type], dtype=float), np.asarray(values, dtype=float), side='right')
+    return np.asarray(CLASSES)[idx]
@@ -0,0 +1,194 @@
+"""
+Uploads received within bounded memory.
+
+The bytes arrive in chunks: they are kept in memory up to SPOOL_MAX_SIZE,
+written to a temporary file beyond, hashed on the way (the digest is the
+parse cache key, so the file never has to be read back whole) and refused
+past MAX_UPLOAD_BYTES. BodyLimitMiddleware refuses oversized request bodies
+before they are even read (MAX_BATCH_BYTES for the routes taking several
+files at once).
+
+    upload = await receive_upload(e.file.iterate(), name)
+    try:
+        data = await parse_pool.parse(upload)
+    finally:
+        upload.close()
+"""
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+
+from src.parser import MAX_XML_BYTES
+from src.utils import format_size
+
+# Largest accepted upload (archives included), and size kept in memory before spooling to disk
+MAX_UPLOAD_BYTES = int(os.environ.get('DPE_UPLOAD_MAX_BYTES', MAX_XML_BYTES))
+SPOOL_MAX_SIZE = int(os.environ.get('DPE_UPLOAD_SPOOL_BYTES', 1024 * 1024))
+# Largest request body of the multi-file routes, each file still being held to MAX_UPLOAD_BYTES
+MAX_BATCH_BYTES = int(os.environ.get('DPE_BATCH_MAX_BYTES', 10 * MAX_UPLOAD_BYTES))
+
+# Room for the multipart boundaries and headers around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class UploadTooLarge(ValueError):
+    """The upload exceeds MAX_UPLOAD_BYTES."""
+
+
+def too_large_message(max_bytes=MAX_UPLOAD_BYTES, subject="Fichier"):
+    return f"{subject} trop volumineux (limite: {format_size(max_bytes)})"
+
+
+class SpooledUpload:
+    """
+    One uploaded file, written chunk by chunk with write() then finish().
+
+    Small files stay in memory (`content`), larger ones are in a temporary
+    file (`path`) removed by close(). `digest` is the SHA-256 of the bytes.
+    """
+
+    def __init__(self, name, max_bytes=MAX_UPLOAD_BYTES, spool_max_size=SPOOL_MAX_SIZE):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.spool_max_size = spool_max_size
+        self.size = 0
+        self.digest = None
+        self.path = None
+        self._sha = hashlib.sha256()
+        self._buffer = io.BytesIO()
+        self._file = None
+
+    @property
+    def spooled(self):
+        return self.path is not None
+
+    @property
+    def content(self):
+        """The bytes of an in-memory upload, None once spooled to disk."""
+        return None if self.spooled else self._buffer.getvalue()
+
+    def write(self, chunk):
+        self.size += len(chunk)
+        if self.max_bytes and self.size > self.max_bytes:
+            raise UploadTooLarge(too_large_message(self.max_bytes))
+        self._sha.update(chunk)
+        if self._file is None and self.size > self.spool_max_size:
+            self._file = tempfile.NamedTemporaryFile(prefix='dpe-upload-', delete=False)
+            self.path = self._file.name
+            self._file.write(self._buffer.getvalue())
+            self._buffer = None
+        (self._file or self._buffer).write(chunk)
+
+    def finish(self):
+        if self._file is not None:
+            self._file.close()
+        self.digest = self._sha.hexdigest()
+
+    def head(self, size=64 * 1024):
+        """First bytes of the upload (enough to sniff the format)."""
+        if not self.spooled:
+            return self._buffer.getvalue()[:size]
+        with open(self.path, 'rb') as f:
+            return f.read(size)
+
+    def open(self):
+        """New binary file object over the upload, to be closed by the caller."""
+        return open(self.path, 'rb') if self.spooled else io.BytesIO(self._buffer.getvalue())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+async def receive_upload(chunks, name, max_bytes=MAX_UPLOAD_BYTES, spool_max_size=SPOOL_MAX_SIZE):
+    """
+    Reads an async iterator of byte chunks into a finished SpooledUpload.
+    Raises UploadTooLarge (nothing is left on disk) past `max_bytes`.
+    """
+    upload = SpooledUpload(name, max_bytes, spool_max_size)
+    try:
+        async for chunk in chunks:
+            if upload.spooled:
+                await asyncio.to_thread(upload.write, chunk)  # Disk write and hashing off the event loop
+            else:
+                upload.write(chunk)
+        upload.finish()
+    except BaseException:
+        upload.close()
+        raise
+    return upload
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class BodyLimitMiddleware:
+    """
+    ASGI middleware answering 413 to POST/PUT requests whose body exceeds
+    `max_bytes` (plus MULTIPART_OVERHEAD): from the Content-Length header when
+    there is one, otherwise as soon as the received body goes past the limit.
+    `path_limits` maps request paths to their own limit (multi-file routes).
+    """
+
+    def __init__(self, app, max_bytes=MAX_UPLOAD_BYTES, path_limits=None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = self.path_limits.get(scope.get('path'), self.max_bytes) if scope['type'] == 'http' else 0
+        if not max_bytes or scope['method'] not in ('POST', 'PUT'):
+            await self.app(scope, receive, send)
+            return
+        limit = max_bytes + MULTIPART_OVERHEAD
+        subject = "Envoi" if scope['path'] in self.path_limits else "Fichier"
+
+        length = dict(scope['headers']).get(b'content-length')
+        if length is not None and length.isdigit() and int(length) > limit:
+            await self._reject(send, too_large_message(max_bytes, subject))
+            return
+
+        received = 0
+        started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > limit:
+                    raise _BodyTooLarge()
+            return message
+
+        async def tracking_send(message):
+            nonlocal started
+            if message['type'] == 'http.response.start':
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge:
+            if not started:
+                await self._reject(send, too_large_message(max_bytes, subject))
+
+    async def _reject(self, send, message):
+        body = message.encode()
+        await send({'type': 'http.response.start', 'status': 413,
+                    'headers': [(b'content-type', b'text/plain; charset=utf-8'),
+                                (b'content-length', str(len(body)).encode())]})
+        await send({'type': 'http.response.body', 'body': body})
@@ -50,3 +50,44 @@ def format_value(value, unit=''):
         
     except (ValueError, TypeError):
         return str(value)
+
+# Labels of the deperditions breakdown, in display order
+DEPERDITION_LABELS = {
+    'toiture': 'Toiture',
+    'mur': 'Murs',
+    'baies': 'Menuiseries',
+    'plancher_bas': 'Sol',
+    'ventilation': 'Ventil.',
+    'ponts_thermiques': 'Ponts Th.'
+}
+
+def get_isolation_status(dpe_class):
+    """
+    Returns the (status, color) of the envelope insulation for a DPE class.
+    """
+    if dpe_class in ['F', 'G']:
+        return "INSUFFISANTE", "#ff4b4b"
+    if dpe_class in ['D', 'E']:
+        return "MOYENNE", "#ffa500"
+    if dpe_class in ['C']:
+        return "BONNE", "#90ee90"
+    return "TRÈS BONNE", "#228b22"
+
+def format_size(size):
+    """Human-readable size in bytes, French units (ko, Mo, Go)."""
+    for unit in ('octets', 'ko', 'Mo'):
+        if size < 1024:
+            return format_value(size, unit)
+        size /= 1024
+    return format_value(size, 'Go')
+
+# ADEME enum_zone_climatique_id -> climate zone, the value the parser falls
+# back to when the fiche technique has no explicit 'Zone climatique' line
+ZONES_CLIMATIQUES = {'1': 'H1a', '2': 'H1b', '3': 'H1c', '4': 'H2a', '5': 'H2b', '6': 'H2c', '7': 'H2d', '8': 'H3'}
+
+def normalize_zone(zone):
+    """Climate zone name ('H1a'...) from a zone name or an enum id ('1'..'8'); other values are kept."""
+    if zone is None:
+        return None
+    zone = str(zone).strip()
+    return ZONES_CLIMATIQUES.get(zone, zone)
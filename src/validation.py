@@ -0,0 +1,175 @@
+"""
+Optional validation of DPE XML files against the ADEME XSD schema (requires lxml).
+
+parse_dpe_file reads any XML and leaves missing fields empty; validation
+reports what does not follow the schema instead (typically DPEs older than
+the current format), as a list of problems rather than an exception:
+
+    problems = validate_dpe_file('dpe.xml')
+    # [{'ligne': 12, 'chemin': '/dpe/logement/meteo', 'message': "Element 'meteo': ..."}]
+
+The schema files are not part of the repository: fetch_xsd.py downloads
+them (fetch_schema), and the main file is read from DPE_XSD (default:
+schemas/dpe.xsd, the files it includes next to it).
+It is compiled once per process, on first use, and reused for every file;
+src.bulk compiles it before starting its process pool, so that the workers
+inherit it instead of compiling it again.
+"""
+import argparse
+import io
+import os
+import pathlib
+import sys
+import threading
+import urllib.parse
+import urllib.request
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+
+from src.archives import open_xml_source
+from src.parser import FEED_CHUNK_SIZE, MAX_XML_BYTES, parse_tree
+from src.utils import format_size
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_PATH = os.environ.get('DPE_XSD', os.path.join(ROOT, 'schemas', 'dpe.xsd'))
+
+# Problems listed per file; the rest are only counted
+MAX_PROBLEMS = 100
+
+# A compiled schema keeps the error log of its last validation: one validation at a time per process
+_lock = threading.Lock()
+
+
+def _etree():
+    try:
+        from lxml import etree
+    except ImportError:
+        raise RuntimeError("La validation XSD nécessite lxml (pip install lxml).")
+    return etree
+
+
+@lru_cache(maxsize=None)
+def load_schema(path=SCHEMA_PATH):
+    """The compiled XMLSchema of `path`; raises RuntimeError when lxml or the schema is missing or invalid."""
+    etree = _etree()
+    if not os.path.isfile(path):
+        raise RuntimeError(f"Schéma XSD introuvable: {path} (à télécharger avec fetch_xsd.py, chemin réglable avec DPE_XSD)")
+    try:
+        return etree.XMLSchema(etree.parse(path, etree.XMLParser(no_network=True)))
+    except (etree.XMLSyntaxError, etree.XMLSchemaParseError) as e:
+        raise RuntimeError(f"Schéma XSD invalide ({path}): {e}")
+
+
+def _problem(line, path, message):
+    return {'ligne': line, 'chemin': path, 'message': message}
+
+
+def _parse(source, etree, max_bytes):
+    """lxml tree of a path or binary file object, read in chunks; entities, DTDs and the network stay off."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return _parse(f, etree, max_bytes)
+
+    parser = etree.XMLParser(resolve_entities=False, load_dtd=False, no_network=True, collect_ids=False)
+    total = 0
+    while True:
+        chunk = source.read(FEED_CHUNK_SIZE)
+        if not chunk:
+            break
+        total += len(chunk)
+        if max_bytes and total > max_bytes:
+            raise ValueError(f"Fichier XML trop volumineux (limite: {format_size(max_bytes)})")
+        parser.feed(chunk)
+    return parser.close().getroottree()
+
+
+def validate_dpe_file(uploaded_file, schema_path=SCHEMA_PATH, max_problems=MAX_PROBLEMS, max_bytes=MAX_XML_BYTES):
+    """
+    Validates a DPE XML file (path or binary file object, .xml.gz included)
+    against the XSD schema. Returns the list of problems, empty when the file
+    is valid: {'ligne', 'chemin', 'message'} dicts, the last one counting the
+    problems left out beyond `max_problems`. Raises RuntimeError only when
+    the schema itself cannot be loaded.
+    """
+    schema = load_schema(schema_path)
+    etree = _etree()
+
+    source = open_xml_source(uploaded_file)
+    try:
+        tree = _parse(source, etree, max_bytes)
+    except etree.XMLSyntaxError as e:
+        return [_problem(e.lineno, None, f"XML mal formé: {e.msg}")]
+    except ValueError as e:
+        return [_problem(None, None, str(e))]
+    finally:
+        if source is not uploaded_file:
+            source.close()  # Decompression wrapper only
+    if tree.docinfo.doctype:
+        return [_problem(1, None, "DOCTYPE non autorisé")]
+
+    with _lock:
+        if schema.validate(tree):
+            return []
+        errors = list(schema.error_log)
+
+    problems = [_problem(e.line, e.path, e.message) for e in errors[:max_problems]]
+    if len(errors) > max_problems:
+        problems.append(_problem(None, None, f"... et {len(errors) - max_problems} autres problèmes"))
+    return problems
+
+
+def _schema_locations(content):
+    """Relative schemaLocation of the xs:include / xs:import / xs:redefine elements of a schema."""
+    for elem in parse_tree(io.BytesIO(content)).iter():
+        location = elem.get('schemaLocation')
+        if elem.tag in ('include', 'import', 'redefine') and location and not urllib.parse.urlsplit(location).scheme:
+            yield location
+
+
+def fetch_schema(url, dest=SCHEMA_PATH, timeout=60):
+    """
+    Downloads the XSD at `url` (or a local path) to `dest`, with the files it
+    includes or imports by relative path, recursively, at the same relative
+    paths next to it. Returns the paths written.
+    """
+    if '://' not in url:
+        url = pathlib.Path(url).resolve().as_uri()
+    dest = os.path.abspath(dest)
+    folder = os.path.dirname(dest)
+    pending = [(url, dest)]
+    seen = {url}
+    written = []
+    while pending:
+        url, path = pending.pop()
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            content = response.read()
+        for location in _schema_locations(content):
+            target = os.path.normpath(os.path.join(os.path.dirname(path), location))
+            if os.path.commonpath([folder, target]) != folder:
+                raise RuntimeError(f"Fichier inclus hors du dossier du schéma: {location}")
+            child = urllib.parse.urljoin(url, location)
+            if child not in seen:
+                seen.add(child)
+                pending.append((child, target))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        written.append(path)
+    load_schema.cache_clear()
+    return written
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Téléchargement du schéma XSD des DPE (modèle de données de l'Ademe).")
+    ap.add_argument('url', help="URL (ou chemin local) du fichier XSD principal du modèle de données DPE")
+    ap.add_argument('-o', '--output', default=SCHEMA_PATH, help=f"Fichier XSD principal à écrire (défaut: {SCHEMA_PATH})")
+    args = ap.parse_args(argv)
+
+    try:
+        written = fetch_schema(args.url, args.output)
+        load_schema(os.path.abspath(args.output))
+    except (OSError, ValueError, ET.ParseError, RuntimeError) as e:
+        print(f"Échec: {e}", file=sys.stderr)
+        return 1
+    print(f"Schéma installé: {args.output} ({len(written)} fichiers)", file=sys.stderr)
+    return 0
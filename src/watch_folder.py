@@ -0,0 +1,266 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from src.parser import PARSER_VERSION, parse_dpe_file
+
+WATCHED_SUFFIXES = ('.xml', '.xml.gz')
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS watched_file (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER,
+    size INTEGER,
+    sha256 TEXT,
+    parser_version TEXT,
+    data TEXT
+);
+"""
+
+
+def is_watched(path):
+    return path.lower().endswith(WATCHED_SUFFIXES) and not os.path.basename(path).startswith('.')
+
+
+def default_index_path(folder):
+    """
+    Index location outside the watched folder (which may be read-only or
+    shared): $DPE_WATCH_INDEX, else one file per folder in the user cache
+    directory ($XDG_CACHE_HOME or ~/.cache).
+    """
+    if os.environ.get('DPE_WATCH_INDEX'):
+        return os.environ['DPE_WATCH_INDEX']
+    cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'lecteur-dpe')
+    os.makedirs(cache_dir, exist_ok=True)
+    folder_id = hashlib.sha256(os.path.abspath(folder).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"watch-{folder_id}.sqlite")
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """SHA-256 hex digest of a file, read in chunks."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def parse_watched_file(path):
+    """Default parse function: the file is streamed, with the element and depth limits of uploads."""
+    return parse_dpe_file(path, streaming=True)
+
+
+class WatchIndex:
+    """
+    SQLite index of the files already parsed: mtime, size and content hash,
+    plus the parse result. Unchanged files are recognised from (mtime, size)
+    alone, so a restart only costs one stat() per file.
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(INDEX_SCHEMA)
+        self.lock = threading.Lock()
+
+    def signatures(self):
+        """{path: (mtime_ns, size, sha256)} for every file parsed by the current parser version."""
+        with self.lock:
+            rows = self.conn.execute('SELECT path, mtime_ns, size, sha256 FROM watched_file WHERE parser_version = ?',
+                                     (PARSER_VERSION,))
+            return {path: (mtime, size, digest) for path, mtime, size, digest in rows}
+
+    def put(self, path, mtime_ns, size, digest, data):
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO watched_file (path, mtime_ns, size, sha256, parser_version, data) VALUES (?, ?, ?, ?, ?, ?)',
+                (path, mtime_ns, size, digest, PARSER_VERSION, json.dumps(data, ensure_ascii=False, default=str)),
+            )
+
+    def digest(self, path):
+        """Content hash recorded for `path` by the current parser version, or None."""
+        with self.lock:
+            row = self.conn.execute('SELECT sha256 FROM watched_file WHERE path = ? AND parser_version = ?',
+                                    (path, PARSER_VERSION)).fetchone()
+        return row[0] if row else None
+
+    def paths(self):
+        with self.lock:
+            return [row[0] for row in self.conn.execute('SELECT path FROM watched_file')]
+
+    def touch(self, path, mtime_ns, size):
+        with self.lock, self.conn:
+            self.conn.execute('UPDATE watched_file SET mtime_ns = ?, size = ? WHERE path = ?', (mtime_ns, size, path))
+
+    def remove(self, path):
+        with self.lock, self.conn:
+            self.conn.execute('DELETE FROM watched_file WHERE path = ?', (path,))
+
+    def recent(self, limit):
+        """Last `limit` results as (path, data), most recently indexed last."""
+        with self.lock:
+            rows = self.conn.execute('SELECT path, data FROM watched_file ORDER BY rowid DESC LIMIT ?', (limit,)).fetchall()
+        return [(path, json.loads(data)) for path, data in reversed(rows)]
+
+
+class _Handler(FileSystemEventHandler):
+    def __init__(self, watcher):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.touch(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.touch(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.forget(event.src_path)
+            self.watcher.touch(event.dest_path)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.watcher.forget(event.src_path)
+
+
+class FolderWatcher:
+    """
+    Watches a folder (recursively) and parses new or changed DPE XML files.
+
+    Events are debounced: a file is only read once it has not changed for
+    `debounce` seconds. A file whose mtime changed but whose content hash did
+    not is not parsed again. Each result is passed to `on_result(path, data)`
+    (data is None when the file was deleted) from the watcher thread, and
+    kept in `events`, a bounded list of (sequence number, path, data) that
+    pages can poll.
+
+    Files are parsed by `parse(path)` (the web UI hands them to its parse
+    pool); the index lives outside the folder (see default_index_path).
+    """
+
+    def __init__(self, folder, index_path=None, debounce=1.0, on_result=None, history=500, parse=parse_watched_file):
+        self.folder = os.path.abspath(folder)
+        self.index = WatchIndex(index_path or default_index_path(self.folder))
+        self.parse = parse
+        self.debounce = debounce
+        self.on_result = on_result
+        self.events = deque(maxlen=history)
+        self.seq = 0
+        self._pending = {}  # path -> time of the last event
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._observer = None
+        self._thread = None
+
+    # --- Events ---
+
+    def touch(self, path):
+        if is_watched(path):
+            with self._lock:
+                self._pending[path] = time.monotonic()
+
+    def forget(self, path):
+        if is_watched(path):
+            with self._lock:
+                self._pending.pop(path, None)
+            self.index.remove(path)
+            self._publish(path, None)
+
+    def _publish(self, path, data):
+        with self._lock:
+            self.seq += 1
+            self.events.append((self.seq, path, data))
+        if self.on_result:
+            self.on_result(path, data)
+
+    def since(self, seq):
+        """Events newer than `seq`, as a list of (seq, path, data)."""
+        with self._lock:
+            return [event for event in self.events if event[0] > seq]
+
+    # --- Processing ---
+
+    def initial_scan(self):
+        """
+        Queues the files that are new or changed since the last run (stat only)
+        and drops the ones deleted meanwhile.
+        """
+        known = self.index.signatures()
+        seen = set()
+        for dirpath, _, filenames in os.walk(self.folder):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if not is_watched(path):
+                    continue
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                seen.add(path)
+                sig = known.get(path)
+                if sig is None or sig[0] != st.st_mtime_ns or sig[1] != st.st_size:
+                    self.touch(path)
+        for path in self.index.paths():
+            if path not in seen:
+                self.index.remove(path)
+
+    def process(self, path):
+        try:
+            st = os.stat(path)
+            digest = file_digest(path)
+        except OSError:
+            return  # Deleted or moved meanwhile
+
+        if self.index.digest(path) == digest:
+            # Touched but identical content: no need to parse again
+            self.index.touch(path, st.st_mtime_ns, st.st_size)
+            return
+
+        data = self.parse(path)
+        self.index.put(path, st.st_mtime_ns, st.st_size, digest, data)
+        self._publish(path, data)
+
+    def _ready(self):
+        now = time.monotonic()
+        with self._lock:
+            ready = [path for path, t in self._pending.items() if now - t >= self.debounce]
+            for path in ready:
+                del self._pending[path]
+        return ready
+
+    def _run(self):
+        # On this thread: walking a large folder must not hold up the caller (the web app's startup)
+        self.initial_scan()
+        while not self._stop.is_set():
+            for path in self._ready():
+                try:
+                    self.process(path)
+                except Exception as e:
+                    self._publish(path, {'error': f"Erreur: {str(e)}"})
+            self._stop.wait(min(self.debounce, 0.5))
+
+    # --- Lifecycle ---
+
+    def start(self):
+        self._observer = Observer()
+        self._observer.schedule(_Handler(self), self.folder, recursive=True)
+        self._observer.start()
+        self._thread = threading.Thread(target=self._run, name='dpe-watch', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        if self._thread is not None:
+            self._thread.join()
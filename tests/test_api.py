@@ -0,0 +1,122 @@
+import asyncio
+import functools
+import io
+import json
+import zipfile
+
+import pytest
+from nicegui import app
+from starlette.testclient import TestClient
+
+from benchmarks.synthetic_dpe import generate_dpe_xml
+from src import api
+from src.api import iter_documents
+from src.uploads import receive_upload
+
+XML = b'<dpe><numero_dpe>2508E0729579F</numero_dpe><administratif/><logement/></dpe>'
+
+
+async def _upload(name, content):
+    async def chunks():
+        yield content
+    return await receive_upload(chunks(), name)
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        for name, content in members:
+            zf.writestr(name, content)
+    return buffer.getvalue()
+
+
+def test_an_unreadable_member_is_reported_and_the_archive_goes_on():
+    async def documents():
+        files = [await _upload('envoi.zip', _zip([('a.xml', XML), ('b.xml.gz', b'pas du gzip'), ('c.xml', XML)])),
+                 await _upload('seul.xml', XML)]
+        return [entry for window in [w async for w in iter_documents(files)] for entry in window]
+
+    entries = asyncio.run(documents())
+    assert [name for name, _ in entries] == ['envoi.zip/a.xml', 'envoi.zip/b.xml.gz', 'envoi.zip/c.xml', 'seul.xml']
+    assert entries[0][1] == entries[2][1] == XML and 'error' in entries[1][1]
+
+
+@pytest.fixture(scope='module')
+def client():
+    return TestClient(app)
+
+
+DPE = generate_dpe_xml(seed=1)
+
+
+def test_parse_a_raw_body(client):
+    response = client.post('/api/parse?nom=a.xml', content=DPE)
+    assert response.status_code == 200 and response.headers['content-type'] == api.JSON_TYPE
+    assert response.json()['dpe_id'] and 'validation' not in response.json()
+
+
+def test_parse_a_multipart_file(client):
+    response = client.post('/api/parse', files={'fichier': ('a.xml', DPE)})
+    assert response.status_code == 200 and response.json()['classe_energie']
+
+
+@pytest.mark.parametrize('kwargs, status', [
+    ({'content': b'<dpe'}, 422),
+    ({'content': b''}, 400),
+    ({'files': [('a', ('a.xml', DPE)), ('b', ('b.xml', DPE))]}, 400),
+])
+def test_parse_errors(client, kwargs, status):
+    response = client.post('/api/parse', **kwargs)
+    assert response.status_code == status and 'error' in response.json()
+
+
+def test_files_over_the_upload_limit_get_a_413(client, monkeypatch):
+    monkeypatch.setattr(api, 'receive_upload', functools.partial(receive_upload, max_bytes=len(DPE) - 1))
+    response = client.post('/api/parse', content=DPE)
+    assert response.status_code == 413 and 'trop volumineux' in response.json()['error']
+
+
+def test_validation_is_opt_in(client, monkeypatch):
+    monkeypatch.setattr(api, 'validate_dpe_file', lambda source: [{'ligne': 1, 'chemin': None, 'message': 'Manque'}])
+    response = client.post('/api/parse?valider=1', content=DPE)
+    assert response.status_code == 200 and response.json()['validation'][0]['message'] == 'Manque'
+
+    def missing_schema(source):
+        raise RuntimeError("Schéma XSD introuvable")
+
+    monkeypatch.setattr(api, 'validate_dpe_file', missing_schema)
+    response = client.post('/api/parse?valider=1', content=DPE)
+    assert response.status_code == 501 and response.json() == {'error': "Schéma XSD introuvable"}
+
+
+def test_batch_streams_one_line_per_dpe_in_order(client):
+    archive = _zip([('a.xml', DPE), ('b.xml', b'<dpe')])
+    response = client.post('/api/parse/batch', files=[('f', ('envoi.zip', archive)), ('g', ('c.xml', DPE))])
+    assert response.status_code == 200 and response.headers['content-type'] == api.NDJSON_TYPE
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line['fichier'] for line in lines] == ['envoi.zip/a.xml', 'envoi.zip/b.xml', 'c.xml']
+    assert 'error' not in lines[0] and 'error' in lines[1] and lines[2]['dpe_id'] == lines[0]['dpe_id']
+
+
+def test_batch_without_files(client):
+    assert client.post('/api/parse/batch', files={'a': ('', b'')}).status_code == 400
+
+
+def test_labels_are_cacheable_svg(client):
+    response = client.get('/api/etiquette/energie?valeur=120')
+    assert response.status_code == 200 and response.headers['content-type'] == api.SVG_TYPE
+    assert response.headers['cache-control'] == api.REVALIDATE
+    again = client.get('/api/etiquette/energie?valeur=120', headers={'If-None-Match': response.headers['etag']})
+    assert again.status_code == 304 and not again.content
+
+    versioned = client.get('/api/etiquette/climat/b/12.svg')
+    assert versioned.status_code == 200 and versioned.headers['cache-control'] == api.IMMUTABLE
+
+
+@pytest.mark.parametrize('url, status', [
+    ('/api/etiquette/eau?valeur=120', 404),
+    ('/api/etiquette/eau/C/120.svg', 404),
+    ('/api/etiquette/energie?valeur=nan', 422),
+])
+def test_label_errors(client, url, status):
+    assert client.get(url).status_code == status
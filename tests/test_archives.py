@@ -0,0 +1,70 @@
+import gzip
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from src.archives import is_multi_archive, iter_archive_members
+from src.parser import parse_dpe_file
+
+XML = b'<dpe><numero_dpe>2508E0729579F</numero_dpe><administratif/><logement/></dpe>'
+
+
+def _tar_gz():
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as tf:
+        info = tarfile.TarInfo('dpe.xml')
+        info.size = len(XML)
+        tf.addfile(info, io.BytesIO(XML))
+    return buffer.getvalue()
+
+
+def test_tar_gz_is_detected_by_content():
+    assert is_multi_archive('envoi', _tar_gz())
+
+
+def test_truncated_gzip_heads_are_not_archives():
+    for content in (_tar_gz()[:30], gzip.compress(XML)[:15]):
+        assert not is_multi_archive('envoi', content)
+
+
+def test_corrupt_gzip_is_not_an_archive():
+    assert not is_multi_archive('envoi', gzip.compress(XML)[:10] + b'\xff' * 64)
+
+
+def test_truncated_xml_gz_gives_an_error_dict():
+    data = parse_dpe_file(io.BytesIO(gzip.compress(XML)[:15]))
+    assert 'error' in data
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        for name, content in members:
+            zf.writestr(name, content)
+    return buffer.getvalue()
+
+
+def _tar(members):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as tf:
+        for name, content in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tf.addfile(info, io.BytesIO(content))
+    return buffer.getvalue()
+
+
+MEMBERS = [('a.xml', XML), ('gros.xml', XML * 10), ('b.xml.gz', b'pas du gzip'), ('c.xml', XML)]
+
+
+@pytest.mark.parametrize('build, name', [(_zip, 'envoi.zip'), (_tar, 'envoi.tar.gz')])
+def test_unreadable_members_do_not_stop_the_archive(build, name):
+    members = list(iter_archive_members(io.BytesIO(build(MEMBERS)), name, max_bytes=len(XML) * 2, errors=True))
+    assert [member for member, _ in members] == ['a.xml', 'gros.xml', 'b.xml.gz', 'c.xml']
+    assert members[0][1] == members[3][1] == XML
+    assert 'trop volumineux' in members[1][1]['error'] and 'error' in members[2][1]
+
+    with pytest.raises(ValueError):
+        list(iter_archive_members(io.BytesIO(build(MEMBERS)), name, max_bytes=len(XML) * 2))
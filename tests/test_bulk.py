@@ -0,0 +1,32 @@
+import gzip
+
+from src import bulk
+
+XML = b'<dpe><numero_dpe>2508E0729579F</numero_dpe><administratif/><logement/></dpe>'
+
+
+def test_parse_and_validation_share_one_read(tmp_path, monkeypatch):
+    (tmp_path / 'a.xml').write_bytes(XML)
+    (tmp_path / 'b.xml.gz').write_bytes(gzip.compress(XML))
+    opened = []
+    real_open = open
+
+    def counting_open(path, *args, **kwargs):
+        opened.append(str(path))
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr('builtins.open', counting_open)
+    monkeypatch.setattr(bulk, 'validate_dpe_file', lambda source: [{'ligne': 1, 'chemin': None, 'message': source.read()}])
+    paths = [str(tmp_path / 'a.xml'), str(tmp_path / 'b.xml.gz')]
+
+    results = bulk.parse_validate_batch([(path, path) for path in paths])
+    assert opened == paths
+    assert [(label, data['dpe_id']) for label, data, _ in results] == [(path, '2508E0729579F') for path in paths]
+    # The validation got the file content as read, compressed or not
+    assert [problems[0]['message'] for _, _, problems in results] == [XML, gzip.compress(XML)]
+
+
+def test_unreadable_files_are_reported(tmp_path):
+    path = str(tmp_path / 'absent.xml')
+    [(label, data, problems)] = bulk.parse_validate_batch([(path, path)])
+    assert label == path and 'error' in data and problems == []
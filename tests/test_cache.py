@@ -0,0 +1,83 @@
+import json
+import os
+
+from src.cache import ParseCache
+
+
+def _data(i):
+    return {'dpe_id': f"DPE{i:04d}", 'surface': 50 + i}
+
+
+def _disk_size(folder):
+    return sum(entry.stat().st_size for entry in os.scandir(folder) if entry.name.endswith('.json'))
+
+
+def test_memory_tier_evicts_the_least_recently_used():
+    cache = ParseCache(max_entries=2)
+    cache.put(b'a', _data(1))
+    cache.put(b'b', _data(2))
+    assert cache.get(b'a') == _data(1)  # 'b' is now the least recently used
+    cache.put(b'c', _data(3))
+    assert cache.get(b'b') is None
+    assert cache.get(b'a') == _data(1) and cache.get(b'c') == _data(3)
+    assert cache.stats()['entries'] == 2
+
+
+def test_errors_are_not_cached():
+    cache = ParseCache()
+    cache.put(b'a', {'error': "Erreur XML"})
+    assert cache.get(b'a') is None
+
+
+def test_disk_tier_survives_a_restart_and_counts_its_bytes(tmp_path):
+    cache = ParseCache(max_entries=1, disk_dir=str(tmp_path))
+    for i in range(3):
+        cache.put(bytes([i]), _data(i))
+    assert cache.get(bytes([0])) == _data(0)  # Evicted from memory, read back from disk
+    assert cache.stats()['disk_hits'] == 1
+
+    restarted = ParseCache(max_entries=1, disk_dir=str(tmp_path))
+    assert restarted.stats()['disk_entries'] == 3
+    assert restarted.stats()['disk_bytes'] == cache.stats()['disk_bytes'] == _disk_size(tmp_path)
+    assert restarted.get(bytes([2])) == _data(2)
+
+
+def test_disk_tier_evicts_the_oldest_files_past_its_size(tmp_path):
+    entry_size = len(json.dumps(_data(0), ensure_ascii=False).encode())
+    cache = ParseCache(max_entries=1, disk_dir=str(tmp_path), disk_max_bytes=3 * entry_size)
+    for i in range(3):
+        cache.put(bytes([i]), _data(i))
+    cache.get(bytes([0]))  # Read back: no longer the oldest
+    cache.put(bytes([3]), _data(3))
+
+    assert cache.stats()['disk_entries'] == 3
+    assert cache.stats()['disk_bytes'] == _disk_size(tmp_path) <= 3 * entry_size
+    fresh = ParseCache(max_entries=1, disk_dir=str(tmp_path))
+    assert fresh.get(bytes([1])) is None
+    assert [fresh.get(bytes([i])) for i in (0, 2, 3)] == [_data(0), _data(2), _data(3)]
+
+
+def test_rewriting_an_entry_does_not_count_it_twice(tmp_path):
+    cache = ParseCache(disk_dir=str(tmp_path))
+    cache.put(b'a', _data(1))
+    cache.put(b'a', _data(1))
+    assert cache.stats()['disk_entries'] == 1 and cache.stats()['disk_bytes'] == _disk_size(tmp_path)
+
+
+def test_a_new_parser_version_invalidates_entries(tmp_path):
+    old = ParseCache(disk_dir=str(tmp_path), version='1')
+    old.put(b'a', _data(1))
+    new = ParseCache(disk_dir=str(tmp_path), version='2')
+    assert new.get(b'a') is None
+    assert new.key(b'a') != old.key(b'a')
+
+
+def test_entries_of_older_versions_are_evicted_first(tmp_path):
+    entry_size = len(json.dumps(_data(0), ensure_ascii=False).encode())
+    old = ParseCache(disk_dir=str(tmp_path), version='1')
+    old.put(b'a', _data(1))
+    new = ParseCache(disk_dir=str(tmp_path), version='2', disk_max_bytes=2 * entry_size)
+    new.put(b'b', _data(2))
+    new.put(b'c', _data(3))
+    assert new.stats()['disk_entries'] == 2
+    assert not os.path.exists(old._disk_path(old.key(b'a')))
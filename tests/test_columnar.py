@@ -0,0 +1,62 @@
+import io
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+import pyarrow.parquet as pq
+
+from benchmarks.synthetic_dpe import generate_dpe_xml
+from src.columnar import CATEGORY_COLUMNS, FLOAT_COLUMNS, TEXT_COLUMNS, ColumnarWriter
+from src.parser import parse_dpe_file
+
+DPES = [(f"dpe{seed}.xml", parse_dpe_file(io.BytesIO(generate_dpe_xml(seed=seed, packs=seed % 3))))
+        for seed in range(7)]
+
+
+def _read(path, format):
+    if format == 'parquet':
+        return pq.read_table(path).to_pylist()
+    with pa.ipc.open_file(path) as reader:
+        return reader.read_all().to_pylist()
+
+
+def _write(tmp_path, format, dpes=DPES):
+    path = str(tmp_path / 'portefeuille')
+    with ColumnarWriter(path, format=format, row_group_size=3) as writer:
+        for fichier, data in dpes:
+            writer.write(fichier, data)
+    return writer.paths
+
+
+@pytest.mark.parametrize('format', ['parquet', 'arrow'])
+def test_tables_round_trip(tmp_path, format):
+    paths = _write(tmp_path, format)
+    rows = _read(paths[''], format)
+    assert [row['dpe_index'] for row in rows] == list(range(len(DPES)))
+    for row, (fichier, data) in zip(rows, DPES):
+        assert row['fichier'] == fichier
+        for name in TEXT_COLUMNS[1:] + FLOAT_COLUMNS + CATEGORY_COLUMNS + ('has_enr',):
+            assert row[name] == data.get(name), name
+        assert row['annee_construction'] == int(data['annee_construction'])
+
+    packs = [(row['dpe_index'], row['num'], row['cout_min'], row['classe_energie_apres']) for row in _read(paths['packs'], format)]
+    assert packs == [(i, int(pack['num']), pack['cout_min'], pack['classe_energie_apres'])
+                     for i, (_, data) in enumerate(DPES) for pack in data['packs_travaux']]
+    travaux = [(row['dpe_index'], row['num'], row['titre']) for row in _read(paths['travaux'], format)]
+    assert travaux == [(i, int(pack['num']), t['titre'])
+                       for i, (_, data) in enumerate(DPES) for pack in data['packs_travaux'] for t in pack['travaux']]
+    deperditions = [(row['dpe_index'], row['poste'], row['part']) for row in _read(paths['deperditions'], format)]
+    assert deperditions == [(i, poste, part) for i, (_, data) in enumerate(DPES) for poste, part in data['deperditions'].items()]
+
+
+def test_row_groups_and_shared_dictionaries(tmp_path):
+    paths = _write(tmp_path, 'parquet')
+    assert pq.ParquetFile(paths['']).num_row_groups == 3
+    assert pa.types.is_dictionary(pq.read_schema(paths['']).field('classe_energie').type)
+
+
+def test_an_empty_export_still_writes_every_table(tmp_path):
+    paths = _write(tmp_path, 'arrow', dpes=[])
+    assert sorted(paths) == ['', 'deperditions', 'packs', 'travaux']
+    assert all(_read(path, 'arrow') == [] for path in paths.values())
+    assert paths['packs'].endswith('portefeuille.packs.arrow')
@@ -0,0 +1,98 @@
+import io
+import tracemalloc
+
+import pytest
+
+from benchmarks.synthetic_dpe import generate_dpe_xml
+from src.parser import (FICHE_TECHNIQUE_RULES, PACK_TRAVAUX_PATH, SOUS_FICHE_PATH, XmlLimitError,
+                        _compile_fiche_rules, iterparse_pruned, match_fiche_rules, parse_dpe_file, parse_tree)
+
+ECS_FICHE = b'''<dpe><logement><caracteristique_generale/>
+<installation_ecs_collection><installation_ecs><donnee_entree><description>Ballon</description></donnee_entree>
+</installation_ecs></installation_ecs_collection></logement>
+<fiche_technique_collection><fiche_technique><sous_fiche_technique_collection>
+<sous_fiche_technique><description>Type production ECS / Type de ventilation</description><valeur>VMC</valeur></sous_fiche_technique>
+</sous_fiche_technique_collection></fiche_technique></fiche_technique_collection></dpe>'''
+
+
+def test_rules_sharing_a_prefix_are_all_matched():
+    rules = [
+        (('Type de',), 'type', True),
+        (('Type de mur',), 'mur', True),
+        (('mur',), 'materiaux', False),
+    ]
+    match = _compile_fiche_rules(rules)
+    assert match("Type de mur : béton") == (0, 1, 2)
+    assert match("Type de toit") == (0,)
+    assert match("Rien à signaler") == ()
+
+
+def test_match_fiche_rules_uses_the_rule_table():
+    keys = [FICHE_TECHNIQUE_RULES[i][1] for i in match_fiche_rules("Type de vitrage : double vitrage")]
+    assert 'vitrage_type' in keys
+    assert match_fiche_rules("Aucune règle ici") == ()
+
+
+def _peak(func, *args, **kwargs):
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _count_records(content):
+    counts = {PACK_TRAVAUX_PATH: 0, SOUS_FICHE_PATH: 0}
+
+    def counter(path):
+        def count(elem):
+            counts[path] += 1
+        return count
+
+    iterparse_pruned(io.BytesIO(content), records={path: counter(path) for path in counts})
+    return counts
+
+
+def test_streaming_matches_tree_mode():
+    for kwargs in (dict(), dict(installations=8, packs=30, travaux=6, fiches=500, murs=100), dict(packs=0, fiches=0)):
+        content = generate_dpe_xml(**kwargs)
+        assert parse_dpe_file(io.BytesIO(content), streaming=True) == parse_dpe_file(io.BytesIO(content))
+
+
+def test_streamed_fiches_see_ecs_from_installations():
+    streamed = parse_dpe_file(io.BytesIO(ECS_FICHE), streaming=True)
+    assert streamed == parse_dpe_file(io.BytesIO(ECS_FICHE))
+    assert (streamed['ecs_type'], streamed['ventilation_type']) == ('Ballon', 'VMC')
+
+
+def test_streaming_memory_stays_flat_as_records_grow():
+    small = generate_dpe_xml(packs=20, fiches=1000, murs=100)
+    large = generate_dpe_xml(packs=200, fiches=10000, murs=1000)
+    assert _count_records(large) == {PACK_TRAVAUX_PATH: 200, SOUS_FICHE_PATH: 10000}
+    # Ten times the records (and bytes), about the same peak
+    assert _peak(_count_records, large) < 1.5 * _peak(_count_records, small)
+    assert _peak(_count_records, large) < len(large) / 4
+
+    small, large = generate_dpe_xml(fiches=1000), generate_dpe_xml(fiches=10000)
+    peak_small = _peak(parse_dpe_file, io.BytesIO(small), streaming=True)
+    assert _peak(parse_dpe_file, io.BytesIO(large), streaming=True) < 1.5 * peak_small
+
+
+def test_both_modes_refuse_doctypes():
+    for content in (b'<?xml version="1.0"?><!DOCTYPE dpe [<!ENTITY a "aaaa">]><dpe>&a;</dpe>',
+                    '<?xml version="1.0" encoding="utf-16"?><!DOCTYPE dpe><dpe/>'.encode('utf-16')):
+        for streaming in (False, True):
+            assert 'DOCTYPE' in parse_dpe_file(io.BytesIO(content), streaming=streaming)['error']
+
+
+def test_both_modes_enforce_the_element_and_depth_limits():
+    deep = b'<dpe>' + b'<a>' * 100 + b'</a>' * 100 + b'</dpe>'
+    for streaming in (False, True):
+        assert 'profonde' in parse_dpe_file(io.BytesIO(deep), streaming=streaming)['error']
+
+    wide = b'<dpe>' + b'<a/>' * 2000 + b'</dpe>'
+    for parse in (parse_tree, iterparse_pruned):
+        with pytest.raises(XmlLimitError):
+            parse(io.BytesIO(wide), max_elements=1000)
+        assert parse(io.BytesIO(wide), max_elements=2001) is not None
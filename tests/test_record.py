@@ -0,0 +1,49 @@
+import io
+import pickle
+
+import pytest
+
+from benchmarks.synthetic_dpe import generate_dpe_xml
+from src.parser import parse_dpe_file
+from src.record import MISSING, DpeRecord, parse_dpe_record
+
+
+def _parsed(seed, **kwargs):
+    return parse_dpe_file(io.BytesIO(generate_dpe_xml(seed=seed, **kwargs)))
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_to_dict_gives_back_the_parser_dict(seed):
+    data = _parsed(seed, packs=seed % 4, fiches=seed * 5)
+    record = DpeRecord.from_dict(data)
+    assert record.to_dict() == data
+    # Same key order too, at every level
+    assert list(record.to_dict()) == list(data)
+    for pack, original in zip(record.to_dict()['packs_travaux'], data['packs_travaux']):
+        assert list(pack) == list(original)
+
+
+def test_keys_the_parser_did_not_set_stay_absent():
+    data = {'surface': 42.0, 'classe_energie': 'E', 'packs_travaux': [{'num': '1', 'travaux': [{'titre': 'Isolation'}]}],
+            'recommendations': [], 'debug_raw': {}}
+    record = DpeRecord.from_dict(data)
+    assert record.ecs_type is MISSING and not record.ecs_type
+    assert record.to_dict() == {**data, 'conso_kwh': None, 'conso_ges': None, 'chauffage_type': None,
+                                'classe_climat': None, 'adresse': None, 'dpe_id': None, 'date': None}
+
+
+def test_records_pickle_and_intern_their_enumerated_values():
+    record = DpeRecord.from_dict(_parsed(1))
+    assert pickle.loads(pickle.dumps(record)) == record
+    other = DpeRecord.from_dict(_parsed(1))
+    assert other.classe_energie is record.classe_energie and other.ecs_type is record.ecs_type
+
+
+def test_unknown_keys_are_refused():
+    with pytest.raises(ValueError, match='inconnue'):
+        DpeRecord.from_dict({'surface': 42.0, 'surface_habitable': 42.0})
+
+
+def test_parse_dpe_record_raises_on_parser_errors():
+    with pytest.raises(ValueError):
+        parse_dpe_record(io.BytesIO(b'<dpe>'))
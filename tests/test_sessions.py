@@ -0,0 +1,74 @@
+import pytest
+
+from src import sessions
+from src.sessions import Session, SessionStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic for the sessions module."""
+    now = [1000.0]
+    monkeypatch.setattr(sessions.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_a_session_is_found_again_until_it_expires(clock):
+    store = SessionStore(ttl=60)
+    session = store.get('a')
+    clock[0] += 60
+    assert store.get('a') is session  # Accessed: the ttl starts over
+    clock[0] += 61
+    assert store.get('a') is not session
+
+
+def test_touch_keeps_a_session_alive(clock):
+    store = SessionStore(ttl=60)
+    session = store.get('a')
+    clock[0] += 50
+    store.touch(session)
+    clock[0] += 50
+    assert store.get('a') is session
+
+
+def test_expired_sessions_are_dropped_on_the_next_access(clock):
+    store = SessionStore(ttl=60)
+    store.get('a')
+    clock[0] += 30
+    store.get('b')
+    clock[0] += 31
+    store.get('c')
+    assert len(store) == 2
+    clock[0] += 61
+    store.get(None)
+    assert len(store) == 0
+
+
+def test_least_recently_used_sessions_are_dropped_past_max_sessions(clock):
+    store = SessionStore(max_sessions=2)
+    a = store.get('a')
+    b = store.get('b')
+    store.touch(a)  # 'b' is now the least recently used
+    c = store.get('c')
+    assert len(store) == 2
+    assert store.get('a') is a and store.get('c') is c
+    assert store.get('b') is not b
+
+
+def test_anonymous_sessions_are_not_stored():
+    store = SessionStore()
+    assert store.get(None) is not store.get(None)
+    assert len(store) == 0
+
+
+def test_results_are_capped_and_dropped_from_the_history():
+    session = Session(max_results=2, history_size=3)
+    ids = [session.add(f"{i}.xml", object())[0] for i in range(2)]
+    session.view(ids[0])
+    session.view(ids[1])
+    session.view(ids[0])
+    assert session.current == ids[0]
+
+    row_id, evicted = session.add('2.xml', object())
+    assert evicted == [ids[0]] and session.get(ids[0]) is None
+    assert list(session.history) == [ids[1]] and session.current == ids[1]
+    assert len(session) == 2 and session.get(row_id)[0] == '2.xml'
@@ -0,0 +1,154 @@
+import io
+import statistics
+from collections import Counter, defaultdict
+
+import pytest
+
+from benchmarks.synthetic_dpe import generate_dpe_xml
+from src.parser import parse_dpe_file
+from src.record import DpeRecord
+from src.stats import POSTES, UNKNOWN, Portfolio
+from src.store import DpeStore
+from src.thresholds import CLASSES
+from src.utils import normalize_zone
+
+
+def _portfolio_data():
+    """Synthetic DPEs, with the gaps real portfolios have: missing values, zone ids, packs without savings."""
+    records = []
+    for seed in range(80):
+        data = parse_dpe_file(io.BytesIO(generate_dpe_xml(seed=seed, packs=seed % 4)))
+        if seed % 7 == 0:
+            data['conso_kwh'] = None
+        if seed % 5 == 0:
+            data['zone_climatique'] = str(seed % 8 + 1)  # Enum id, same zone as its name
+        if seed % 9 == 0:
+            data['periode_construction'] = None
+        if seed % 11 == 0:
+            data['deperditions'] = {'mur': 40}
+        if seed % 6 == 0 and data['packs_travaux']:
+            data['packs_travaux'][0]['conso_apres'] = (data['conso_kwh'] or 0) + 10
+        if seed % 13 == 0 and data['packs_travaux']:
+            data['packs_travaux'][-1]['cout_max'] = None
+        records.append(data)
+    return records
+
+
+DATA = _portfolio_data()
+
+
+def _label(data, field):
+    value = data.get(field)
+    if value in (None, ''):
+        return UNKNOWN
+    return normalize_zone(value) if field == 'zone_climatique' else str(value)
+
+
+def _round(values, function):
+    return round(function(values), 1) if values else None
+
+
+def reference_medians(records, *fields):
+    groups = defaultdict(list)
+    for data in records:
+        if data.get('conso_kwh') is not None:
+            groups[tuple(_label(data, field) for field in fields)].append(data['conso_kwh'])
+    return [{**dict(zip(fields, key)), 'nombre': len(values), 'conso_mediane': _round(values, statistics.median)}
+            for key, values in sorted(groups.items())]
+
+
+def reference_deperditions(records):
+    shares = defaultdict(list)
+    for data in records:
+        for poste, part in (data.get('deperditions') or {}).items():
+            shares[poste].append(part)
+    return {poste: _round(shares[poste], statistics.mean) for poste in POSTES}
+
+
+def reference_pack_costs(records):
+    ratios = defaultdict(lambda: {'min': [], 'max': []})
+    for data in records:
+        for pack in data['packs_travaux']:
+            if data.get('conso_kwh') is None or pack.get('conso_apres') is None:
+                continue
+            saved = data['conso_kwh'] - pack['conso_apres']
+            if saved <= 0:
+                continue
+            ratio = ratios[int(pack['num'])]
+            for bound in ('min', 'max'):
+                if pack.get(f'cout_{bound}') is not None:
+                    ratio[bound].append(pack[f'cout_{bound}'] / saved)
+    return [{'pack': str(num), 'nombre': len(ratio['max']),
+             'moyenne_min': _round(ratio['min'], statistics.mean), 'mediane_min': _round(ratio['min'], statistics.median),
+             'moyenne_max': _round(ratio['max'], statistics.mean), 'mediane_max': _round(ratio['max'], statistics.median)}
+            for num, ratio in sorted(ratios.items())]
+
+
+def _close(actual, expected):
+    """Equality, up to the last rounded decimal (sums are not added in the same order)."""
+    if isinstance(expected, dict):
+        return actual.keys() == expected.keys() and all(_close(actual[k], expected[k]) for k in expected)
+    if isinstance(expected, list):
+        return len(actual) == len(expected) and all(map(_close, actual, expected))
+    if isinstance(expected, float):
+        return actual == pytest.approx(expected, abs=0.11)
+    return actual == expected
+
+
+def _from_store(tmp_path):
+    with DpeStore(tmp_path / 'dpe.sqlite') as db:
+        db.add_many((f"{i}.xml", {**data, 'dpe_id': f"DPE{i}"}) for i, data in enumerate(DATA))
+        return Portfolio.from_store(db)
+
+
+def _from_parquet(tmp_path):
+    pytest.importorskip('pyarrow')
+    from src.columnar import ColumnarWriter
+
+    path = str(tmp_path / 'portefeuille.parquet')
+    with ColumnarWriter(path, row_group_size=30) as writer:
+        for i, data in enumerate(DATA):
+            writer.write(f"{i}.xml", data)
+    return Portfolio.from_parquet(path)
+
+
+@pytest.fixture(params=['dicts', 'records', 'store', 'parquet'])
+def portfolio(request, tmp_path):
+    if request.param == 'dicts':
+        return Portfolio.from_records(DATA + [{'error': "Erreur XML"}])
+    if request.param == 'records':
+        return Portfolio.from_records(DpeRecord.from_dict(data) for data in DATA)
+    if request.param == 'store':
+        return _from_store(tmp_path)
+    return _from_parquet(tmp_path)
+
+
+def test_class_distribution(portfolio):
+    assert len(portfolio) == len(DATA)
+    for kind in ('energie', 'climat'):
+        counts = Counter(data[f'classe_{kind}'] for data in DATA)
+        assert portfolio.class_distribution(kind) == {c: counts[c] for c in CLASSES}
+
+
+@pytest.mark.parametrize('fields', [('periode_construction',), ('zone_climatique',),
+                                    ('periode_construction', 'zone_climatique')])
+def test_median_conso_by(portfolio, fields):
+    assert _close(portfolio.median_conso_by(*fields), reference_medians(DATA, *fields))
+
+
+def test_mean_deperditions(portfolio):
+    assert _close(portfolio.mean_deperditions(), reference_deperditions(DATA))
+
+
+def test_pack_cost_per_kwh(portfolio):
+    expected = reference_pack_costs(DATA)
+    assert len(expected) > 1
+    assert _close(portfolio.pack_cost_per_kwh(), expected)
+
+
+def test_an_empty_portfolio():
+    portfolio = Portfolio.from_records([])
+    assert len(portfolio) == 0
+    assert portfolio.class_distribution() == dict.fromkeys(CLASSES, 0)
+    assert portfolio.median_conso_by() == [] and portfolio.pack_cost_per_kwh() == []
+    assert portfolio.mean_deperditions() == dict.fromkeys(POSTES)
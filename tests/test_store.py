@@ -0,0 +1,105 @@
+import sqlite3
+
+import pytest
+
+from src import store
+from src.store import SCHEMA, SCHEMA_VERSION, DpeStore, _year
+
+
+def _old_database(path):
+    """A database as written before zone names, with a zone id and no user_version."""
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(SCHEMA)
+    conn.execute("INSERT INTO dpe (dpe_id, zone_climatique, data) VALUES ('A', '3', '{}')")
+    conn.commit()
+    conn.close()
+
+
+def _read_only(monkeypatch):
+    connect = sqlite3.connect
+    monkeypatch.setattr(store.sqlite3, 'connect', lambda path: connect(f'file:{path}?mode=ro', uri=True))
+
+
+def test_zone_ids_are_migrated_once(tmp_path):
+    path = tmp_path / 'dpe.sqlite'
+    _old_database(path)
+    with DpeStore(path) as db:
+        assert db.conn.execute('SELECT zone_climatique FROM dpe').fetchone() == ('H1c',)
+        assert db.conn.execute('PRAGMA user_version').fetchone() == (SCHEMA_VERSION,)
+    with DpeStore(path) as db:
+        assert db.conn.total_changes == 0
+
+
+def test_up_to_date_database_opens_read_only(tmp_path, monkeypatch):
+    path = tmp_path / 'dpe.sqlite'
+    with DpeStore(path) as db:
+        db.add({'dpe_id': 'A', 'zone_climatique': '1'})
+    _read_only(monkeypatch)
+    with DpeStore(path) as db:
+        assert db.query(zone='H1') == [{'dpe_id': 'A', 'zone_climatique': '1'}]
+
+
+def test_old_read_only_database_stays_readable(tmp_path, monkeypatch):
+    path = tmp_path / 'dpe.sqlite'
+    _old_database(path)
+    _read_only(monkeypatch)
+    with DpeStore(path) as db:
+        assert db.count() == 1
+
+
+PACK = {'num': '1', 'cout_min': 1000, 'cout_max': 2000, 'travaux': [{'titre': 'Isolation', 'description': 'Murs'}]}
+
+
+def _children(db):
+    return [db.conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in ('pack_travaux', 'travaux', 'deperdition')]
+
+
+def test_a_dpe_stored_again_replaces_the_previous_one(tmp_path):
+    with DpeStore(tmp_path / 'dpe.sqlite') as db:
+        db.add({'dpe_id': 'A', 'classe_energie': 'G', 'packs_travaux': [PACK], 'deperditions': {'Murs': 40}}, 'a.xml')
+        db.add({'dpe_id': 'A', 'classe_energie': 'D', 'packs_travaux': [PACK, PACK], 'deperditions': {'Murs': 30}}, 'a2.xml')
+        db.add({'dpe_id': 'B', 'classe_energie': 'C'})
+        assert db.count() == 2
+        assert db.get('A')['classe_energie'] == 'D'
+        # The children of the replaced row went with it
+        assert _children(db) == [2, 2, 1]
+        assert db.query(classes_energie=['G']) == []
+
+
+def test_stored_data_is_lossless(tmp_path):
+    data = {'dpe_id': 'A', 'surface': 81.5, 'packs_travaux': [PACK], 'deperditions': {'Murs': 40, 'Toiture': 60},
+            'adresse': 'Rue de l\'Église, Besançon', 'has_enr': False}
+    with DpeStore(tmp_path / 'dpe.sqlite') as db:
+        db.add(data)
+        assert db.get('A') == data
+
+
+@pytest.mark.parametrize('zone, expected', [('H1', ['A', 'B']), ('H1b', ['B']), ('H2', ['C']), ('H3', [])])
+def test_zone_filter_is_a_prefix(tmp_path, zone, expected):
+    with DpeStore(tmp_path / 'dpe.sqlite') as db:
+        db.add_many([(None, {'dpe_id': 'A', 'zone_climatique': 'H1a'}), (None, {'dpe_id': 'B', 'zone_climatique': '2'}),
+                     (None, {'dpe_id': 'C', 'zone_climatique': 'H2d'})])
+        assert [data['dpe_id'] for data in db.query(zone=zone)] == expected
+
+
+def test_zone_filter_uses_the_index(tmp_path):
+    with DpeStore(tmp_path / 'dpe.sqlite') as db:
+        plan = db.conn.execute("EXPLAIN QUERY PLAN SELECT data FROM dpe WHERE zone_climatique GLOB 'H1*'").fetchall()
+    assert 'idx_dpe_zone' in ' '.join(row[-1] for row in plan)
+
+
+@pytest.mark.parametrize('value, year', [
+    ('1930', 1930), (1975, 1975), ('1949-1974', 1949), ('Avant 1948', 1947), ('Après 2021', 2022),
+    ('', None), (None, None), ('Inconnue', None),
+])
+def test_year_from_year_or_period(value, year):
+    assert _year(value) == year
+
+
+def test_construction_year_filter_falls_back_on_the_period(tmp_path):
+    with DpeStore(tmp_path / 'dpe.sqlite') as db:
+        db.add_many([(None, {'dpe_id': 'A', 'annee_construction': '1930'}),
+                     (None, {'dpe_id': 'B', 'periode_construction': 'Avant 1948'}),
+                     (None, {'dpe_id': 'C', 'periode_construction': '1949-1974'})])
+        assert [data['dpe_id'] for data in db.query(annee_avant=1948)] == ['A', 'B']
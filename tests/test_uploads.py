@@ -0,0 +1,101 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from src import uploads
+from src.uploads import MULTIPART_OVERHEAD, BodyLimitMiddleware, UploadTooLarge, receive_upload
+
+LIMIT = 1000
+
+
+async def _chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def test_small_uploads_stay_in_memory():
+    upload = asyncio.run(receive_upload(_chunks(b'<dpe>', b'</dpe>'), 'a.xml', spool_max_size=100))
+    assert not upload.spooled and upload.content == b'<dpe></dpe>'
+    assert upload.size == 11 and upload.digest == hashlib.sha256(b'<dpe></dpe>').hexdigest()
+
+
+def test_large_uploads_are_spooled_to_disk():
+    chunks = [bytes([i]) * 40 for i in range(5)]
+    upload = asyncio.run(receive_upload(_chunks(*chunks), 'a.xml', spool_max_size=100))
+    try:
+        assert upload.spooled and upload.content is None
+        with upload.open() as f:
+            assert f.read() == b''.join(chunks)
+        assert upload.head(50) == b''.join(chunks)[:50]
+        assert upload.digest == hashlib.sha256(b''.join(chunks)).hexdigest()
+    finally:
+        upload.close()
+    assert not os.path.exists(upload.path)
+
+
+def test_oversized_uploads_leave_nothing_on_disk(monkeypatch):
+    created = []
+    real_init = uploads.SpooledUpload.__init__
+
+    def tracking_init(self, *args, **kwargs):
+        real_init(self, *args, **kwargs)
+        created.append(self)
+
+    monkeypatch.setattr(uploads.SpooledUpload, '__init__', tracking_init)
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(receive_upload(_chunks(*[b'x' * 80] * 4), 'a.xml', max_bytes=250, spool_max_size=100))
+    [upload] = created
+    assert upload.spooled and not os.path.exists(upload.path)
+
+
+async def _echo(scope, receive, send):
+    """ASGI app answering 200 with the size of the body it read."""
+    size = 0
+    while True:
+        message = await receive()
+        size += len(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': str(size).encode()})
+
+
+def _post(middleware, path, size, content_length=True):
+    """(status, body) of a POST of `size` bytes sent in chunks of at most 1000 bytes."""
+    headers = [(b'content-length', str(size).encode())] if content_length else []
+    scope = {'type': 'http', 'method': 'POST', 'path': path, 'headers': headers}
+    chunks = [b'x' * min(1000, size - start) for start in range(0, size, 1000)]
+    sent = []
+
+    async def receive():
+        body = chunks.pop() if chunks else b''
+        return {'type': 'http.request', 'body': body, 'more_body': bool(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0]['status'], sent[1]['body'].decode()
+
+
+@pytest.mark.parametrize('content_length', [True, False])
+def test_oversized_bodies_get_a_413(content_length):
+    middleware = BodyLimitMiddleware(_echo, max_bytes=LIMIT)
+    assert _post(middleware, '/api/parse', LIMIT + MULTIPART_OVERHEAD, content_length) == (200, str(LIMIT + MULTIPART_OVERHEAD))
+    status, body = _post(middleware, '/api/parse', LIMIT + MULTIPART_OVERHEAD + 100, content_length)
+    assert status == 413 and body.startswith("Fichier trop volumineux")
+
+
+def test_batch_routes_have_their_own_limit():
+    middleware = BodyLimitMiddleware(_echo, max_bytes=LIMIT, path_limits={'/api/parse/batch': 10 * LIMIT})
+    size = 5 * LIMIT + MULTIPART_OVERHEAD
+    assert _post(middleware, '/api/parse', size)[0] == 413
+    assert _post(middleware, '/api/parse/batch', size) == (200, str(size))
+    status, body = _post(middleware, '/api/parse/batch', 11 * LIMIT + MULTIPART_OVERHEAD)
+    assert status == 413 and body.startswith("Envoi trop volumineux")
+
+
+def test_a_zero_limit_disables_the_check():
+    assert _post(BodyLimitMiddleware(_echo, max_bytes=0), '/api/parse', 10 * MULTIPART_OVERHEAD)[0] == 200
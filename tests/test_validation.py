@@ -0,0 +1,49 @@
+import io
+
+import pytest
+
+from src.validation import fetch_schema, validate_dpe_file
+
+pytest.importorskip('lxml')
+
+MAIN_XSD = b'''<?xml version="1.0" encoding="utf-8"?>
+<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">
+  <xs:include schemaLocation="communs/types.xsd"/>
+  <xs:element name="dpe">
+    <xs:complexType><xs:sequence>
+      <xs:element name="numero_dpe" type="numero"/>
+      <xs:element name="logement" minOccurs="0"/>
+    </xs:sequence></xs:complexType>
+  </xs:element>
+</xs:schema>'''
+
+TYPES_XSD = b'''<?xml version="1.0" encoding="utf-8"?>
+<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema">
+  <xs:simpleType name="numero"><xs:restriction base="xs:string"><xs:pattern value="\\d{4}E\\d+[A-Z]"/></xs:restriction></xs:simpleType>
+</xs:schema>'''
+
+
+def _published_schema(tmp_path):
+    source = tmp_path / 'ademe'
+    (source / 'communs').mkdir(parents=True)
+    (source / 'DPE_complet.xsd').write_bytes(MAIN_XSD)
+    (source / 'communs' / 'types.xsd').write_bytes(TYPES_XSD)
+    return source / 'DPE_complet.xsd'
+
+
+def test_fetched_schema_validates_dpe_files(tmp_path):
+    dest = tmp_path / 'schemas' / 'dpe.xsd'
+    written = fetch_schema(str(_published_schema(tmp_path)), dest)
+    assert sorted(written) == sorted([str(dest), str(tmp_path / 'schemas' / 'communs' / 'types.xsd')])
+
+    valid = b'<dpe><numero_dpe>2508E0729579F</numero_dpe><logement/></dpe>'
+    assert validate_dpe_file(io.BytesIO(valid), schema_path=str(dest)) == []
+    problems = validate_dpe_file(io.BytesIO(b'<dpe><numero_dpe>12</numero_dpe></dpe>'), schema_path=str(dest))
+    assert [p['chemin'] for p in problems] == ['/dpe/numero_dpe']
+
+
+def test_fetch_refuses_includes_outside_the_schema_folder(tmp_path):
+    source = tmp_path / 'main.xsd'
+    source.write_bytes(MAIN_XSD.replace(b'communs/types.xsd', b'../../types.xsd'))
+    with pytest.raises(RuntimeError):
+        fetch_schema(str(source), tmp_path / 'schemas' / 'dpe.xsd')
@@ -0,0 +1,75 @@
+import os
+import threading
+
+from src.watch_folder import FolderWatcher
+
+XML = b'<dpe><numero_dpe>2508E0729579F</numero_dpe><administratif/><logement/></dpe>'
+
+
+def test_the_initial_scan_runs_on_the_watcher_thread(tmp_path, monkeypatch):
+    folder = tmp_path / 'dpe'
+    folder.mkdir()
+    (folder / 'a.xml').write_bytes(XML)
+    watcher = FolderWatcher(str(folder), index_path=str(tmp_path / 'index.sqlite'), debounce=0)
+    scanned = threading.Event()
+    real_scan = watcher.initial_scan
+    threads = []
+
+    def initial_scan():
+        threads.append(threading.current_thread().name)
+        real_scan()
+        scanned.set()
+
+    monkeypatch.setattr(watcher, 'initial_scan', initial_scan)
+    parsed = threading.Event()
+    watcher.on_result = lambda path, data: parsed.set()
+    watcher.start()
+    try:
+        assert scanned.wait(5) and parsed.wait(5)
+    finally:
+        watcher.stop()
+    assert threads == ['dpe-watch']
+    assert [path for _, path, _ in watcher.events] == [str(folder / 'a.xml')]
+
+
+def _watcher(tmp_path, parsed):
+    def parse(path):
+        parsed.append(path)
+        return {'dpe_id': os.path.basename(path)}
+    return FolderWatcher(str(tmp_path / 'dpe'), index_path=str(tmp_path / 'index.sqlite'), debounce=0, parse=parse)
+
+
+def test_files_touched_without_changes_are_not_parsed_again(tmp_path):
+    (tmp_path / 'dpe').mkdir()
+    path = tmp_path / 'dpe' / 'a.xml'
+    path.write_bytes(XML)
+    parsed = []
+    watcher = _watcher(tmp_path, parsed)
+    watcher.process(str(path))
+    os.utime(path, ns=(0, 10**18))
+    watcher.process(str(path))
+    assert parsed == [str(path)] and len(watcher.events) == 1
+
+    path.write_bytes(XML.replace(b'2508', b'2509'))
+    watcher.process(str(path))
+    assert parsed == [str(path)] * 2 and len(watcher.events) == 2
+
+
+def test_a_restart_only_queues_new_changed_and_forgets_deleted_files(tmp_path):
+    (tmp_path / 'dpe').mkdir()
+    for name in ('a.xml', 'b.xml', 'c.xml'):
+        (tmp_path / 'dpe' / name).write_bytes(XML)
+    parsed = []
+    first = _watcher(tmp_path, parsed)
+    first.initial_scan()
+    for path in first._ready():
+        first.process(path)
+    assert len(parsed) == 3
+
+    (tmp_path / 'dpe' / 'b.xml').write_bytes(XML + b'\n')
+    (tmp_path / 'dpe' / 'c.xml').unlink()
+    (tmp_path / 'dpe' / 'd.xml').write_bytes(XML)
+    restarted = _watcher(tmp_path, parsed)
+    restarted.initial_scan()
+    assert sorted(os.path.basename(path) for path in restarted._ready()) == ['b.xml', 'd.xml']
+    assert sorted(os.path.basename(path) for path in restarted.index.paths()) == ['a.xml', 'b.xml']